@@ -2269,18 +2269,15 @@ private function safeMLPrediction($vehicleNumber, $currentMileage, $vehicleHisto
  */
 private function preparePredictionDataEnhanced($vehicleNumber, $currentMileage, $vehicleHistory)
 {
-    $baseData = [
+    $baseData = array_merge([
         'Vehicle' => $vehicleNumber,
         'Odometer' => $currentMileage,
-        'service_count' => $vehicleHistory['total_services'],
-        'average_interval' => $vehicleHistory['average_interval'],
-        'days_since_last' => $vehicleHistory['days_since_last'],
         'Description' => 'Vehicle prediction request',
         'Priority' => 2,
         'Status' => 2,  // Use Status=2 (MO Created)
         'MrType' => 3,
         'Building' => 1,  // Default building
-    ];
+    ], $this->historyFeaturesForML($vehicleHistory));
     
     // Add enhanced features for better AI performance
     $enhancedData = array_merge($baseData, [
@@ -3209,16 +3206,30 @@ private function countTireServices($records)
 
 private function preparePredictionData($vehicleNumber, $currentMileage, $vehicleHistory)
 {
-    return [
+    return array_merge([
         'Vehicle' => $vehicleNumber,
         'Odometer' => $currentMileage,
-        'service_count' => $vehicleHistory['total_services'],
-        'average_interval' => $vehicleHistory['average_interval'],
-        'days_since_last' => $vehicleHistory['days_since_last'],
         'Description' => 'Vehicle prediction request',
         'Priority' => 2,
         'Status' => 2,
         'MrType' => 3
+    ], $this->historyFeaturesForML($vehicleHistory));
+}
+
+/**
+ * History features to send to the ML service, only when they come from real maintenance records.
+ * Without them predict.py fills service_count, average_interval and days_since_last from its feature store.
+ */
+private function historyFeaturesForML($vehicleHistory)
+{
+    if (empty($vehicleHistory['maintenance_records']) || $vehicleHistory['maintenance_records']->isEmpty()) {
+        return [];
+    }
+    
+    return [
+        'service_count' => $vehicleHistory['total_services'],
+        'average_interval' => $vehicleHistory['average_interval'],
+        'days_since_last' => $vehicleHistory['days_since_last'],
     ];
 }
 
@@ -4,6 +4,7 @@
 
 use Illuminate\Support\Facades\Log;
 use Illuminate\Support\Facades\Cache;
+use Illuminate\Support\Facades\Http;
 
 class VMSPredictionService
 {
@@ -16,7 +17,8 @@ class VMSPredictionService
     public function __construct()
     {
         $this->pythonScriptPath = base_path('python/predict.py');
-        $this->modelPath = base_path('model_training_output/maintenance_prediction_model.pkl');
+        $this->modelPath = config('services.vms_predictor.model_path')
+            ?: base_path('model_training_output/maintenance_prediction_model.pkl');
         $this->pythonExecutable = $this->detectPythonPath();
     }
 
@@ -97,6 +99,14 @@ private function attemptMLPrediction(array $data)
             return $cached;
         }
 
+        // Prefer the persistent prediction server (model already loaded)
+        $serverResult = $this->executePredictionServer($data);
+        if ($serverResult && !isset($serverResult['error'])) {
+            Cache::put($cacheKey, $serverResult, 7200);
+            Log::info("✅ ML server prediction success: " . ($serverResult['prediction'] ?? 'unknown'));
+            return $serverResult;
+        }
+
         // Enhanced prerequisites check
         if (!$this->validateMLPrerequisitesEnhanced()) {
             return ['error' => 'ML prerequisites not met'];
@@ -130,6 +140,43 @@ private function attemptMLPrediction(array $data)
         }
     }
 
+    /**
+     * Prediction via the persistent Python server; returns null when not configured or unreachable
+     */
+    private function executePredictionServer(array $data)
+    {
+        $url = config('services.vms_predictor.url');
+        $socket = config('services.vms_predictor.socket');
+
+        if (empty($url) && empty($socket)) {
+            return null;
+        }
+
+        try {
+            $request = Http::timeout((int) config('services.vms_predictor.timeout', 5));
+            if (!empty($socket)) {
+                $request = $request->withOptions(['curl' => [CURLOPT_UNIX_SOCKET_PATH => $socket]]);
+            }
+
+            $startTime = microtime(true);
+            $response = $request->post(rtrim($url ?: 'http://localhost', '/') . '/predict', $data);
+            $executionTime = round((microtime(true) - $startTime) * 1000, 2);
+
+            Log::info("Prediction server time: {$executionTime}ms");
+
+            if (!$response->successful()) {
+                Log::warning("Prediction server returned HTTP {$response->status()}, falling back to CLI");
+                return null;
+            }
+
+            return $response->json();
+
+        } catch (\Exception $e) {
+            Log::warning("Prediction server unavailable, falling back to CLI: " . $e->getMessage());
+            return null;
+        }
+    }
+
     /**
      * Windows-compatible Python script execution
      */
@@ -233,12 +280,19 @@ private function enhanceDataForML(array $data)
      */
     private function getMinimalMLData(array $data)
     {
-        return [
+        // History features are only passed through when the caller has them;
+        // predict.py fills missing ones from its per-vehicle feature store
+        $history = array_filter([
+            'service_count' => $data['service_count'] ?? null,
+            'average_interval' => $data['average_interval'] ?? null,
+            'days_since_last' => $data['days_since_last'] ?? null,
+        ], function ($value) {
+            return $value !== null;
+        });
+        
+        return $history + [
             'Vehicle' => $data['Vehicle'] ?? 'UNKNOWN',
             'Odometer' => $data['Odometer'] ?? 100000,
-            'service_count' => $data['service_count'] ?? 50,
-            'average_interval' => $data['average_interval'] ?? 5000,
-            'days_since_last' => $data['days_since_last'] ?? 30,
             'Description' => $data['Description'] ?? 'Vehicle prediction request',
             'Priority' => 2,
             'Status' => 2,
@@ -432,7 +486,7 @@ private function validateMLPrerequisitesEnhanced()
         $checks = [
             'python_script' => file_exists($this->pythonScriptPath),
             'model_file' => file_exists($this->modelPath),
-            'model_size' => file_exists($this->modelPath) && filesize($this->modelPath) > 10000, // Increased minimum size
+            'model_size' => is_dir($this->modelPath) || (file_exists($this->modelPath) && filesize($this->modelPath) > 10000), // Bundle dir or non-trivial pickle
             'python_available' => $this->isPythonAvailable(),
             'temp_dir_writable' => is_writable(sys_get_temp_dir())
         ];
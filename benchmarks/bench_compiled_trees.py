@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: flat-array CompiledTreeEnsemble versus sklearn GradientBoostingClassifier
+Checks probabilities match within tolerance, then compares load time and latency.
+Usage: python benchmarks/bench_compiled_trees.py [model_path] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import pickle
+import logging
+import tempfile
+import argparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'python'))
+sys.path.insert(0, ROOT)
+
+from predict import load_model_robust, prepare_features_adaptive, CompiledTreeEnsemble
+from vms_model_training import ShapeFixedVMSTrainer
+from bench_predict_proba import make_requests, time_call, DEFAULT_MODEL_PATH
+
+TOLERANCE = 1e-9
+
+def proba(model, X):
+    return model.predict_proba(X)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('model_path', nargs='?', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    model_objects, message = load_model_robust(args.model_path)
+    if model_objects is None:
+        sys.exit(f"Could not load model: {message}")
+    sklearn_model = model_objects['final_model']
+
+    compiled_arrays = ShapeFixedVMSTrainer().export_compiled_trees(sklearn_model)
+    compiled_model = CompiledTreeEnsemble(compiled_arrays)
+
+    # Load time: full pickle versus the flat arrays alone
+    start = time.perf_counter()
+    with open(args.model_path, 'rb') as f:
+        pickle.load(f)
+    pickle_ms = (time.perf_counter() - start) * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        arrays_path = os.path.join(tmp, 'compiled_trees.npz')
+        np.savez(arrays_path, **compiled_arrays)
+        start = time.perf_counter()
+        with np.load(arrays_path) as loaded:
+            CompiledTreeEnsemble({key: loaded[key] for key in loaded.files})
+        arrays_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Load: pickle {pickle_ms:.1f} ms, flat arrays {arrays_ms:.1f} ms "
+          f"({compiled_arrays['feature'].size} internal slots)")
+
+    print(f"{'rows':>8} {'sklearn ms':>12} {'compiled ms':>12} {'speedup':>8} {'max |dp|':>10}")
+    for n_rows in [1, 10, 32, 100, 1000, 10000]:
+        X = prepare_features_adaptive(make_requests(n_rows), model_objects)
+
+        max_diff = np.abs(proba(sklearn_model, X) - proba(compiled_model, X)).max()
+        assert max_diff <= TOLERANCE, f'compiled probabilities differ by {max_diff}'
+
+        repeat = max(3, args.repeat // max(1, n_rows // 100))
+        sklearn_ms = time_call(proba, sklearn_model, X, repeat)
+        compiled_ms = time_call(proba, compiled_model, X, repeat)
+        print(f"{n_rows:>8} {sklearn_ms:>12.3f} {compiled_ms:>12.3f} "
+              f"{sklearn_ms / compiled_ms:>7.2f}x {max_diff:>10.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request history recomputation versus VehicleFeatureStore lookups
+The recompute path filters the full history by vehicle and rebuilds the aggregates
+for every request, as PredictionController::getVehicleHistory does; the store is
+built once and then answers lookups and O(1) updates.
+Usage: python benchmarks/bench_feature_store.py [--rows 500000] [--vehicles 2000] [--requests 2000]
+"""
+
+import sys
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import ROOT
+
+sys.path.insert(0, f"{ROOT}/python")
+from feature_store import VehicleFeatureStore
+
+def make_history(n_rows, n_vehicles, seed=42):
+    """ServiceRequest history with monotone odometer readings per vehicle"""
+    rng = np.random.RandomState(seed)
+    vehicles = np.array([f"WRH{number:04d}" for number in range(n_vehicles)])
+    history = pd.DataFrame({
+        'Vehicle': vehicles[rng.randint(0, n_vehicles, n_rows)],
+        'Datereceived': np.datetime64('2020-01-01') + rng.randint(0, 6 * 365 * 24 * 60, n_rows).astype('timedelta64[m]'),
+        'MrType': rng.choice([1, 2, 3], n_rows, p=[0.4, 0.3, 0.3])
+    }).sort_values('Datereceived', ignore_index=True)
+    history['Odometer'] = 100000 + history.groupby('Vehicle').cumcount() * rng.randint(500, 5000, n_rows)
+    return history
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--vehicles', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    history = make_history(args.rows, args.vehicles)
+    requested = np.random.RandomState(0).choice(history['Vehicle'].unique(), args.requests)
+    as_of = datetime(2026, 1, 1)
+
+    start = time.perf_counter()
+    recomputed = [VehicleFeatureStore.from_history(history[history['Vehicle'] == vehicle]).lookup(vehicle, as_of)
+                  for vehicle in requested]
+    recompute_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = VehicleFeatureStore.from_history(history)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    looked_up = [store.lookup(vehicle, as_of) for vehicle in requested]
+    lookup_seconds = time.perf_counter() - start
+
+    assert looked_up == recomputed, 'store lookups differ from per-request recomputation'
+
+    new_records = history.sample(10000, random_state=1).assign(Datereceived=pd.Timestamp('2026-01-02'))
+    start = time.perf_counter()
+    for record in new_records.to_dict('records'):
+        store.update(record)
+    update_seconds = time.perf_counter() - start
+
+    print(f"history rows: {args.rows}, vehicles: {args.vehicles}, requests: {args.requests}")
+    print(f"recompute per request: {recompute_seconds / args.requests * 1000:8.3f} ms")
+    print(f"store build (once):    {build_seconds * 1000:8.1f} ms")
+    print(f"store lookup:          {lookup_seconds / args.requests * 1e6:8.1f} us")
+    print(f"store update:          {update_seconds / len(new_records) * 1e6:8.1f} us per record")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: step-by-step feature pipeline versus the compiled (fused) feature transform
+Both start from the same enhanced frame (create_robust_features output). The step-by-step
+path is impute, scale, TF-IDF, hstack and SelectKBest; the fused path is
+CompiledFeatureTransform. Checks both produce the same matrix, then reports
+single-request and batch timings.
+Usage: python benchmarks/bench_feature_transform.py [model_path] [--repeat 500] [--batch 5000]
+"""
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from bench_predict_proba import make_requests, DEFAULT_MODEL_PATH
+from predict import load_model_robust, validate_request, create_robust_features, prepare_features_from_frame
+
+def step_by_step(df, model_objects):
+    return prepare_features_from_frame(df, dict(model_objects, compiled_transform=None))
+
+def fused(df, model_objects):
+    return prepare_features_from_frame(df, model_objects, reuse_buffer=True)
+
+def time_per_call(func, frames, model_objects):
+    func(frames[0], model_objects)
+    start = time.perf_counter()
+    for frame in frames:
+        func(frame, model_objects)
+    return (time.perf_counter() - start) / len(frames) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('model_path', nargs='?', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--repeat', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=5000)
+    args = parser.parse_args()
+
+    model_objects, message = load_model_robust(args.model_path)
+    if model_objects is None:
+        raise SystemExit(message)
+    compiled_transform = model_objects.get('compiled_transform')
+    if compiled_transform is None:
+        raise SystemExit('This model has no compiled feature transform (e.g. an out-of-core model)')
+
+    frame = pd.DataFrame([validate_request(request, model_objects) for request in make_requests(args.batch)])
+    expected = step_by_step(frame, model_objects).toarray()
+    difference = np.abs(fused(frame, model_objects) - expected).max()
+    assert difference < 1e-12, f'fused transform differs by {difference}'
+
+    # Transform stage alone: both paths share create_robust_features, so time it separately
+    enhanced = create_robust_features(frame)
+    text = enhanced[model_objects.get('text_feature', 'Description')].fillna('').astype(str)
+    rows = [frame.iloc[[i]] for i in range(min(args.repeat, len(frame)))]
+    print(f"selected features: {compiled_transform.n_outputs} ({compiled_transform.n_dense} numerical/categorical), "
+          f"vocabulary kept: {len(compiled_transform.vocabulary)}, max difference: {difference:.1e}")
+    print(f"{'path':>14} {'1 row ms':>9} {f'{args.batch} rows ms':>14}")
+    for name, func in [('step-by-step', step_by_step), ('fused', fused)]:
+        row_ms = time_per_call(func, rows, model_objects)
+        start = time.perf_counter()
+        func(frame, model_objects)
+        batch_ms = (time.perf_counter() - start) * 1000
+        print(f"{name:>14} {row_ms:>9.3f} {batch_ms:>14.1f}")
+
+    start = time.perf_counter()
+    for i in range(len(rows)):
+        compiled_transform.transform(enhanced.iloc[[i]], text.iloc[[i]], reuse_buffer=True)
+    print(f"fused transform alone (without create_robust_features): "
+          f"{(time.perf_counter() - start) / len(rows) * 1000:.3f} ms/row")
+
+if __name__ == "__main__":
+    main()
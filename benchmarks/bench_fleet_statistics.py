@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark: full-history recompute versus materialized fleet statistics
+The dashboards' fleet queries (vehicle statistics, service type breakdown, monthly
+trends, frequent-breakdown types) scan every ServiceRequest row on each request.
+The baseline rebuilds the same aggregates from the whole history after each new
+batch of records. The materialized path folds the batch into FleetStatistics with
+O(1) updates. Reports the per-batch refresh time of each path, the time to read the
+saved snapshot, and checks both paths (and the state reloaded from disk) end with
+identical snapshots. It also checks that merging statistics built on two halves gives
+the same snapshot.
+Usage: python benchmarks/bench_fleet_statistics.py [--rows 100000 1000000] [--batch 100]
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from synthetic_data import generate_service_requests
+from fleet_statistics import FleetStatistics, read_snapshot
+
+def comparable(snapshot):
+    return {key: value for key, value in snapshot.items() if key != 'generated_at'}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--batch', type=int, default=100, help='New records per refresh')
+    parser.add_argument('--refreshes', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'recompute ms':>13} {'incremental ms':>15} {'speedup':>8} {'snapshot read ms':>17} "
+          f"{'identical':>10} {'merge identical':>16}")
+    for n_rows in args.rows:
+        df = generate_service_requests(n_rows)
+        new_rows = args.batch * args.refreshes
+        history, arrivals = df.iloc[:-new_rows], df.iloc[-new_rows:].to_dict('records')
+
+        stats = FleetStatistics.from_history(history)
+        recompute_seconds, incremental_seconds = 0.0, 0.0
+        for refresh in range(args.refreshes):
+            batch = arrivals[refresh * args.batch:(refresh + 1) * args.batch]
+
+            start = time.perf_counter()
+            recomputed = FleetStatistics.from_history(df.iloc[:len(history) + (refresh + 1) * args.batch]).snapshot()
+            recompute_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for record in batch:
+                stats.update(record)
+            incremental = stats.snapshot()
+            incremental_seconds += time.perf_counter() - start
+        identical = comparable(recomputed) == comparable(incremental)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = stats.save(os.path.join(directory, 'fleet_statistics.json'))
+            resumed = comparable(FleetStatistics.load(path).snapshot()) == comparable(incremental)
+            start = time.perf_counter()
+            read_snapshot(path)
+            read_ms = (time.perf_counter() - start) * 1000
+
+        halves = FleetStatistics.from_history(df.iloc[:n_rows // 2]).merge(
+            FleetStatistics.from_history(df.iloc[n_rows // 2:]))
+        merge_identical = comparable(halves.snapshot()) == comparable(incremental)
+        identical = identical and resumed
+
+        recompute_ms = recompute_seconds / args.refreshes * 1000
+        incremental_ms = incremental_seconds / args.refreshes * 1000
+        print(f"{n_rows:>9} {recompute_ms:>13.1f} {incremental_ms:>15.2f} {recompute_ms / incremental_ms:>7.0f}x "
+              f"{read_ms:>17.1f} {str(identical):>10} {str(merge_identical):>16}")
+
+if __name__ == "__main__":
+    main()
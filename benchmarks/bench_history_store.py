@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request history query versus the columnar fleet history store
+The baseline mirrors getVehicleHistory on a DataFrame: it filters on
+UPPER(TRIM(Vehicle)), sorts newest first and hydrates row objects (dicts). The
+store reads a vehicle's history as array slices. Reports memory (row objects vs
+store columns) and per-lookup latency, and checks both return the same records.
+Usage: python benchmarks/bench_history_store.py [--rows 100000 1000000] [--lookups 500]
+"""
+
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from synthetic_data import generate_service_requests
+from history_store import FleetHistoryStore
+
+def query_history(df, vehicle):
+    """Reference: filter, order newest first and hydrate every matching row"""
+    matches = df[df['Vehicle'].str.strip().str.upper() == vehicle.strip().upper()]
+    return matches.sort_values('Datereceived', ascending=False, kind='mergesort').to_dict('records')
+
+def row_object_bytes(df):
+    """Python heap held by the whole history as one dict per row"""
+    tracemalloc.start()
+    rows = df.to_dict('records')
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--lookups', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'row objects MB':>15} {'store MB':>9} {'build s':>8} {'query ms':>9} {'store ms':>9}")
+    for n_rows in args.rows:
+        df = generate_service_requests(n_rows, seed=0)
+        object_bytes = row_object_bytes(df)
+
+        start = time.perf_counter()
+        store = FleetHistoryStore.from_history(df)
+        build_seconds = time.perf_counter() - start
+
+        rng = np.random.default_rng(1)
+        vehicles = rng.choice(np.asarray(store.vehicles), size=args.lookups)
+
+        start = time.perf_counter()
+        queried = [query_history(df, vehicle) for vehicle in vehicles]
+        query_ms = (time.perf_counter() - start) / args.lookups * 1000
+
+        start = time.perf_counter()
+        histories = [store.history(vehicle) for vehicle in vehicles]
+        store_ms = (time.perf_counter() - start) / args.lookups * 1000
+
+        for rows, history in zip(queried, histories):
+            assert sorted(row['ID'] for row in rows) == sorted(history['id'].tolist()), 'store history differs'
+
+        print(f"{n_rows:>9} {object_bytes / 1e6:>15.1f} {store.nbytes() / 1e6:>9.1f} {build_seconds:>8.2f} "
+              f"{query_ms:>9.3f} {store_ms:>9.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: one-at-a-time /predict scoring versus asyncio micro-batching
+Simulates the prediction server's request handling without HTTP. Each of C concurrent
+clients sends requests back to back. In the baseline each request runs predict_with_model
+on a thread pool (as plain FastAPI endpoints do); with micro-batching the requests go
+through MicroBatcher. Checks both paths return the same predictions, then reports
+throughput and p50/p99 latency per concurrency level.
+Usage: python benchmarks/bench_micro_batching.py [model_path] [--requests 2000] [--concurrency 1 8 32 64]
+"""
+
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bench_predict_proba import make_requests, DEFAULT_MODEL_PATH
+from predict import load_model_robust, predict_with_model, predict_batch_with_model
+from micro_batcher import MicroBatcher
+
+async def run_clients(requests, concurrency, score_one):
+    """Latency per request and total wall time for `concurrency` clients sharing the request list"""
+    latencies = [0.0] * len(requests)
+    results = [None] * len(requests)
+    positions = iter(range(len(requests)))
+
+    async def client():
+        for position in positions:
+            start = time.perf_counter()
+            results[position] = await score_one(requests[position])
+            latencies[position] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return results, latencies, time.perf_counter() - start
+
+async def benchmark(requests, concurrency, model_objects, window_ms, max_batch_size):
+    loop = asyncio.get_running_loop()
+    # FastAPI runs plain def endpoints on a 40-thread pool
+    thread_pool = ThreadPoolExecutor(max_workers=40)
+
+    async def one_at_a_time(request):
+        return await loop.run_in_executor(thread_pool, predict_with_model, request, model_objects)
+
+    batcher = MicroBatcher(lambda records: predict_batch_with_model(records, model_objects),
+                           max_batch_size, window_ms)
+
+    baseline = await run_clients(requests, concurrency, one_at_a_time)
+    batched = await run_clients(requests, concurrency, batcher.submit)
+    stats = batcher.stats()
+    await batcher.close()
+    thread_pool.shutdown()
+    return baseline, batched, stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('model_path', nargs='?', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--window-ms', type=float, default=2.0)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    model_objects, message = load_model_robust(args.model_path)
+    if model_objects is None:
+        raise SystemExit(message)
+    requests = make_requests(args.requests)
+
+    print(f"requests: {args.requests}, window: {args.window_ms} ms, max batch: {args.max_batch_size}")
+    print(f"{'clients':>8} {'mode':>14} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11}")
+    for concurrency in args.concurrency:
+        baseline, batched, stats = asyncio.run(
+            benchmark(requests, concurrency, model_objects, args.window_ms, args.max_batch_size))
+
+        for single, grouped in zip(baseline[0], batched[0]):
+            assert single['prediction'] == grouped['prediction'], 'micro-batched prediction differs'
+            assert abs(single['confidence'] - grouped['confidence']) < 1e-9, 'micro-batched confidence differs'
+
+        for mode, (_, latencies, seconds), batch_size in [('one-at-a-time', baseline, 1.0),
+                                                          ('micro-batched', batched, stats['mean_batch_size'])]:
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{concurrency:>8} {mode:>14} {len(requests) / seconds:>8.0f} {p50:>8.2f} {p99:>8.2f} "
+                  f"{batch_size:>11.1f}")
+
+if __name__ == "__main__":
+    main()
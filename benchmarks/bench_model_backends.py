@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GradientBoostingClassifier versus HistGradientBoostingClassifier backends
+Both train on the same synthetic feature matrix and train/test split with the
+trainer's default hyperparameters; reports fit time, test accuracy, single-request
+latency and batch throughput through score_feature_matrix (compiled trees included,
+as predict.py serves them), and checks the compiled trees match each sklearn model.
+Usage: python benchmarks/bench_model_backends.py [--rows 100000] [--repeat 200]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score
+
+from synthetic_data import generate_service_requests, ROOT
+
+sys.path.insert(0, os.path.join(ROOT, 'python'))
+from vms_model_training import (ShapeFixedVMSTrainer, MODEL_BACKENDS, DENSE_INPUT_BACKENDS,
+                                DEFAULT_HYPERPARAMETERS, build_classifier)
+from predict import score_feature_matrix, CompiledTreeEnsemble
+
+TOLERANCE = 1e-9
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    trainer = ShapeFixedVMSTrainer()
+    df = generate_service_requests(args.rows)
+    logging.getLogger().setLevel(logging.WARNING)
+    X_numerical, X_categorical, X_text, y = trainer.prepare_features(trainer.preprocess_data_robust(df))
+    label_encoder = LabelEncoder()
+    y_encoded = label_encoder.fit_transform(y)
+    X_selected, _ = trainer.fit_feature_pipeline(X_numerical, X_categorical, X_text, y_encoded)
+    train_index, test_index = train_test_split(np.arange(X_selected.shape[0]), test_size=0.2,
+                                               random_state=42, stratify=y_encoded)
+    print(f"rows: {X_selected.shape[0]}, features: {X_selected.shape[1]}, classes: {len(label_encoder.classes_)}, "
+          f"hyperparameters: {DEFAULT_HYPERPARAMETERS}")
+    print(f"{'backend':>24} {'fit s':>8} {'accuracy':>9} {'1 row ms':>9} {'batch rows/s':>13}")
+
+    for backend in MODEL_BACKENDS:
+        trainer.backend = backend
+        X = trainer.model_input(X_selected)
+
+        start = time.perf_counter()
+        model = build_classifier(backend, DEFAULT_HYPERPARAMETERS).fit(X[train_index], y_encoded[train_index])
+        fit_seconds = time.perf_counter() - start
+
+        # Serving path: CSR rows from process_features_robust, compiled trees where the backend has them
+        model_objects = {'final_model': model, 'label_encoder': label_encoder,
+                         'dense_input': backend in DENSE_INPUT_BACKENDS, 'model_info': {'model_type': backend}}
+        model_objects['compiled_model'] = CompiledTreeEnsemble(trainer.export_compiled_trees(model))
+        X_test = X_selected[test_index]
+
+        # Both engines score the served (float64) matrix, as score_feature_matrix does
+        reference_input = X_test[:1000].toarray() if backend in DENSE_INPUT_BACKENDS else X_test[:1000]
+        difference = np.abs(model.predict_proba(reference_input) -
+                            model_objects['compiled_model'].predict_proba(X_test[:1000])).max()
+        assert difference < TOLERANCE, f'{backend}: compiled trees differ from sklearn by {difference}'
+
+        categories, _, _ = score_feature_matrix(X_test, model_objects)
+        accuracy = accuracy_score(label_encoder.inverse_transform(y_encoded[test_index]), categories)
+
+        start = time.perf_counter()
+        for i in range(args.repeat):
+            score_feature_matrix(X_test[i % X_test.shape[0]], model_objects)
+        row_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+        start = time.perf_counter()
+        score_feature_matrix(X_test, model_objects)
+        batch_rate = X_test.shape[0] / (time.perf_counter() - start)
+
+        print(f"{backend:>24} {fit_seconds:>8.1f} {accuracy:>9.4f} {row_ms:>9.3f} {batch_rate:>13,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: request latency while the model is replaced on disk
+Concurrent clients send requests back to back while a writer atomically replaces
+the model pickle every --swap-every seconds (as a retrain does). Three modes:
+- steady: no replacements, the reference latency
+- inline: the request that notices the new file loads it before scoring (the
+  reload cost lands on that request, as with a load-per-request scorer)
+- registry: ModelRegistry loads, validates and warms up the new model on its
+  watcher thread and swaps it in; requests only read registry.current
+Reports p50/p99/max latency, failed requests and the number of reloads per mode.
+Usage: python benchmarks/bench_model_reload.py [model_path] [--seconds 10] [--clients 2] [--swap-every 2]
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+
+from bench_predict_proba import make_requests, DEFAULT_MODEL_PATH
+from predict import load_model_robust, predict_with_model
+from model_registry import ModelRegistry, artifact_fingerprint
+
+def replace_model(source, target):
+    """Copy to a staging file and rename over the target, as the trainer writes its pickle"""
+    staging = f"{target}.tmp"
+    shutil.copyfile(source, staging)
+    os.replace(staging, target)
+
+class InlineReloader:
+    """The model is checked on every request and reloaded by whichever request sees the change"""
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.fingerprint = artifact_fingerprint(model_path)
+        self.model_objects, _ = load_model_robust(model_path)
+        self.reloads = 0
+        self.lock = threading.Lock()
+
+    def current(self):
+        fingerprint = artifact_fingerprint(self.model_path)
+        if fingerprint != self.fingerprint:
+            with self.lock:
+                if fingerprint != self.fingerprint:
+                    self.model_objects, _ = load_model_robust(self.model_path)
+                    self.fingerprint = fingerprint
+                    self.reloads += 1
+        return self.model_objects
+
+def run(mode, source, directory, requests, clients, seconds, swap_every, poll_interval):
+    model_path = os.path.join(directory, 'maintenance_prediction_model.pkl')
+    replace_model(source, model_path)
+    if mode == 'inline':
+        reloader = InlineReloader(model_path)
+        current = reloader.current
+    else:
+        registry = ModelRegistry(model_path, poll_interval)
+        registry.start()
+        current = lambda: registry.current
+
+    latencies, failures = [], [0]
+    stop = threading.Event()
+
+    def client(offset):
+        position = offset
+        while not stop.is_set():
+            request = requests[position % len(requests)]
+            start = time.perf_counter()
+            result = predict_with_model(request, current())
+            latencies.append((time.perf_counter() - start) * 1000)
+            failures[0] += 'error' in result
+            position += clients
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        time.sleep(min(swap_every, max(0.0, deadline - time.perf_counter())))
+        if mode != 'steady' and time.perf_counter() < deadline:
+            replace_model(source, model_path)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    if mode == 'inline':
+        reloads = reloader.reloads
+    else:
+        registry.stop()
+        reloads = registry.reloads
+    return np.asarray(latencies), failures[0], reloads
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('model_path', nargs='?', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--clients', type=int, default=2)
+    parser.add_argument('--swap-every', type=float, default=2.0)
+    parser.add_argument('--poll-interval', type=float, default=0.2)
+    args = parser.parse_args()
+
+    if load_model_robust(args.model_path)[0] is None:
+        raise SystemExit(f"Could not load model: {args.model_path}")
+    requests = make_requests(1000)
+
+    print(f"clients: {args.clients}, {args.seconds:.0f}s per mode, model replaced every {args.swap_every}s")
+    print(f"{'mode':>9} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'failed':>7} {'reloads':>8}")
+    for mode in ['steady', 'inline', 'registry']:
+        with tempfile.TemporaryDirectory() as directory:
+            latencies, failed, reloads = run(mode, args.model_path, directory, requests, args.clients,
+                                             args.seconds, args.swap_every, args.poll_interval)
+        p50, p99, worst = np.percentile(latencies, [50, 99, 100])
+        print(f"{mode:>9} {len(latencies):>9} {p50:>8.2f} {p99:>8.2f} {worst:>8.1f} {failed:>7} {reloads:>8}")
+
+if __name__ == "__main__":
+    main()
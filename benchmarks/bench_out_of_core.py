@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: in-memory training versus --out-of-core training on a large export
+Builds a large tab-separated export (see bench_streaming_loader.py) and runs the full
+training pipeline in separate processes so peak RSS is measured independently.
+Boosting stages are cut down (--estimators) so the run measures the data path, not tree fitting.
+Peak RSS counts memory-mapped file pages, which the kernel can evict under pressure, so
+peak anonymous memory (RssAnon, sampled) is reported as well.
+Usage: python benchmarks/bench_out_of_core.py [--rows 500000] [--estimators 1]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+
+from synthetic_data import ROOT
+from bench_streaming_loader import write_large_export
+import vms_model_training
+from vms_model_training import ShapeFixedVMSTrainer
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def anon_rss_mb():
+    """Current anonymous (not file-backed) resident memory of this process"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def sample_peak_anon(peak, stop, interval=0.02):
+    while not stop.wait(interval):
+        peak[0] = max(peak[0], anon_rss_mb())
+
+def run_worker(mode, path, n_estimators):
+    vms_model_training.DEFAULT_HYPERPARAMETERS['n_estimators'] = n_estimators
+    baseline = peak_rss_mb()
+    peak_anon, stop = [anon_rss_mb()], threading.Event()
+    sampler = threading.Thread(target=sample_peak_anon, args=(peak_anon, stop), daemon=True)
+    sampler.start()
+
+    start = time.perf_counter()
+    model_objects = ShapeFixedVMSTrainer(n_jobs=1).run_complete_training(
+        [path], use_cache=False, out_of_core=(mode == 'out_of_core'))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+
+    print(json.dumps({
+        'mode': mode,
+        'rows': model_objects['model_info']['training_samples'],
+        'baseline_rss_mb': round(baseline, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'peak_anon_mb': round(peak_anon[0], 1),
+        'test_accuracy': round(model_objects['model_info']['test_accuracy'], 4),
+        'train_seconds': round(elapsed, 1)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--estimators', type=int, default=1)
+    parser.add_argument('--worker', choices=['in_memory', 'out_of_core'], help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.getLogger().setLevel(logging.WARNING)
+        run_worker(args.worker, args.path, args.estimators)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'ServiceRequest_export.txt')
+        write_large_export(path, args.rows)
+        print(f"export: {args.rows} rows, {os.path.getsize(path) / 1024 / 1024:.0f} MB on disk, "
+              f"{args.estimators} boosting stage(s)")
+        print(f"{'mode':>12} {'train rows':>11} {'baseline MB':>12} {'peak MB':>9} {'peak anon MB':>13} "
+              f"{'accuracy':>9} {'seconds':>8}")
+        for mode in ['in_memory', 'out_of_core']:
+            # Model output lands in the temporary directory (the trainer writes relative to its cwd)
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', mode, '--path', path,
+                                     '--estimators', str(args.estimators)],
+                                    capture_output=True, text=True, cwd=tmp_dir,
+                                    env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__))))
+            if output.returncode < 0:
+                print(f"{mode:>12} killed by signal {-output.returncode} (out of memory?)")
+                continue
+            if output.returncode != 0:
+                print(f"{mode:>12} failed: {output.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{mode:>12} {result['rows']:>11} {result['baseline_rss_mb']:>12.1f} {result['peak_rss_mb']:>9.1f} "
+                  f"{result['peak_anon_mb']:>13.1f} {result['test_accuracy']:>9.4f} {result['train_seconds']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: predict() + predict_proba() versus a single predict_proba() pass
+Usage: python benchmarks/bench_predict_proba.py [model_path] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'python'))
+
+from predict import load_model_robust, prepare_features_adaptive
+
+DEFAULT_MODEL_PATH = os.path.join('model_training_output', 'maintenance_prediction_model.pkl')
+
+DESCRIPTIONS = [
+    'brake noise when stopping', 'tukar tayar depan', 'enjin tidak boleh start',
+    'service minyak hitam', 'lampu tidak menyala', 'cuci lori', 'kebocoran angin',
+    'hydraulic pump rosak', 'panel badan kemek', 'Vehicle prediction request'
+]
+
+def make_requests(n_rows, seed=42):
+    """Synthetic prediction requests shaped like the PHP payload"""
+    rng = np.random.RandomState(seed)
+    return [{
+        'Vehicle': f"W{rng.choice(['A', 'B', 'C'])}{rng.randint(1000, 9999)}",
+        'Odometer': int(rng.randint(50000, 1500000)),
+        'Priority': int(rng.randint(1, 5)),
+        'Status': 2,
+        'MrType': int(rng.choice([1, 2, 3])),
+        'service_count': int(rng.poisson(80)),
+        'average_interval': int(rng.randint(2000, 30000)),
+        'days_since_last': int(rng.randint(1, 365)),
+        'Description': str(rng.choice(DESCRIPTIONS))
+    } for _ in range(n_rows)]
+
+def two_pass(model, X):
+    """Previous inference path: predict() then predict_proba()"""
+    labels = model.predict(X)
+    probabilities = model.predict_proba(X)
+    return labels, probabilities
+
+def single_pass(model, X):
+    """Current inference path: predict_proba() once, label from argmax"""
+    probabilities = model.predict_proba(X)
+    return model.classes_[np.argmax(probabilities, axis=1)], probabilities
+
+def time_call(func, model, X, repeat):
+    """Median wall time in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(model, X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('model_path', nargs='?', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    model_objects, message = load_model_robust(args.model_path)
+    if model_objects is None:
+        sys.exit(f"Could not load model: {message}")
+    model = model_objects['final_model']
+
+    print(f"{'rows':>8} {'predict+proba ms':>18} {'proba only ms':>15} {'speedup':>8}")
+    for n_rows in [1, 10, 100, 1000]:
+        X = prepare_features_adaptive(make_requests(n_rows), model_objects)
+
+        old_labels, _ = two_pass(model, X)
+        new_labels, _ = single_pass(model, X)
+        assert np.array_equal(old_labels, new_labels), 'argmax labels differ from predict()'
+
+        repeat = max(3, args.repeat // max(1, n_rows // 100))
+        old_ms = time_call(two_pass, model, X, repeat)
+        new_ms = time_call(single_pass, model, X, repeat)
+        print(f"{n_rows:>8} {old_ms:>18.3f} {new_ms:>15.3f} {old_ms / new_ms:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
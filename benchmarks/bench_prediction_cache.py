@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark: predict_with_model with and without the prediction result cache
+Replays a dashboard-like stream where a small set of distinct requests repeats,
+checks cached answers match fresh ones, and reports latency and hit rate.
+Usage: python benchmarks/bench_prediction_cache.py [model_path] [--requests 2000] [--distinct 50]
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from bench_predict_proba import make_requests, DEFAULT_MODEL_PATH
+from predict import load_model_robust, predict_with_model
+from prediction_cache import PredictionCache
+
+def replay(stream, model_objects):
+    start = time.perf_counter()
+    results = [predict_with_model(request, model_objects) for request in stream]
+    return results, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('model_path', nargs='?', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--distinct', type=int, default=50)
+    args = parser.parse_args()
+
+    model_objects, message = load_model_robust(args.model_path)
+    if model_objects is None:
+        raise SystemExit(message)
+
+    distinct = make_requests(args.distinct)
+    stream = [distinct[i] for i in np.random.RandomState(0).randint(0, args.distinct, args.requests)]
+
+    uncached, uncached_seconds = replay(stream, model_objects)
+
+    model_objects['prediction_cache'] = PredictionCache()
+    cached, cached_seconds = replay(stream, model_objects)
+    stats = model_objects['prediction_cache'].stats()
+
+    for fresh, hit in zip(uncached, cached):
+        assert dict(hit, timestamp=None) == dict(fresh, timestamp=None), 'cached result differs'
+
+    print(f"requests: {args.requests}, distinct: {args.distinct}, hit rate: {stats['hit_rate']:.1%}")
+    print(f"uncached: {uncached_seconds / args.requests * 1000:7.3f} ms/request")
+    print(f"cached:   {cached_seconds / args.requests * 1000:7.3f} ms/request "
+          f"({uncached_seconds / cached_seconds:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: dense (.toarray + np.concatenate) versus sparse CSR feature pipeline
+Each mode runs in its own process so peak RSS is measured independently.
+Usage: python benchmarks/bench_sparse_memory.py [--rows 500000]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import resource
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import make_text, ROOT
+from vms_model_training import ShapeFixedVMSTrainer
+
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import StandardScaler
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_selection import SelectKBest, f_classif
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def make_inputs(trainer, n_rows, seed=42):
+    """Feature inputs shaped like ShapeFixedVMSTrainer.prepare_features output"""
+    rng = np.random.RandomState(seed)
+    X_numerical = pd.DataFrame(rng.normal(size=(n_rows, len(trainer.numerical_features))),
+                               columns=trainer.numerical_features)
+    X_categorical = pd.DataFrame(rng.randint(0, 3, size=(n_rows, len(trainer.categorical_features))),
+                                 columns=trainer.categorical_features)
+    X_text = make_text(rng, n_rows)
+    y_encoded = rng.randint(0, 8, n_rows)
+    return X_numerical, X_categorical, X_text, y_encoded
+
+def dense_pipeline(X_numerical, X_categorical, X_text, y_encoded):
+    """Previous training path: TF-IDF densified and concatenated with np.concatenate"""
+    X_num = StandardScaler().fit_transform(SimpleImputer(strategy='median').fit_transform(X_numerical))
+    X_cat = SimpleImputer(strategy='most_frequent').fit_transform(X_categorical)
+    X_text_array = TfidfVectorizer(max_features=500, stop_words='english', lowercase=True).fit_transform(X_text).toarray()
+    X_combined = np.concatenate([X_num, X_cat, X_text_array], axis=1)
+    return SelectKBest(f_classif, k=min(300, X_combined.shape[1])).fit_transform(X_combined, y_encoded)
+
+def run_worker(mode, n_rows):
+    trainer = ShapeFixedVMSTrainer()
+    inputs = make_inputs(trainer, n_rows)
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'dense':
+        X_selected = dense_pipeline(*inputs)
+    else:
+        X_selected, _ = trainer.fit_feature_pipeline(*inputs)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': mode,
+        'rows': n_rows,
+        'baseline_rss_mb': round(baseline, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'pipeline_seconds': round(elapsed, 2),
+        'selected_shape': list(X_selected.shape)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--worker', choices=['dense', 'sparse'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.getLogger().setLevel(logging.WARNING)
+        run_worker(args.worker, args.rows)
+        return
+
+    print(f"{'mode':>8} {'rows':>9} {'baseline MB':>12} {'peak MB':>9} {'pipeline MB':>12} {'seconds':>8}")
+    for mode in ['dense', 'sparse']:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', mode, '--rows', str(args.rows)],
+                                capture_output=True, text=True, cwd=ROOT)
+        if output.returncode < 0:
+            print(f"{mode:>8} {args.rows:>9} killed by signal {-output.returncode} (out of memory?)")
+            continue
+        if output.returncode != 0:
+            print(f"{mode:>8} failed: {output.stderr.strip().splitlines()[-1:]}")
+            continue
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{mode:>8} {result['rows']:>9} {result['baseline_rss_mb']:>12.1f} {result['peak_rss_mb']:>9.1f} "
+              f"{result['peak_rss_mb'] - result['baseline_rss_mb']:>12.1f} {result['pipeline_seconds']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: whole-file pd.read_csv versus the chunked ServiceRequest loader
+Builds a large tab-separated export by repeating the rows of data/WRH311_2020-2025.txt,
+then loads it in separate processes so peak RSS is measured independently.
+Usage: python benchmarks/bench_streaming_loader.py [--rows 1000000]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+
+from synthetic_data import ROOT
+from vms_model_training import ShapeFixedVMSTrainer
+
+import pandas as pd
+
+SOURCE_EXPORT = os.path.join(ROOT, 'data', 'WRH311_2020-2025.txt')
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def write_large_export(path, n_rows):
+    """Repeat the source export's data lines (with fresh IDs) until n_rows rows are written"""
+    with open(SOURCE_EXPORT, 'r', encoding='utf-8') as f:
+        header, *lines = f.read().splitlines()
+    rows = [line.split('\t', 1)[1] for line in lines]
+
+    with open(path, 'w', encoding='utf-8') as out:
+        out.write(header + '\n')
+        written = 0
+        while written < n_rows:
+            batch = rows[:n_rows - written]
+            out.write(''.join(f"{written + i + 1}\t{row}\n" for i, row in enumerate(batch)))
+            written += len(batch)
+
+def run_worker(mode, path):
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'full':
+        # Best case for the previous loader: one read with the right separator
+        df = pd.read_csv(path, sep='\t', encoding='utf-8')
+    else:
+        df = ShapeFixedVMSTrainer().load_and_clean_data([path])
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': mode,
+        'rows': len(df),
+        'baseline_rss_mb': round(baseline, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'frame_mb': round(df.memory_usage(deep=True).sum() / 1024 / 1024, 1),
+        'load_seconds': round(elapsed, 2)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--worker', choices=['full', 'chunked'], help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.getLogger().setLevel(logging.WARNING)
+        run_worker(args.worker, args.path)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'ServiceRequest_export.txt')
+        write_large_export(path, args.rows)
+        print(f"export: {args.rows} rows, {os.path.getsize(path) / 1024 / 1024:.0f} MB on disk")
+
+        print(f"{'mode':>8} {'rows':>9} {'peak MB':>9} {'load MB':>9} {'frame MB':>9} {'seconds':>8}")
+        for mode in ['full', 'chunked']:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', mode, '--path', path],
+                                    capture_output=True, text=True, cwd=ROOT)
+            if output.returncode < 0:
+                print(f"{mode:>8} {args.rows:>9} killed by signal {-output.returncode} (out of memory?)")
+                continue
+            if output.returncode != 0:
+                print(f"{mode:>8} failed: {output.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{mode:>8} {result['rows']:>9} {result['peak_rss_mb']:>9.1f} "
+                  f"{result['peak_rss_mb'] - result['baseline_rss_mb']:>9.1f} {result['frame_mb']:>9.1f} "
+                  f"{result['load_seconds']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: training and prediction hot paths on synthetic exports of several sizes
+For every size a synthetic ServiceRequest export (synthetic_data.py) is written and trained on
+in a fresh process (wall time, peak RSS, per-stage timings). The trained model is then measured
+in a second process (warm single-request latency p50/p95/p99, batch throughput) and by running
+predict.py once per request (cold start, pickle and bundle).
+Results are written as one JSON file tagged with the git commit and machine details, so runs
+from different commits on the same machine can be compared with --compare.
+Boosting stages default to --estimators 10 so the 1M-row size finishes in reasonable time;
+--estimators 100 matches the production configuration.
+Usage: python benchmarks/bench_suite.py [--sizes 10000 100000 1000000] [--output FILE] [--compare FILE]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+from synthetic_data import ROOT, write_synthetic_export
+
+SUITE_VERSION = 1
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+PREDICT_SCRIPT = os.path.join(ROOT, 'python', 'predict.py')
+
+# Metrics printed by --compare, with the direction that counts as an improvement
+COMPARED_METRICS = [
+    ('training.seconds', 'lower'),
+    ('training.peak_rss_mb', 'lower'),
+    ('cold_start.pickle.median_seconds', 'lower'),
+    ('cold_start.bundle.median_seconds', 'lower'),
+    ('warm_latency_ms.p50', 'lower'),
+    ('warm_latency_ms.p95', 'lower'),
+    ('warm_latency_ms.p99', 'lower'),
+    ('batch.rows_per_second', 'higher'),
+    ('serving.peak_rss_mb', 'lower')
+]
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def git_revision():
+    """Current commit and whether the working tree has uncommitted changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def machine_info():
+    import pandas
+    import sklearn
+    return {
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'scikit-learn': sklearn.__version__
+    }
+
+def run_train_worker(path, n_estimators, workers, backend):
+    import vms_model_training
+    from vms_model_training import ShapeFixedVMSTrainer
+    from stage_timing import StageTimer
+
+    vms_model_training.DEFAULT_HYPERPARAMETERS['n_estimators'] = n_estimators
+    timer = StageTimer('training')
+    start = time.perf_counter()
+    model_objects = ShapeFixedVMSTrainer(n_jobs=workers, backend=backend, timer=timer).run_complete_training(
+        [path], use_cache=False)
+    elapsed = time.perf_counter() - start
+
+    model_info = model_objects['model_info']
+    return {
+        'seconds': round(elapsed, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'training_samples': model_info['training_samples'],
+        'feature_count': model_info['feature_count'],
+        'cv_accuracy': round(model_info['cv_accuracy'], 4) if model_info.get('cv_accuracy') is not None else None,
+        'test_accuracy': round(model_info['test_accuracy'], 4),
+        'stages': {stage: total['seconds'] for stage, total in timer.report()['totals'].items()}
+    }
+
+def run_serve_worker(model_path, n_requests, batch_size, repeat):
+    sys.path.insert(0, os.path.join(ROOT, 'python'))
+    from predict import load_model_robust, predict_with_model, predict_batch_with_model
+    from bench_predict_proba import make_requests
+
+    start = time.perf_counter()
+    model_objects, message = load_model_robust(model_path)
+    if model_objects is None:
+        raise SystemExit(f"Could not load model: {message}")
+    load_seconds = time.perf_counter() - start
+
+    requests = make_requests(n_requests, seed=1)
+    for request in requests[:20]:
+        predict_with_model(request, model_objects)
+
+    latencies = []
+    for request in requests:
+        start = time.perf_counter()
+        result = predict_with_model(request, model_objects)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if 'error' in result:
+            raise SystemExit(f"Prediction failed: {result['error']}")
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+
+    batch = make_requests(batch_size, seed=2)
+    batch_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict_batch_with_model(batch, model_objects)
+        batch_seconds.append(time.perf_counter() - start)
+    best = min(batch_seconds)
+
+    return {
+        'warm_latency_ms': {
+            'requests': n_requests,
+            'mean': round(float(np.mean(latencies)), 4),
+            'p50': round(float(p50), 4),
+            'p95': round(float(p95), 4),
+            'p99': round(float(p99), 4),
+            'max': round(float(np.max(latencies)), 4)
+        },
+        'batch': {
+            'rows': batch_size,
+            'repeat': repeat,
+            'best_seconds': round(best, 4),
+            'median_seconds': round(float(np.median(batch_seconds)), 4),
+            'rows_per_second': round(batch_size / best, 1)
+        },
+        'serving': {
+            'load_seconds': round(load_seconds, 4),
+            'peak_rss_mb': round(peak_rss_mb(), 1)
+        }
+    }
+
+def run_worker_process(worker_args, cwd):
+    """Run this script in worker mode and return the JSON it prints last"""
+    output = subprocess.run([sys.executable, os.path.abspath(__file__)] + worker_args,
+                            capture_output=True, text=True, cwd=cwd)
+    if output.returncode != 0:
+        detail = f"signal {-output.returncode}" if output.returncode < 0 else output.stderr.strip().splitlines()[-1:]
+        raise RuntimeError(f"worker {worker_args[1]} failed: {detail}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def measure_cold_start(model_path, request_path, runs):
+    """Wall time of a full predict.py process (interpreter start, imports, model load, one prediction)"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, PREDICT_SCRIPT, request_path, model_path],
+                                capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if 'prediction' not in json.loads(output.stdout):
+            raise RuntimeError(f"predict.py failed for {model_path}: {output.stdout.strip()}")
+    return {
+        'runs': runs,
+        'median_seconds': round(float(np.median(timings)), 4),
+        'min_seconds': round(min(timings), 4)
+    }
+
+def benchmark_size(n_rows, args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        export_path = os.path.join(tmp_dir, 'ServiceRequest_synthetic.txt')
+        write_synthetic_export(export_path, n_rows)
+        result = {'rows': n_rows, 'export_mb': round(os.path.getsize(export_path) / 1024 / 1024, 1)}
+
+        # Training writes model_training_output/ relative to its cwd, so it lands in the temporary directory
+        result['training'] = run_worker_process(
+            ['--worker', 'train', '--path', export_path, '--estimators', str(args.estimators),
+             '--workers', str(args.workers), '--backend', args.backend], cwd=tmp_dir)
+        output_dir = os.path.join(tmp_dir, 'model_training_output')
+        model_path = os.path.join(output_dir, 'maintenance_prediction_model.pkl')
+        bundle_path = os.path.join(output_dir, 'model_bundle')
+
+        result.update(run_worker_process(
+            ['--worker', 'serve', '--path', model_path, '--requests', str(args.requests),
+             '--batch-size', str(args.batch_size), '--repeat', str(args.repeat)], cwd=tmp_dir))
+
+        from bench_predict_proba import make_requests
+        request_path = os.path.join(tmp_dir, 'request.json')
+        with open(request_path, 'w') as f:
+            json.dump(make_requests(1)[0], f)
+        result['cold_start'] = {'pickle': measure_cold_start(model_path, request_path, args.cold_runs)}
+        if os.path.isdir(bundle_path):
+            result['cold_start']['bundle'] = measure_cold_start(bundle_path, request_path, args.cold_runs)
+        return result
+
+def metric(entry, path):
+    for key in path.split('.'):
+        if not isinstance(entry, dict) or key not in entry:
+            return None
+        entry = entry[key]
+    return entry
+
+def compare_results(baseline, current):
+    """Print each compared metric per size: baseline, current and relative change"""
+    if baseline.get('machine', {}).get('hostname') != current['machine']['hostname']:
+        print("warning: baseline was recorded on a different machine; differences are not comparable")
+    print(f"\ncompared with {baseline.get('git_commit', '?')[:12]} ({baseline.get('created', '?')})")
+    print(f"{'rows':>9} {'metric':<34} {'baseline':>12} {'current':>12} {'change':>8}")
+    baseline_sizes = {entry['rows']: entry for entry in baseline.get('sizes', [])}
+    for entry in current['sizes']:
+        previous = baseline_sizes.get(entry['rows'])
+        if previous is None:
+            continue
+        for path, better in COMPARED_METRICS:
+            old, new = metric(previous, path), metric(entry, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change > 0.05 if better == 'lower' else change < -0.05
+            print(f"{entry['rows']:>9} {path:<34} {old:>12.4f} {new:>12.4f} {change:>+7.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--estimators', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Cross-validation worker processes (1 keeps timings comparable)')
+    parser.add_argument('--backend', default='gradient_boosting')
+    parser.add_argument('--requests', type=int, default=1000, help='Warm single-request predictions')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3, help='Batch repetitions (best is reported)')
+    parser.add_argument('--cold-runs', type=int, default=5, help='predict.py processes per model format')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/suite_<commit>.json)')
+    parser.add_argument('--compare', metavar='RESULTS_JSON', help='Earlier results file to compare against')
+    parser.add_argument('--worker', choices=['train', 'serve'], help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.getLogger().setLevel(logging.WARNING)
+        if args.worker == 'train':
+            result = run_train_worker(args.path, args.estimators, args.workers, args.backend)
+        else:
+            result = run_serve_worker(args.path, args.requests, args.batch_size, args.repeat)
+        print(json.dumps(result))
+        return
+
+    commit, dirty = git_revision()
+    results = {
+        'suite_version': SUITE_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'git_dirty': dirty,
+        'machine': machine_info(),
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('output', 'compare', 'worker', 'path')},
+        'sizes': []
+    }
+
+    print(f"{'rows':>9} {'train s':>9} {'train MB':>9} {'accuracy':>9} {'cold s':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'batch rows/s':>13}")
+    for n_rows in args.sizes:
+        entry = benchmark_size(n_rows, args)
+        results['sizes'].append(entry)
+        print(f"{n_rows:>9} {entry['training']['seconds']:>9.1f} {entry['training']['peak_rss_mb']:>9.1f} "
+              f"{entry['training']['test_accuracy']:>9.4f} {entry['cold_start']['pickle']['median_seconds']:>7.2f} "
+              f"{entry['warm_latency_ms']['p50']:>8.3f} {entry['warm_latency_ms']['p95']:>8.3f} "
+              f"{entry['warm_latency_ms']['p99']:>8.3f} {entry['batch']['rows_per_second']:>13,.0f}")
+
+    output_path = args.output or os.path.join(RESULTS_DIR, f"suite_{(commit or 'unknown')[:12]}"
+                                                           f"{'_dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-dictionary keyword scans versus the single-pass keyword index
+The baseline checks every keyword list against every record (`any(k in text ...)` per
+tag, like the PredictionController loops). The index tags all records in one regex scan
+into bitsets. Asserts both give the same tags for every record. Then it times "last
+service of a part for a vehicle": a scan of the vehicle's history (newest first) versus
+FleetHistoryStore.last_service, which reads only that vehicle's tag bits.
+Usage: python benchmarks/bench_text_index.py [--rows 10000 100000] [--lookups 2000]
+"""
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import generate_service_requests
+from text_index import SERVICE_TAGGER, SERVICE_TAG_GROUPS
+from history_store import FleetHistoryStore
+
+FILLER_WORDS = ['kenderaan', 'rosak', 'sudah', 'siap', 'depan', 'belakang', 'kiri', 'kanan', 'unit', 'ok']
+KEYWORD_SHARE = 0.25  # fraction of words drawn from the keyword dictionaries
+
+def make_records(n_rows, seed=0):
+    """Synthetic service history whose texts mix dictionary keywords with filler words"""
+    rng = np.random.default_rng(seed)
+    records = generate_service_requests(n_rows, seed=seed)
+    vocabulary = np.array(SERVICE_TAGGER.keywords + FILLER_WORDS, dtype=object)
+    weights = np.concatenate([np.full(len(SERVICE_TAGGER.keywords), KEYWORD_SHARE / len(SERVICE_TAGGER.keywords)),
+                              np.full(len(FILLER_WORDS), (1 - KEYWORD_SHARE) / len(FILLER_WORDS))])
+
+    def texts(words_per_text):
+        words = rng.choice(vocabulary, size=(n_rows, words_per_text), p=weights)
+        return [' '.join(row) for row in words]
+
+    records['Description'] = [text.upper() for text in texts(4)]
+    records['Response'] = texts(3)
+    return records
+
+def tag_rules():
+    return [(f"{group}:{name}", keywords) for group, rules in SERVICE_TAG_GROUPS for name, keywords in rules]
+
+def scan_tags(texts):
+    """Reference: every tag's keyword list checked against every lowercased record"""
+    rules = tag_rules()
+    return np.array([[any(keyword in text for keyword in keywords) for _, keywords in rules]
+                     for text in texts], dtype=bool).reshape(len(texts), len(rules))
+
+def scan_last_service(history, keywords):
+    """Reference: findLastServiceForVehiclePart over a newest-first history"""
+    for _, record in history.iterrows():
+        text = f"{record['Description']} {record['Response']}".lower()
+        if any(keyword in text for keyword in keywords):
+            return record
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    rules = dict(tag_rules())
+    print(f"tags: {len(SERVICE_TAGGER.tags)}, distinct keywords: {len(SERVICE_TAGGER.keywords)}")
+    print(f"{'rows':>9} {'scan s':>8} {'index s':>8} {'speedup':>8} {'scan lookup ms':>15} {'index lookup ms':>16}")
+    for n_rows in args.rows:
+        records = make_records(n_rows)
+        texts = (records['Description'] + ' ' + records['Response']).str.lower().tolist()
+
+        start = time.perf_counter()
+        expected = scan_tags(texts)
+        scan_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bits = SERVICE_TAGGER.tag_texts(texts)
+        index_seconds = time.perf_counter() - start
+        got = np.column_stack([SERVICE_TAGGER.has_any(bits, tag) for tag in SERVICE_TAGGER.tags])
+        assert (got == expected).all(), 'keyword index tags differ from the per-dictionary scan'
+
+        # Lookups: random (vehicle, part) pairs; the scan walks that vehicle's newest-first history
+        store = FleetHistoryStore.from_history(records)
+        histories = {vehicle: group for vehicle, group in
+                     records.sort_values('Datereceived', ascending=False, kind='mergesort').groupby('Vehicle')}
+        rng = np.random.default_rng(1)
+        vehicles = rng.choice(sorted(histories), size=args.lookups)
+        parts = rng.choice([tag for tag in SERVICE_TAGGER.tags if tag.startswith('part:')], size=args.lookups)
+
+        start = time.perf_counter()
+        scanned = [scan_last_service(histories[vehicle], rules[part]) for vehicle, part in zip(vehicles, parts)]
+        scan_ms = (time.perf_counter() - start) / args.lookups * 1000
+
+        start = time.perf_counter()
+        looked_up = [store.last_service(vehicle, part) for vehicle, part in zip(vehicles, parts)]
+        lookup_ms = (time.perf_counter() - start) / args.lookups * 1000
+
+        for reference, record in zip(scanned, looked_up):
+            assert (reference is None) == (record is None), 'last service lookup differs from the scan'
+            if reference is not None:
+                assert pd.Timestamp(reference['Datereceived']) == pd.Timestamp(record['Datereceived']), \
+                    'last service lookup differs from the scan'
+
+        print(f"{n_rows:>9} {scan_seconds:>8.2f} {index_seconds:>8.3f} {scan_seconds / index_seconds:>7.1f}x "
+              f"{scan_ms:>15.3f} {lookup_ms:>16.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Synthetic ServiceRequest data for benchmarks
+Builds on ShapeFixedVMSTrainer.generate_synthetic_data and adds bilingual
+Description/Response text and request dates so text and time stages do real work.
+"""
+
+import os
+import sys
+import logging
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from vms_model_training import ShapeFixedVMSTrainer, TRAINING_COLUMNS
+
+DESCRIPTION_TERMS = [
+    'brake', 'brek', 'brake pad', 'tayar', 'tire', 'tyre', 'wheel', 'enjin', 'engine', 'piston',
+    'minyak', 'oil', 'pelincir', 'elektrik', 'wiring', 'battery', 'lampu', 'badan', 'panel', 'paint',
+    'angin', 'udara', 'compressor', 'hidraulik', 'hydraulic', 'pump', 'cuci', 'lori', 'bocor', 'rosak',
+    'tukar', 'baiki', 'service', 'check', 'periksa', 'tidak', 'boleh', 'start', 'bunyi', 'kuat',
+    'depan', 'belakang', 'kiri', 'kanan', 'tangki', 'cpko', 'gearbox', 'clutch', 'radiator', 'aircond'
+]
+
+def make_text(rng, n_rows, n_words=4, n_part_codes=1500):
+    """Random descriptions mixing maintenance terms with part codes (so TF-IDF fills its 500 features)"""
+    terms = np.asarray(DESCRIPTION_TERMS + [f"p{code}" for code in range(n_part_codes)], dtype=object)
+    words = terms[rng.randint(0, len(terms), size=(n_rows, n_words))]
+    return pd.Series([' '.join(row) for row in words])
+
+def generate_service_requests(n_rows, seed=42):
+    """Raw ServiceRequest-shaped DataFrame with realistic text and dates"""
+    logging.getLogger().setLevel(logging.WARNING)
+    df = ShapeFixedVMSTrainer().generate_synthetic_data(n_rows)
+
+    rng = np.random.RandomState(seed)
+    df['Description'] = make_text(rng, n_rows)
+    df['Response'] = make_text(rng, n_rows, n_words=3)
+
+    start = np.datetime64('2020-01-01T08:00')
+    minutes = rng.randint(0, 6 * 365 * 24 * 60, n_rows).astype('timedelta64[m]')
+    df['Datereceived'] = (start + minutes).astype('datetime64[ns]')
+    return df
+
+def write_synthetic_export(path, n_rows, seed=42):
+    """Tab-separated ServiceRequest export of generate_service_requests rows (read by the training loader)"""
+    df = generate_service_requests(n_rows, seed)
+    df['Datereceived'] = df['Datereceived'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    df[TRAINING_COLUMNS].to_csv(path, sep='\t', index=False)
+    return path
@@ -28,6 +28,15 @@
         'key' => env('RESEND_KEY'),
     ],
 
+    'vms_predictor' => [
+        // Persistent python/prediction_server.py endpoint; leave unset to always use the CLI
+        'url' => env('VMS_PREDICTOR_URL'),
+        'socket' => env('VMS_PREDICTOR_SOCKET'),
+        'timeout' => env('VMS_PREDICTOR_TIMEOUT', 5),
+        // Pickle file or model bundle directory (model_training_output/model_bundle)
+        'model_path' => env('VMS_MODEL_PATH'),
+    ],
+
     'slack' => [
         'notifications' => [
             'bot_user_oauth_token' => env('SLACK_BOT_USER_OAUTH_TOKEN'),
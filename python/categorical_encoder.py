@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Deterministic categorical encoder for Vehicle and Building codes
+Replaces abs(hash(value)) % N, which Python randomizes per interpreter, with a
+vocabulary fitted at training time and saved with the model (pickle and bundle
+manifest). Values seen fewer than min_frequency times share the unknown code 0,
+so the model also learns how to treat vehicles it has never seen.
+Models saved without an encoder fall back to crc32 hashing, which matches the
+PHP side's hashToNumeric (abs(crc32($value)) % 10000).
+"""
+
+import zlib
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN_CODE = 0
+MISSING_VALUES = ['', 'NAN', 'NONE', 'NULL']
+
+def normalize_category(value):
+    """Canonical text for one value: integral numbers without '.0', text stripped and upper-cased"""
+    if value is None:
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float):
+        if np.isnan(value):
+            return None
+        if value.is_integer():
+            value = int(value)
+    text = str(value).strip().upper()
+    if text.endswith('.0') and text[:-2].lstrip('-').isdigit():
+        text = text[:-2]
+    return None if text in MISSING_VALUES else text
+
+def factorize_categories(series):
+    """Row codes into a list of normalized unique values (normalization runs once per distinct value)"""
+    codes, uniques = pd.factorize(pd.Series(series))
+    return codes, [normalize_category(value) for value in uniques]
+
+def crc32_code(value, n_buckets=10000):
+    """Stable hashing trick shared with PHP's hashToNumeric"""
+    return zlib.crc32(str(value).encode('utf-8')) % n_buckets
+
+class StableCategoricalEncoder:
+    """Vocabulary encoder: value -> 1..n in sorted order, rare/unseen/missing -> UNKNOWN_CODE"""
+
+    def __init__(self, vocabulary=None, min_frequency=2):
+        self.vocabulary = vocabulary or {}
+        self.min_frequency = min_frequency
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    @classmethod
+    def fit(cls, series, min_frequency=2):
+        codes, values = factorize_categories(series)
+        counts = np.bincount(codes[codes >= 0], minlength=len(values))
+
+        # Distinct raw values can normalize to the same category (' wrh311' and 'WRH311')
+        totals = {}
+        for value, count in zip(values, counts):
+            if value is not None:
+                totals[value] = totals.get(value, 0) + int(count)
+
+        kept = sorted(value for value, count in totals.items() if count >= min_frequency)
+        return cls({value: code for code, value in enumerate(kept, start=UNKNOWN_CODE + 1)}, min_frequency)
+
+    def transform(self, series):
+        """Codes for a whole column: one factorize pass plus a lookup table gather"""
+        codes, values = factorize_categories(series)
+        # Last slot catches the -1 sentinel pandas uses for missing values
+        table = np.array([self.vocabulary.get(value, UNKNOWN_CODE) for value in values] + [UNKNOWN_CODE],
+                         dtype=np.int64)
+        return pd.Series(table[codes], index=pd.Series(series).index)
+
+    def encode(self, value):
+        """Code for a single value: O(1) dictionary lookup"""
+        return self.vocabulary.get(normalize_category(value), UNKNOWN_CODE)
+
+    def to_dict(self):
+        return {'vocabulary': self.vocabulary, 'min_frequency': self.min_frequency}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(dict(state['vocabulary']), state.get('min_frequency', 2))
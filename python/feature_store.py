@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Per-vehicle history feature store
+Keeps service_count, average_interval and days_since_last for every Vehicle as
+running aggregates, built once from the ServiceRequest history and updated in
+O(1) per new record. Definitions follow PredictionController::getVehicleHistory:
+- cleaning requests (MrType 2) are not maintenance services
+- intervals are odometer deltas between consecutive maintenance services
+  (both readings above 1,000 KM, increasing, and under 100,000 KM apart)
+- average_interval defaults to 1,000 KM and days_since_last to 365 days
+Record IDs already folded in (from the exports and from later updates) are kept,
+so a retried or replayed record is not counted twice.
+Written by ShapeFixedVMSTrainer next to the model; read by predict.py.
+"""
+
+import os
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from record_ids import RecordIdSet, record_id
+
+FEATURE_STORE_FILENAME = 'vehicle_feature_store.json'
+FEATURE_STORE_FORMAT_VERSION = 2
+
+HISTORY_FEATURES = ['service_count', 'average_interval', 'days_since_last']
+
+CLEANING_MR_TYPE = 2
+MIN_INTERVAL_ODOMETER = 1000
+MAX_INTERVAL = 100000
+DEFAULT_AVERAGE_INTERVAL = 1000
+DEFAULT_DAYS_SINCE_LAST = 365
+
+def normalize_vehicle(vehicle):
+    """Vehicle key as the PHP side matches it (UPPER(TRIM(Vehicle)))"""
+    return str(vehicle).strip().upper()
+
+def is_valid_interval(previous_odometer, odometer):
+    """Scalar version of the interval filter used by calculateMaintenanceIntervals"""
+    return (previous_odometer is not None and odometer is not None
+            and previous_odometer > MIN_INTERVAL_ODOMETER and odometer > MIN_INTERVAL_ODOMETER
+            and 0 < odometer - previous_odometer < MAX_INTERVAL)
+
+def _maintenance_history(df, date_column):
+    """Maintenance rows with normalized vehicle, date and odometer, in per-vehicle time order"""
+    history = pd.DataFrame({
+        'vehicle': df['Vehicle'].astype(str).str.strip().str.upper(),
+        'date': pd.to_datetime(df[date_column], errors='coerce'),
+        'odometer': pd.to_numeric(df['Odometer'], errors='coerce') if 'Odometer' in df.columns else np.nan,
+        'mr_type': pd.to_numeric(df['MrType'], errors='coerce') if 'MrType' in df.columns else np.nan
+    }, index=df.index)
+    history['is_maintenance'] = history['mr_type'] != CLEANING_MR_TYPE
+    # Stable sort keeps file order for records with the same timestamp
+    return history.sort_values(['vehicle', 'date'], kind='mergesort', na_position='first')
+
+def _interval_columns(maintenance):
+    """Valid odometer interval (or NaN) from each maintenance record to the previous one of the same vehicle"""
+    previous_odometer = maintenance.groupby('vehicle', sort=False)['odometer'].shift()
+    interval = maintenance['odometer'] - previous_odometer
+    valid = ((previous_odometer > MIN_INTERVAL_ODOMETER) & (maintenance['odometer'] > MIN_INTERVAL_ODOMETER)
+             & (interval > 0) & (interval < MAX_INTERVAL))
+    return interval.where(valid)
+
+class VehicleFeatureStore:
+    """Running per-vehicle aggregates: count, interval sum/count and the last maintenance service"""
+
+    def __init__(self, vehicles=None, record_ids=None):
+        # vehicle -> {'service_count', 'interval_sum', 'interval_count', 'last_date', 'last_odometer'}
+        self.vehicles = vehicles or {}
+        self.record_ids = record_ids if record_ids is not None else RecordIdSet()
+
+    def __len__(self):
+        return len(self.vehicles)
+
+    def __contains__(self, vehicle):
+        return normalize_vehicle(vehicle) in self.vehicles
+
+    @classmethod
+    def from_history(cls, df, date_column='Datereceived'):
+        """Build the store from a ServiceRequest DataFrame in one vectorized pass"""
+        history = _maintenance_history(df, date_column)
+        maintenance = history[history['is_maintenance']].copy()
+        maintenance['interval'] = _interval_columns(maintenance)
+
+        grouped = maintenance.groupby('vehicle', sort=False)
+        summary = pd.DataFrame({
+            'service_count': grouped.size(),
+            'interval_sum': grouped['interval'].sum(),
+            'interval_count': grouped['interval'].count(),
+            'last_date': grouped['date'].last(),
+            'last_odometer': grouped['odometer'].last()
+        })
+
+        vehicles = {}
+        for vehicle, row in summary.iterrows():
+            vehicles[vehicle] = {
+                'service_count': int(row['service_count']),
+                'interval_sum': float(row['interval_sum']),
+                'interval_count': int(row['interval_count']),
+                'last_date': row['last_date'].to_pydatetime() if pd.notna(row['last_date']) else None,
+                'last_odometer': float(row['last_odometer']) if pd.notna(row['last_odometer']) else None
+            }
+        record_ids = RecordIdSet.from_column(df['ID']) if 'ID' in df.columns else None
+        return cls(vehicles, record_ids)
+
+    def update(self, record):
+        """Fold one new ServiceRequest record into its vehicle's aggregates in O(1); False for a seen ID
+
+        Records are expected in time order; an older record still counts as a
+        service but does not change the interval chain or the last service.
+        """
+        new_id = record_id(record.get('ID'))
+        if new_id is not None and not self.record_ids.add(new_id):
+            return False
+        try:
+            mr_type = int(float(record.get('MrType', 0)))
+        except (TypeError, ValueError):
+            mr_type = None
+        if mr_type == CLEANING_MR_TYPE:
+            return True
+
+        vehicle = normalize_vehicle(record.get('Vehicle', 'UNKNOWN'))
+        state = self.vehicles.setdefault(vehicle, {
+            'service_count': 0, 'interval_sum': 0.0, 'interval_count': 0,
+            'last_date': None, 'last_odometer': None
+        })
+
+        date = pd.to_datetime(record.get('Datereceived'), errors='coerce')
+        date = date.to_pydatetime() if pd.notna(date) else None
+        odometer = pd.to_numeric(record.get('Odometer'), errors='coerce')
+        odometer = float(odometer) if pd.notna(odometer) else None
+
+        state['service_count'] += 1
+        if state['last_date'] is not None and (date is None or date < state['last_date']):
+            return True
+
+        if is_valid_interval(state['last_odometer'], odometer):
+            state['interval_sum'] += odometer - state['last_odometer']
+            state['interval_count'] += 1
+        state['last_date'] = date
+        state['last_odometer'] = odometer
+        return True
+
+    def replay(self, records):
+        """Fold in records posted after this store was built; returns the ones it did not already cover
+
+        A record whose ID the store has seen is already in the history the store was
+        built from, so it is skipped. Without IDs to compare, a record dated at or
+        before its vehicle's last service here is taken as covered.
+        """
+        pending = []
+        for record in records:
+            if record_id(record.get('ID')) is None or not len(self.record_ids):
+                state = self.vehicles.get(normalize_vehicle(record.get('Vehicle', 'UNKNOWN')))
+                date = pd.to_datetime(record.get('Datereceived'), errors='coerce')
+                if state is not None and state['last_date'] is not None and (pd.isna(date) or date <= state['last_date']):
+                    continue
+            if self.update(record):
+                pending.append(record)
+        return pending
+
+    def lookup(self, vehicle, as_of=None):
+        """History features for a vehicle at as_of (default now), or None for an unknown vehicle"""
+        state = self.vehicles.get(normalize_vehicle(vehicle))
+        if state is None:
+            return None
+
+        if state['interval_count']:
+            average_interval = state['interval_sum'] / state['interval_count']
+        else:
+            average_interval = DEFAULT_AVERAGE_INTERVAL
+
+        if state['last_date'] is not None:
+            days_since_last = max(((as_of or datetime.now()) - state['last_date']).days, 0)
+        else:
+            days_since_last = DEFAULT_DAYS_SINCE_LAST
+
+        return {
+            'service_count': state['service_count'],
+            'average_interval': round(average_interval),
+            'days_since_last': days_since_last
+        }
+
+    def save(self, path):
+        """Write the store as JSON (atomic replace, so readers never see a partial file)"""
+        vehicles = {
+            vehicle: dict(state, last_date=state['last_date'].isoformat() if state['last_date'] else None)
+            for vehicle, state in self.vehicles.items()
+        }
+        staging_path = f"{path}.tmp"
+        with open(staging_path, 'w') as f:
+            json.dump({'format_version': FEATURE_STORE_FORMAT_VERSION, 'vehicles': vehicles,
+                       'record_ids': self.record_ids.to_json()}, f)
+        os.replace(staging_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            payload = json.load(f)
+
+        if payload.get('format_version') != FEATURE_STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported feature store format version: {payload.get('format_version')}")
+
+        vehicles = payload['vehicles']
+        for state in vehicles.values():
+            state['last_date'] = datetime.fromisoformat(state['last_date']) if state['last_date'] else None
+        return cls(vehicles, RecordIdSet.from_json(payload['record_ids']))
+
+def point_in_time_history_features(df, date_column='Datereceived'):
+    """service_count, average_interval and days_since_last for every row, from earlier maintenance only
+
+    Each row sees the store as it stood just before that request was received,
+    which is what the prediction path sees, so training rows leak no later history.
+    """
+    history = _maintenance_history(df, date_column)
+    maintenance_flag = history['is_maintenance'].astype(int)
+
+    # Maintenance services strictly before each row
+    service_count = maintenance_flag.groupby(history['vehicle']).cumsum() - maintenance_flag
+
+    # Interval chain only runs over maintenance rows; carry the running totals to every row
+    maintenance = history[history['is_maintenance']].copy()
+    maintenance['interval'] = _interval_columns(maintenance)
+    maintenance['interval_sum'] = maintenance['interval'].fillna(0).groupby(maintenance['vehicle']).cumsum()
+    maintenance['interval_count'] = maintenance['interval'].notna().astype(int).groupby(maintenance['vehicle']).cumsum()
+
+    running = maintenance[['interval_sum', 'interval_count', 'date']].reindex(history.index)
+    # Values up to and including each maintenance row, then shifted so a row only sees earlier services
+    running = running.groupby(history['vehicle']).ffill()
+    running = running.groupby(history['vehicle']).shift()
+
+    average_interval = (running['interval_sum'] / running['interval_count']).where(running['interval_count'] > 0)
+    average_interval = average_interval.fillna(DEFAULT_AVERAGE_INTERVAL).round()
+
+    days_since_last = (history['date'] - running['date']).dt.days.clip(lower=0)
+    days_since_last = days_since_last.fillna(DEFAULT_DAYS_SINCE_LAST)
+
+    features = pd.DataFrame({
+        'service_count': service_count,
+        'average_interval': average_interval,
+        'days_since_last': days_since_last
+    }).astype(int)
+    return features.reindex(df.index)
+
+def find_feature_store(model_path, max_levels=3):
+    """Locate the feature store saved alongside a model pickle or bundle (searching up from it)"""
+    directory = model_path if os.path.isdir(model_path) else os.path.dirname(model_path)
+    for _ in range(max_levels):
+        candidate = os.path.join(directory or '.', FEATURE_STORE_FILENAME)
+        if os.path.exists(candidate):
+            return candidate
+        parent = os.path.dirname(os.path.abspath(directory or '.'))
+        if parent == os.path.abspath(directory or '.'):
+            break
+        directory = parent
+    return None
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Materialized fleet-wide ServiceRequest statistics
+Keeps the aggregates behind PredictionController::getVehicleStatistics and the
+MaintenanceAnalyticsController trend/breakdown queries in mergeable form:
+- record count and distinct vehicles
+- Welford running mean/variance, min and max of Odometer readings between 1,000
+  and 3,000,000 KM (getVehicleStatistics' TRY_CAST filter)
+- per-MrType counts, per-month counts by MrType, and the Datereceived range
+- per-vehicle service counts, plus completed (Status 2) services by MrType
+A new record updates everything in O(1), and a record ID seen before is not counted
+again (IDs are kept compactly, see record_ids.py). Two statistics objects built from
+disjoint records (e.g. different exports or worker shards) merge exactly.
+snapshot() is the dashboard view.
+save() writes it to a small JSON file that dashboards read as-is (read_snapshot), with
+the full state in a *_state.json file beside it so a later process can resume updating.
+Usage: python python/fleet_statistics.py [--data EXPORT ...] [--output PATH]
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+from datetime import datetime
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from feature_store import normalize_vehicle
+from record_ids import RecordIdSet, record_id
+from service_request_loader import find_service_request_exports, iter_service_request_chunks
+
+logger = logging.getLogger(__name__)
+
+FLEET_STATISTICS_FILENAME = 'fleet_statistics.json'
+FLEET_STATISTICS_FORMAT_VERSION = 3
+# The server rewrites the small snapshot on every update, and the full state after this many
+# new records or seconds (and at shutdown)
+STATE_SAVE_RECORDS = 1000
+STATE_SAVE_SECONDS = 60
+
+SOURCE_COLUMNS = ['ID', 'Vehicle', 'Odometer', 'MrType', 'Status', 'Datereceived']
+ODOMETER_RANGE = (1000, 3000000)
+COMPLETED_STATUS = '2'
+DEFAULT_STD_DEV = 500000
+# MaintenanceAnalyticsController::getMrTypeName
+MR_TYPE_NAMES = {'1': 'Maintenance', '2': 'Cleaning/Washing', '3': 'Tires', '4': 'Rental', '5': 'Operation'}
+
+class RunningMoments:
+    """Count, mean and sum of squared deviations (Welford), with min/max; mergeable (Chan et al.)"""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return cls()
+        mean = float(values.mean())
+        return cls(len(values), mean, float(((values - mean) ** 2).sum()), float(values.min()), float(values.max()))
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    @property
+    def std_dev(self):
+        """Sample standard deviation (SQL Server STDEV), None below two values"""
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else None
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'minimum': self.minimum, 'maximum': self.maximum}
+
+def _mr_type_key(value):
+    """MrType as the PHP side groups it (trimmed, numeric types as integers), or None when missing"""
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+        return None
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        return str(int(float(text)))
+    except ValueError:
+        return text
+
+def _month_key(date):
+    return f"{date.year:04d}-{date.month:02d}"
+
+class FleetStatistics:
+    """Mergeable fleet aggregates with O(1) updates and a dashboard snapshot"""
+
+    def __init__(self):
+        self.total_records = 0
+        self.record_ids = RecordIdSet()
+        self.odometer = RunningMoments()
+        self.odometer_vehicles = set()
+        self.mr_type_counts = Counter()
+        self.monthly = {}  # 'YYYY-MM' -> Counter of MrType
+        self.vehicles = {}  # vehicle -> {'services': n, 'completed': {mr_type: n}}
+        self.earliest = None
+        self.latest = None
+        # Derived from vehicles (not saved): services with a vehicle, and completed services by type summed
+        # over the vehicles at each completed-count level, so the snapshot never walks every vehicle
+        self.vehicle_services = 0
+        self.completed_levels = {}  # completed count -> [vehicles at that count, Counter of MrType]
+
+    def __len__(self):
+        return self.total_records
+
+    @classmethod
+    def from_history(cls, df):
+        """Build the aggregates from a ServiceRequest DataFrame with vectorized group-bys"""
+        stats = cls()
+        stats.total_records = len(df)
+        if not len(df):
+            return stats
+        if 'ID' in df.columns:
+            stats.record_ids = RecordIdSet.from_column(df['ID'])
+
+        vehicle = df['Vehicle'].fillna('').astype(str).str.strip().str.upper()
+        odometer = pd.to_numeric(df['Odometer'], errors='coerce') if 'Odometer' in df.columns \
+            else pd.Series(np.nan, index=df.index)
+        mr_type = df['MrType'].map(_mr_type_key) if 'MrType' in df.columns else pd.Series(None, index=df.index)
+        status = df['Status'].map(_mr_type_key) if 'Status' in df.columns else pd.Series(None, index=df.index)
+        date = pd.to_datetime(df['Datereceived'], errors='coerce') if 'Datereceived' in df.columns \
+            else pd.Series(pd.NaT, index=df.index)
+
+        in_range = odometer.between(*ODOMETER_RANGE)
+        stats.odometer = RunningMoments.from_values(odometer[in_range])
+        stats.odometer_vehicles = set(vehicle[odometer.notna() & (vehicle != '')])
+        stats.mr_type_counts = Counter(mr_type.dropna().value_counts().to_dict())
+
+        # Monthly trends only count numeric MrTypes with a date (as the trend query does)
+        dated = date.notna() & mr_type.notna() & mr_type.str.isdigit().fillna(False).astype(bool)
+        months = date[dated].dt.strftime('%Y-%m')
+        for (month, kind), count in pd.Series(1, index=pd.MultiIndex.from_arrays(
+                [months, mr_type[dated]])).groupby(level=[0, 1]).sum().items():
+            stats.monthly.setdefault(month, Counter())[kind] = int(count)
+        if date.notna().any():
+            stats.earliest, stats.latest = date.min().to_pydatetime(), date.max().to_pydatetime()
+
+        services = vehicle[vehicle != ''].value_counts()
+        completed = (status == COMPLETED_STATUS) & (vehicle != '') & mr_type.notna()
+        completed_counts = pd.Series(1, index=pd.MultiIndex.from_arrays(
+            [vehicle[completed], mr_type[completed]])).groupby(level=[0, 1]).sum()
+        for name, count in services.items():
+            stats.vehicles[name] = {'services': int(count), 'completed': {}}
+        for (name, kind), count in completed_counts.items():
+            stats.vehicles[name]['completed'][kind] = int(count)
+        stats._index_vehicles()
+        return stats
+
+    def _index_vehicles(self):
+        """Rebuild the derived per-vehicle totals from self.vehicles"""
+        self.vehicle_services = sum(state['services'] for state in self.vehicles.values())
+        self.completed_levels = {}
+        for state in self.vehicles.values():
+            self._move_level(state['completed'], 1)
+
+    def _move_level(self, completed, sign):
+        """Add (sign=1) or remove (sign=-1) one vehicle's completed counts at its level"""
+        level = sum(completed.values())
+        if not level:
+            return
+        entry = self.completed_levels.setdefault(level, [0, Counter()])
+        entry[0] += sign
+        if sign > 0:
+            entry[1].update(completed)
+        else:
+            entry[1].subtract(completed)
+        if not entry[0]:
+            del self.completed_levels[level]
+
+    @classmethod
+    def from_exports(cls, data_paths=None):
+        """Stream the ServiceRequest exports into statistics, one chunk at a time (merged)"""
+        stats = cls()
+        seen_ids = set()
+        for path in data_paths or find_service_request_exports():
+            try:
+                for chunk in iter_service_request_chunks(path, columns=SOURCE_COLUMNS):
+                    if 'ID' in chunk.columns:
+                        # Exports overlap; a record counts once
+                        ids = chunk['ID']
+                        fresh = ~ids.isin(seen_ids) & ~ids.duplicated()
+                        seen_ids.update(ids[fresh].dropna().tolist())
+                        chunk = chunk[fresh | ids.isna()]
+                    stats.merge(cls.from_history(chunk))
+            except Exception as e:
+                logger.warning(f"Failed to load {path}: {e}")
+        return stats
+
+    def update(self, record):
+        """Fold one new ServiceRequest record into every aggregate in O(1); False for an ID already counted"""
+        new_id = record_id(record.get('ID'))
+        if new_id is not None and not self.record_ids.add(new_id):
+            return False
+        self.total_records += 1
+        vehicle = normalize_vehicle(record.get('Vehicle') or '')
+        mr_type = _mr_type_key(record.get('MrType'))
+        status = _mr_type_key(record.get('Status'))
+
+        odometer = pd.to_numeric(record.get('Odometer'), errors='coerce')
+        if pd.notna(odometer):
+            if vehicle:
+                self.odometer_vehicles.add(vehicle)
+            if ODOMETER_RANGE[0] <= odometer <= ODOMETER_RANGE[1]:
+                self.odometer.update(float(odometer))
+
+        if mr_type is not None:
+            self.mr_type_counts[mr_type] += 1
+
+        date = pd.to_datetime(record.get('Datereceived'), errors='coerce')
+        if pd.notna(date):
+            date = date.to_pydatetime()
+            self.earliest = date if self.earliest is None else min(self.earliest, date)
+            self.latest = date if self.latest is None else max(self.latest, date)
+            if mr_type is not None and mr_type.isdigit():
+                self.monthly.setdefault(_month_key(date), Counter())[mr_type] += 1
+
+        if vehicle:
+            state = self.vehicles.setdefault(vehicle, {'services': 0, 'completed': {}})
+            state['services'] += 1
+            self.vehicle_services += 1
+            if status == COMPLETED_STATUS and mr_type is not None:
+                self._move_level(state['completed'], -1)
+                state['completed'][mr_type] = state['completed'].get(mr_type, 0) + 1
+                self._move_level(state['completed'], 1)
+        return True
+
+    def merge(self, other):
+        """Add another statistics object's records to this one (exact for every aggregate)
+
+        The two must cover disjoint records: an overlapping record cannot be taken out
+        of the other side's aggregates, so shared IDs raise a ValueError.
+        """
+        merged_ids = self.record_ids.union(other.record_ids)
+        overlap = len(self.record_ids) + len(other.record_ids) - len(merged_ids)
+        if overlap:
+            raise ValueError(f"Cannot merge fleet statistics sharing {overlap} record IDs (inputs must be disjoint)")
+        self.total_records += other.total_records
+        self.record_ids = merged_ids
+        self.odometer.merge(other.odometer)
+        self.odometer_vehicles |= other.odometer_vehicles
+        self.mr_type_counts.update(other.mr_type_counts)
+        for month, counts in other.monthly.items():
+            self.monthly.setdefault(month, Counter()).update(counts)
+        for vehicle, state in other.vehicles.items():
+            mine = self.vehicles.setdefault(vehicle, {'services': 0, 'completed': {}})
+            mine['services'] += state['services']
+            for kind, count in state['completed'].items():
+                mine['completed'][kind] = mine['completed'].get(kind, 0) + count
+        for attribute, pick in (('earliest', min), ('latest', max)):
+            theirs = getattr(other, attribute)
+            if theirs is not None:
+                mine = getattr(self, attribute)
+                setattr(self, attribute, theirs if mine is None else pick(mine, theirs))
+        self._index_vehicles()
+        return self
+
+    def vehicle_statistics(self):
+        """getVehicleStatistics' result shape"""
+        return {
+            'total_vehicles': len(self.odometer_vehicles),
+            'avg_mileage': round(self.odometer.mean) if self.odometer.count else None,
+            'max_mileage': round(self.odometer.maximum) if self.odometer.count else None,
+            'std_dev': round(self.odometer.std_dev or DEFAULT_STD_DEV)
+        }
+
+    def monthly_trends(self):
+        """getAllMaintenanceTrendsDirect's monthly rows, oldest first"""
+        trends = []
+        for month in sorted(self.monthly):
+            counts = self.monthly[month]
+            year, month_number = (int(part) for part in month.split('-'))
+            trends.append({
+                'year': year,
+                'month': month_number,
+                'month_name': datetime(year, month_number, 1).strftime('%b %Y'),
+                'total_services': sum(counts.values()),
+                'maintenance_services': counts.get('1', 0),
+                'cleaning_services': counts.get('2', 0),
+                'tire_services': counts.get('3', 0)
+            })
+        return trends
+
+    def service_type_breakdown(self):
+        """getAllServiceTypeBreakdownDirect's rows, most frequent first"""
+        return [{
+            'type_id': int(kind) if kind.isdigit() else kind,
+            'type_name': MR_TYPE_NAMES.get(kind, f"Type {kind}"),
+            'count': count,
+            'percentage': round(count / self.total_records * 100, 1) if self.total_records else 0
+        } for kind, count in self.mr_type_counts.most_common()]
+
+    def frequent_breakdown_service_types(self):
+        """getFrequentBreakdownServiceTypes: completed services by type for vehicles above the average count"""
+        levels = self.completed_levels
+        if not levels:
+            return {}
+        vehicles = sum(entry[0] for entry in levels.values())
+        average = sum(level * entry[0] for level, entry in levels.items()) / vehicles
+        threshold = min((level for level in levels if level > average), default=None)
+        if threshold is None:
+            # No vehicle above the average: take the top quarter (ties at the cut included)
+            top, remaining = None, int(np.ceil(vehicles * 0.25))
+            for level in sorted(levels, reverse=True):
+                top, remaining = level, remaining - levels[level][0]
+                if remaining <= 0:
+                    break
+            threshold = top
+
+        counts = Counter()
+        for level, (_, types) in levels.items():
+            if level >= threshold:
+                counts.update(types)
+        counts = +counts
+        total = sum(counts.values())
+        return {MR_TYPE_NAMES.get(kind, 'Other'): {'count': count, 'percentage': round(count / total * 100, 1)}
+                for kind, count in counts.items()}
+
+    def snapshot(self):
+        """Everything the dashboards read, precomputed"""
+        trends = self.monthly_trends()
+        return {
+            'total_records': self.total_records,
+            'vehicle_statistics': self.vehicle_statistics(),
+            'service_type_breakdown': self.service_type_breakdown(),
+            'frequent_breakdown_service_types': self.frequent_breakdown_service_types(),
+            'monthly_trends': trends,
+            'average_monthly_services': round(sum(row['total_services'] for row in trends) / len(trends), 1)
+            if trends else 0,
+            'average_services_per_vehicle': round(self.vehicle_services / len(self.vehicles), 1)
+            if self.vehicles else 0,
+            'earliest_service': self.earliest.date().isoformat() if self.earliest else None,
+            'latest_service': self.latest.date().isoformat() if self.latest else None,
+            'generated_at': datetime.now().isoformat(timespec='seconds')
+        }
+
+    def save(self, path, include_state=True):
+        """Write the snapshot to path and the state beside it (atomic replaces, so readers never see a partial file)
+
+        With include_state=False only the small snapshot is rewritten; the state
+        file stays at its last save.
+        """
+        if include_state:
+            self._save_state(state_path(path))
+        _write(path, {'snapshot': self.snapshot()})
+        return path
+
+    def _save_state(self, path):
+        state = {
+            'total_records': self.total_records,
+            'record_ids': self.record_ids.to_json(),
+            'odometer': self.odometer.to_dict(),
+            'odometer_vehicles': sorted(self.odometer_vehicles),
+            'mr_type_counts': dict(self.mr_type_counts),
+            'monthly': {month: dict(counts) for month, counts in self.monthly.items()},
+            'vehicles': self.vehicles,
+            'earliest': self.earliest.isoformat() if self.earliest else None,
+            'latest': self.latest.isoformat() if self.latest else None
+        }
+        _write(path, {'state': state})
+
+    @classmethod
+    def load(cls, path):
+        """Resume from the state saved next to a snapshot file"""
+        state = _read(state_path(path))['state']
+        stats = cls()
+        stats.total_records = state['total_records']
+        stats.record_ids = RecordIdSet.from_json(state['record_ids'])
+        stats.odometer = RunningMoments(**state['odometer'])
+        stats.odometer_vehicles = set(state['odometer_vehicles'])
+        stats.mr_type_counts = Counter(state['mr_type_counts'])
+        stats.monthly = {month: Counter(counts) for month, counts in state['monthly'].items()}
+        stats.vehicles = state['vehicles']
+        stats.earliest = datetime.fromisoformat(state['earliest']) if state['earliest'] else None
+        stats.latest = datetime.fromisoformat(state['latest']) if state['latest'] else None
+        stats._index_vehicles()
+        return stats
+
+def state_path(path):
+    """The state file saved beside a snapshot file (fleet_statistics.json -> fleet_statistics_state.json)"""
+    return f"{os.path.splitext(path)[0]}_state.json"
+
+def _write(path, payload):
+    staging_path = f"{path}.tmp"
+    with open(staging_path, 'w') as f:
+        json.dump({'format_version': FLEET_STATISTICS_FORMAT_VERSION, **payload}, f)
+    os.replace(staging_path, path)
+
+def _read(path):
+    with open(path, 'r') as f:
+        payload = json.load(f)
+
+    if payload.get('format_version') != FLEET_STATISTICS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported fleet statistics format version: {payload.get('format_version')}")
+    return payload
+
+def read_snapshot(path):
+    """The dashboard view from a snapshot file, without loading the per-vehicle state"""
+    return _read(path)['snapshot']
+
+def find_fleet_statistics(model_path, max_levels=3):
+    """Locate the statistics file saved alongside a model pickle or bundle (searching up from it)"""
+    directory = model_path if os.path.isdir(model_path) else os.path.dirname(model_path)
+    for _ in range(max_levels):
+        candidate = os.path.join(directory or '.', FLEET_STATISTICS_FILENAME)
+        if os.path.exists(candidate):
+            return candidate
+        parent = os.path.dirname(os.path.abspath(directory or '.'))
+        if parent == os.path.abspath(directory or '.'):
+            break
+        directory = parent
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize fleet-wide ServiceRequest statistics for the dashboards')
+    parser.add_argument('--data', nargs='+', metavar='EXPORT', help='ServiceRequest exports (default: data/ exports)')
+    parser.add_argument('--output', default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model_training_output', FLEET_STATISTICS_FILENAME),
+        help='Statistics file (default: model_training_output/fleet_statistics.json)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    stats = FleetStatistics.from_exports(args.data)
+    if not len(stats):
+        sys.exit('No service requests found')
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    stats.save(args.output)
+    logger.info(f"Fleet statistics written to {args.output}: {len(stats)} service requests, "
+                f"{len(stats.vehicles)} vehicles, {len(stats.monthly)} months")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Columnar in-memory fleet service history
+Holds every ServiceRequest as compact NumPy columns sorted by (vehicle, date): ID,
+date, odometer, MrType, Priority, Status, the text_index keyword tags as bitsets, and
+the odometer_validator anomaly code and corrected estimate.
+The tags answer "last brake service for vehicle X" (last_service) with a scan of
+that vehicle's tag bits only.
+A CSR-style offset table gives each vehicle's rows, offsets[v]:offsets[v + 1], so a
+vehicle's full history is a set of array slices (views, no copies). Reading it is a
+dict lookup plus slicing, in place of PredictionController::getVehicleHistory's
+UPPER(TRIM(Vehicle)) query, which cannot use the clustered index.
+Dates follow that query's COALESCE(Datereceived, DateModify, responseDate). Missing
+MrType/Priority/Status are -1 and a missing odometer is NaN.
+Saved like a model bundle: manifest.json plus one .npy per column, opened with
+mmap_mode='r', so server workers share the pages.
+Usage: python python/history_store.py [--data EXPORT ...] [--output DIR]
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from feature_store import normalize_vehicle
+from service_request_loader import find_service_request_exports, iter_service_request_chunks
+from text_index import SERVICE_TAGGER
+from odometer_validator import validate_odometer_history, check_new_reading, ODOMETER_REASONS
+
+logger = logging.getLogger(__name__)
+
+HISTORY_STORE_DIRNAME = 'history_store'
+HISTORY_STORE_FORMAT_VERSION = 3
+MANIFEST_FILENAME = 'manifest.json'
+
+DATE_COLUMNS = ['Datereceived', 'DateModify', 'responseDate']
+SOURCE_COLUMNS = ['ID', 'Vehicle', 'Odometer', 'MrType', 'Priority', 'Status', 'Description', 'Response'] + DATE_COLUMNS
+CODE_COLUMNS = {'mr_type': 'MrType', 'priority': 'Priority', 'status': 'Status'}
+MISSING_CODE = -1
+CODE_MIN, CODE_MAX = MISSING_CODE, int(np.iinfo(np.int8).max)
+
+class FleetHistoryStore:
+    """Per-vehicle service history as column arrays with CSR offsets"""
+
+    def __init__(self, vehicles, offsets, columns, tags, last_good):
+        self.vehicles = vehicles
+        self.vehicle_ids = {str(vehicle): position for position, vehicle in enumerate(vehicles)}
+        self.offsets = offsets
+        self.columns = columns
+        self.tags = list(tags)
+        self.tag_ids = {tag: position for position, tag in enumerate(self.tags)}
+        # Per vehicle: row of the latest reading the odometer validator accepted (-1 for none)
+        self.last_good = last_good
+
+    def __len__(self):
+        return len(self.columns['date'])
+
+    def __contains__(self, vehicle):
+        return normalize_vehicle(vehicle) in self.vehicle_ids
+
+    @classmethod
+    def from_history(cls, df, tagger=SERVICE_TAGGER):
+        """Build the store from a ServiceRequest DataFrame (one sort, one keyword scan)"""
+        date = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        for column in DATE_COLUMNS:
+            if column in df.columns:
+                date = date.fillna(pd.to_datetime(df[column], errors='coerce'))
+
+        def text_column(name):
+            return df[name].fillna('').astype(str) if name in df.columns else pd.Series('', index=df.index)
+
+        def numeric_column(name):
+            return pd.to_numeric(df[name], errors='coerce') if name in df.columns else pd.Series(np.nan, index=df.index)
+
+        vehicle = df['Vehicle'].fillna('').astype(str).str.strip().str.upper()
+        # Stable sort keeps file order for records with the same timestamp; undated records first
+        order = pd.DataFrame({'vehicle': vehicle.to_numpy(), 'date': date.to_numpy()}).sort_values(
+            ['vehicle', 'date'], kind='mergesort', na_position='first').index.to_numpy()
+
+        columns = {
+            'id': numeric_column('ID').fillna(MISSING_CODE).to_numpy(dtype=np.int64)[order],
+            'date': date.to_numpy(dtype='datetime64[s]')[order],
+            'odometer': numeric_column('Odometer').to_numpy(dtype=np.float32)[order]
+        }
+        for name, source in CODE_COLUMNS.items():
+            codes = numeric_column(source).fillna(MISSING_CODE)
+            # int8 would wrap larger codes silently (e.g. Status 200 -> -56); such rows lose only this code
+            bad = (codes < CODE_MIN) | (codes > CODE_MAX) | (codes != codes.round())
+            if bad.any():
+                logger.warning(f"{int(bad.sum())} {source} codes that are not whole numbers in {CODE_MIN}..{CODE_MAX} stored as missing: "
+                               f"{sorted(codes[bad].unique().tolist())[:10]}")
+                codes = codes.mask(bad, MISSING_CODE)
+            columns[name] = codes.to_numpy(dtype=np.int8)[order]
+        columns['tags'] = tagger.tag_texts((text_column('Description') + ' ' + text_column('Response')).iloc[order])
+
+        validation = validate_odometer_history(pd.DataFrame({
+            'Vehicle': vehicle.to_numpy(), 'Odometer': numeric_column('Odometer').to_numpy(), 'Datereceived': date.to_numpy()
+        })).iloc[order]
+        columns['odometer_anomaly'] = validation['odometer_anomaly'].cat.codes.to_numpy(dtype=np.int8)
+        columns['odometer_estimate'] = validation['odometer_estimate'].to_numpy(dtype=np.float32)
+
+        sorted_vehicles = vehicle.to_numpy(dtype=str)[order]
+        vehicles, first_rows = np.unique(sorted_vehicles, return_index=True)
+        offsets = np.append(first_rows, len(sorted_vehicles)).astype(np.int64)
+
+        # Serving repair must match training's point-in-time pass, so the last good reading comes from
+        # look_ahead=False (the stored anomaly columns keep the full-history judgement)
+        point_in_time = validate_odometer_history(pd.DataFrame({
+            'Vehicle': vehicle.to_numpy(), 'Odometer': numeric_column('Odometer').to_numpy(), 'Datereceived': date.to_numpy()
+        }), look_ahead=False).iloc[order]
+        last_good = np.full(len(vehicles), -1, dtype=np.int64)
+        good_rows = np.flatnonzero(~point_in_time['odometer_flag'].to_numpy())
+        np.maximum.at(last_good, np.searchsorted(offsets, good_rows, side='right') - 1, good_rows)
+        return cls(vehicles, offsets, columns, tagger.tags, last_good)
+
+    @classmethod
+    def from_exports(cls, data_paths=None, tagger=SERVICE_TAGGER):
+        """Stream the ServiceRequest exports (duplicates by ID dropped) into a store"""
+        frames = []
+        for path in data_paths or find_service_request_exports():
+            try:
+                frames.extend(iter_service_request_chunks(path, columns=SOURCE_COLUMNS))
+            except Exception as e:
+                logger.warning(f"Failed to load {path}: {e}")
+        history = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SOURCE_COLUMNS)
+        if 'ID' in history.columns:
+            history = history.drop_duplicates(subset='ID')
+        return cls.from_history(history, tagger)
+
+    def rows(self, vehicle):
+        """(start, end) of the vehicle's rows, or None for an unknown vehicle: a dict lookup"""
+        code = self.vehicle_ids.get(normalize_vehicle(vehicle))
+        if code is None:
+            return None
+        return int(self.offsets[code]), int(self.offsets[code + 1])
+
+    def history(self, vehicle):
+        """The vehicle's columns, oldest first, as array views (no copies), or None"""
+        rows = self.rows(vehicle)
+        if rows is None:
+            return None
+        start, end = rows
+        return {name: column[start:end] for name, column in self.columns.items()}
+
+    def records(self, vehicle, limit=None, newest_first=True):
+        """JSON-ready records for the vehicle (newest first, like getVehicleHistory)"""
+        history = self.history(vehicle)
+        if history is None:
+            return []
+        positions = np.arange(len(history['date']))
+        if newest_first:
+            positions = positions[::-1]
+        if limit is not None:
+            positions = positions[:limit]
+
+        return [self._record(history, position) for position in positions]
+
+    def _record(self, history, position):
+        date = history['date'][position]
+        odometer = float(history['odometer'][position])
+        record = {
+            'ID': int(history['id'][position]),
+            'Datereceived': None if np.isnat(date) else str(date),
+            'Odometer': None if np.isnan(odometer) else odometer
+        }
+        for name, source in CODE_COLUMNS.items():
+            code = int(history[name][position])
+            record[source] = None if code == MISSING_CODE else code
+        record['tags'] = self.tags_of(history['tags'][position])
+        record['odometer_anomaly'] = ODOMETER_REASONS[int(history['odometer_anomaly'][position])]
+        estimate = float(history['odometer_estimate'][position])
+        record['odometer_estimate'] = None if np.isnan(estimate) else estimate
+        return record
+
+    def tag_mask(self, tags):
+        """Bitset selecting the given tag names (e.g. 'part:Brake System'); KeyError for an unknown tag"""
+        mask = np.zeros(self.columns['tags'].shape[1], dtype=np.uint64)
+        for tag in ([tags] if isinstance(tags, str) else tags):
+            position = self.tag_ids[tag]
+            mask[position // 64] |= np.uint64(1 << (position % 64))
+        return mask
+
+    def last_service(self, vehicle, tags):
+        """The vehicle's latest record carrying any of the tags, like findLastServiceForVehiclePart, or None"""
+        history = self.history(vehicle)
+        if history is None:
+            return None
+        matches = np.flatnonzero((history['tags'] & self.tag_mask(tags)).any(axis=1))
+        # Rows are oldest first, so the last match is the latest service
+        return self._record(history, matches[-1]) if len(matches) else None
+
+    def tag_counts(self, vehicle, group=None):
+        """Records per tag for the vehicle (tags of one group when given, e.g. 'parts_trend')"""
+        history = self.history(vehicle)
+        tags = [tag for tag in self.tags if group is None or tag.startswith(f"{group}:")]
+        if history is None:
+            return {tag: 0 for tag in tags}
+        return {tag: int((history['tags'] & self.tag_mask(tag)).any(axis=1).sum()) for tag in tags}
+
+    def last_good_reading(self, vehicle, as_of=None):
+        """(odometer, date, days before as_of) of the vehicle's last good reading; Nones when it has none"""
+        code = self.vehicle_ids.get(normalize_vehicle(vehicle))
+        row = int(self.last_good[code]) if code is not None else -1
+        if row < 0:
+            return None, None, None
+        last_date = self.columns['date'][row]
+        days = None
+        if not np.isnat(last_date):
+            as_of = np.datetime64(pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now(), 's')
+            days = (as_of - last_date) / np.timedelta64(1, 'D')
+        return float(self.columns['odometer'][row]), last_date, days
+
+    def check_reading(self, vehicle, mileage, as_of=None):
+        """validateVehicleProgression for a submitted mileage, against the last good reading (O(1))"""
+        last_odometer, last_date, days = self.last_good_reading(vehicle, as_of)
+        last_date = np.datetime64('NaT') if last_date is None else last_date
+
+        valid, reason = check_new_reading(float(mileage), last_odometer, days)
+        return {
+            'valid': valid,
+            'reason': reason,
+            'latest_recorded': last_odometer,
+            'latest_recorded_date': None if np.isnat(last_date) else str(last_date),
+            'difference': float(mileage) - last_odometer if last_odometer is not None else None
+        }
+
+    def tags_of(self, record_bits):
+        """Tag names in one record's bitset"""
+        return [tag for tag, position in self.tag_ids.items()
+                if (int(record_bits[position // 64]) >> (position % 64)) & 1]
+
+    def nbytes(self):
+        """Bytes held by the column arrays and per-vehicle arrays (vehicle keys excluded)"""
+        return int(sum(column.nbytes for column in self.columns.values()) + self.offsets.nbytes + self.last_good.nbytes)
+
+    def save(self, path):
+        """Write manifest.json and one .npy per array; the directory is swapped in complete"""
+        staging_dir = f"{path}.tmp"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+
+        arrays = dict(self.columns, vehicles=np.asarray(self.vehicles, dtype=str), offsets=self.offsets,
+                      last_good=self.last_good)
+        manifest_arrays = {}
+        for name, array in arrays.items():
+            np.save(os.path.join(staging_dir, f"{name}.npy"), array, allow_pickle=False)
+            manifest_arrays[name] = {'file': f"{name}.npy", 'dtype': str(array.dtype), 'shape': list(array.shape)}
+        with open(os.path.join(staging_dir, MANIFEST_FILENAME), 'w') as f:
+            json.dump({'format_version': HISTORY_STORE_FORMAT_VERSION, 'tags': self.tags,
+                       'arrays': manifest_arrays}, f, indent=2)
+
+        previous_dir = f"{path}.old"
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, previous_dir)
+        os.replace(staging_dir, path)
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Open a saved store with every column memory-mapped"""
+        with open(os.path.join(path, MANIFEST_FILENAME), 'r') as f:
+            manifest = json.load(f)
+
+        if manifest.get('format_version') != HISTORY_STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported history store format version: {manifest.get('format_version')}")
+
+        arrays = {}
+        for name, spec in manifest['arrays'].items():
+            array = np.load(os.path.join(path, spec['file']), mmap_mode='r', allow_pickle=False)
+            if list(array.shape) != spec['shape'] or str(array.dtype) != spec['dtype']:
+                raise ValueError(f"History store array {name} does not match manifest: {array.shape} {array.dtype}")
+            arrays[name] = array
+
+        vehicles, offsets, last_good = arrays.pop('vehicles'), arrays.pop('offsets'), arrays.pop('last_good')
+        return cls(vehicles, offsets, arrays, manifest['tags'], last_good)
+
+def find_history_store(model_path, max_levels=3):
+    """Locate the history store saved alongside a model pickle or bundle (searching up from it)"""
+    directory = model_path if os.path.isdir(model_path) else os.path.dirname(model_path)
+    for _ in range(max_levels):
+        candidate = os.path.join(directory or '.', HISTORY_STORE_DIRNAME)
+        if os.path.exists(os.path.join(candidate, MANIFEST_FILENAME)):
+            return candidate
+        parent = os.path.dirname(os.path.abspath(directory or '.'))
+        if parent == os.path.abspath(directory or '.'):
+            break
+        directory = parent
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the columnar fleet history store from ServiceRequest exports')
+    parser.add_argument('--data', nargs='+', metavar='EXPORT', help='ServiceRequest exports (default: data/ exports)')
+    parser.add_argument('--output', default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model_training_output', HISTORY_STORE_DIRNAME),
+        help='Store directory (default: model_training_output/history_store)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    store = FleetHistoryStore.from_exports(args.data)
+    if not len(store):
+        sys.exit('No service requests found')
+    store.save(args.output)
+    logger.info(f"History store written to {args.output}: {len(store)} service requests, "
+                f"{len(store.vehicles)} vehicles, {store.nbytes() / 1024:.0f} KiB of columns")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Asyncio request coalescing for the prediction server
+Concurrent single-vehicle requests are put on a queue. A collector task takes the
+first waiting request and then gathers more until max_batch_size requests are
+waiting or max_wait_ms has passed since the first one arrived, whichever comes
+first. The group is scored with one batched pipeline call (predict_batch_with_model)
+on a dedicated scoring thread, and each caller gets its own row back.
+While a batch is scoring, new requests keep queueing, so under load the next batch
+is already full when scoring finishes. A request waits at most max_wait_ms plus one
+batch in front of it plus its own batch.
+"""
+
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 2.0
+
+class MicroBatcher:
+    """Coalesces concurrent submit() calls into batched score_batch(records) calls"""
+
+    def __init__(self, score_batch, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.score_batch = score_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue = None
+        self._collector = None
+        # One scoring thread: batches run back to back and never compete for the GIL
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vms-micro-batch')
+        self.batches = 0
+        self.requests = 0
+        self.largest_batch = 0
+        self.scoring_seconds = 0.0
+
+    async def submit(self, record):
+        """Score one request as part of the next batch and return its own result"""
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            self._collector = asyncio.get_running_loop().create_task(self._collect())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((record, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # Whatever already queued (e.g. during the previous batch) joins without waiting
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._score(batch, loop)
+
+    async def _score(self, batch, loop):
+        records = [record for record, _ in batch]
+        start = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(self._executor, self.score_batch, records)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result({'error': 'Prediction server is shutting down'})
+            raise
+        except Exception as e:
+            logger.error(f"Micro-batch scoring failed: {e}")
+            results = [{'error': f'Prediction failed: {str(e)}'} for _ in batch]
+        self.scoring_seconds += time.perf_counter() - start
+        self.batches += 1
+        self.requests += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        for (_, future), result in zip(batch, results):
+            # A caller that disconnected has a cancelled future; its row is simply dropped
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """Stop collecting; requests still queued get an error instead of hanging"""
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_result({'error': 'Prediction server is shutting down'})
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': round(self.requests / self.batches, 2) if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'scoring_seconds': round(self.scoring_seconds, 3)
+        }
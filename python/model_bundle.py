@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Memory-mappable VMS model bundle reader
+A bundle is a directory holding manifest.json plus one .npy file per numeric array
+(tree nodes, imputer statistics, scaler mean/scale, IDF weights, selector mask).
+Arrays are opened with mmap_mode='r', so startup cost does not grow with model size
+and every worker process on the host shares the same page-cache pages.
+Bundles are written by ShapeFixedVMSTrainer.save_model_bundle.
+"""
+
+import os
+import json
+from collections import Counter
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILENAME = 'manifest.json'
+CURRENT_FILENAME = 'CURRENT'
+
+def resolve_bundle_dir(path):
+    """Return the versioned directory holding manifest.json (follows the CURRENT pointer)"""
+    if os.path.basename(path) == MANIFEST_FILENAME:
+        return os.path.dirname(path)
+
+    if os.path.exists(os.path.join(path, MANIFEST_FILENAME)):
+        return path
+
+    current_file = os.path.join(path, CURRENT_FILENAME)
+    if os.path.exists(current_file):
+        with open(current_file, 'r') as f:
+            return os.path.join(path, f.read().strip())
+
+    raise FileNotFoundError(f"No {MANIFEST_FILENAME} or {CURRENT_FILENAME} in {path}")
+
+def is_model_bundle(path):
+    """True when path points at a bundle rather than a pickle file"""
+    return os.path.isdir(path) or os.path.basename(path) == MANIFEST_FILENAME
+
+def read_manifest(path):
+    """Read and validate a bundle manifest"""
+    bundle_dir = resolve_bundle_dir(path)
+    with open(os.path.join(bundle_dir, MANIFEST_FILENAME), 'r') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format version: {manifest.get('format_version')}")
+
+    return bundle_dir, manifest
+
+def load_model_bundle(path):
+    """Load a bundle into the same model_objects dict that load_model_robust returns for pickles"""
+    from predict import CompiledTreeEnsemble
+
+    bundle_dir, manifest = read_manifest(path)
+
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        array = np.load(os.path.join(bundle_dir, spec['file']), mmap_mode='r', allow_pickle=False)
+        if list(array.shape) != spec['shape'] or str(array.dtype) != spec['dtype']:
+            raise ValueError(f"Bundle array {name} does not match manifest: {array.shape} {array.dtype}")
+        arrays[name] = array
+
+    trees = manifest['trees']
+    final_model = CompiledTreeEnsemble({
+        'feature': arrays['tree_feature'],
+        'threshold': arrays['tree_threshold'],
+        'missing_left': arrays.get('tree_missing_left'),
+        'value': arrays['tree_value'],
+        'init_raw': arrays['tree_init_raw'],
+        'float32_inputs': trees.get('float32_inputs', True),
+        'n_tree_classes': trees['n_tree_classes'],
+        'n_classes': trees['n_classes'],
+        'max_depth': trees['max_depth'],
+        'n_features': trees['n_features']
+    })
+
+    return {
+        'final_model': final_model,
+        'label_encoder': BundleLabelEncoder(manifest['classes']),
+        'numerical_imputer': BundleImputer(arrays['numerical_imputer_statistics']),
+        'numerical_scaler': BundleScaler(arrays['numerical_scaler_mean'], arrays['numerical_scaler_scale']),
+        'categorical_imputer': BundleImputer(arrays['categorical_imputer_statistics']),
+        'tfidf': BundleTfidf(manifest['tfidf']['params'], manifest['tfidf']['vocabulary'], arrays['tfidf_idf']),
+        'feature_selector': BundleSelector(arrays['feature_selector_mask']),
+        'numerical_features': manifest['numerical_features'],
+        'categorical_features': manifest['categorical_features'],
+        'text_feature': manifest['text_feature'],
+        'categorical_encoders': manifest.get('categorical_encoders', {}),
+        'model_info': manifest.get('model_info', {}),
+        'model_version': manifest['model_version']
+    }
+
+class BundleLabelEncoder:
+    """LabelEncoder stand-in backed by the manifest class list"""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+
+    def inverse_transform(self, y):
+        return self.classes_[np.asarray(y, dtype=np.intp)]
+
+class BundleImputer:
+    """SimpleImputer.transform over stored fill values (all-NaN columns dropped, as sklearn does)"""
+
+    def __init__(self, statistics):
+        self.statistics_ = statistics
+        self._valid = ~np.isnan(statistics)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.broadcast_to(self.statistics_, X.shape)[missing]
+        return X[:, self._valid] if not self._valid.all() else X
+
+class BundleScaler:
+    """StandardScaler.transform over stored mean and scale"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+class BundleSelector:
+    """SelectKBest.transform over the stored support mask"""
+
+    def __init__(self, mask):
+        self._columns = np.flatnonzero(mask)
+
+    def transform(self, X):
+        return X[:, self._columns]
+
+class BundleTfidf:
+    """TfidfVectorizer.transform from stored vocabulary, IDF weights and analyzer settings"""
+
+    def __init__(self, params, vocabulary, idf):
+        params = dict(params)
+        if 'ngram_range' in params:
+            params['ngram_range'] = tuple(params['ngram_range'])
+        analyzer_params = {key: value for key, value in params.items()
+                           if key not in ('norm', 'use_idf', 'sublinear_tf', 'binary')}
+
+        self._analyze = TfidfVectorizer(**analyzer_params).build_analyzer()
+        self.vocabulary_ = vocabulary
+        self.idf_ = idf
+        self.norm = params.get('norm', 'l2')
+        self.use_idf = params.get('use_idf', True)
+        self.sublinear_tf = params.get('sublinear_tf', False)
+        self.binary = params.get('binary', False)
+
+    def build_analyzer(self):
+        return self._analyze
+
+    def transform(self, raw_documents):
+        indptr = [0]
+        indices = []
+        values = []
+        for document in raw_documents:
+            counts = Counter(self.vocabulary_[term] for term in self._analyze(document) if term in self.vocabulary_)
+            for column in sorted(counts):
+                indices.append(column)
+                values.append(counts[column])
+            indptr.append(len(indices))
+
+        X = csr_matrix((np.asarray(values, dtype=np.float64), indices, indptr),
+                       shape=(len(indptr) - 1, len(self.vocabulary_)))
+
+        if self.binary:
+            X.data.fill(1)
+        if self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1
+        if self.use_idf:
+            X.data *= np.take(self.idf_, X.indices)
+        if self.norm:
+            X = normalize(X, norm=self.norm, copy=False)
+
+        return X
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Hot-reloading model registry for the prediction server
+Holds the active model_objects and watches the model path (a pickle, or a bundle
+directory's CURRENT pointer) on a background thread. When the artifact changes,
+the new model is loaded and validated off the request path. A warm-up request
+runs the single and batched pipelines once. Only then is it swapped in, with one
+reference assignment. A request takes registry.current once and uses that model
+to the end, so in-flight requests finish on the model they started with. A failed
+load or warm-up keeps the old model serving and is reported in status().
+A pickle that is still changing between two polls (written in place by an older
+trainer) is left alone until it settles.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+
+from predict import load_model_robust, predict_with_model, predict_batch_with_model
+from model_bundle import is_model_bundle, resolve_bundle_dir, MANIFEST_FILENAME
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL_SECONDS = 5.0
+WARMUP_REQUEST = {'Vehicle': 'WARMUP', 'Odometer': 100000, 'Description': 'routine service check', 'Priority': 2}
+
+def artifact_fingerprint(model_path):
+    """What identifies the model on disk: the bundle version CURRENT points at, or the pickle's stat"""
+    try:
+        if is_model_bundle(model_path):
+            bundle_dir = resolve_bundle_dir(model_path)
+            stat = os.stat(os.path.join(bundle_dir, MANIFEST_FILENAME))
+            return (os.path.basename(bundle_dir), stat.st_mtime_ns)
+        stat = os.stat(model_path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    except (OSError, ValueError):
+        return None
+
+def warm_up(model_objects):
+    """Score WARMUP_REQUEST through the single and batched paths; raises when the model cannot predict"""
+    results = [predict_with_model(dict(WARMUP_REQUEST), model_objects)]
+    results += predict_batch_with_model([dict(WARMUP_REQUEST), dict(WARMUP_REQUEST)], model_objects)
+    for result in results:
+        if 'error' in result or 'prediction' not in result:
+            raise ValueError(f"Warm-up prediction failed: {result.get('error', result)}")
+
+class ModelRegistry:
+    """The active model plus a background watcher that swaps in validated new versions"""
+
+    def __init__(self, model_path, poll_interval=DEFAULT_POLL_INTERVAL_SECONDS, prepare=None):
+        self.model_path = model_path
+        self.poll_interval = poll_interval
+        # prepare(candidate) runs under swap_lock just before a model goes live; holding swap_lock
+        # keeps the active model from changing (e.g. while a live feature store is being updated)
+        self.prepare = prepare
+        self.swap_lock = threading.Lock()
+        self.shared = {}
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self.loaded_at = None
+        self._current = None
+        self._fingerprint = None
+        self._pending = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.message = 'Not loaded'
+        # Startup load happens here, so the server starts with a model (or a reason it has none)
+        self.reload(force=True)
+
+    @property
+    def current(self):
+        """The active model_objects (None until a model has loaded); take it once per request"""
+        return self._current
+
+    def share(self, **objects):
+        """Install objects (e.g. the result cache) in the active model and every later one"""
+        self.shared.update(objects)
+        if self._current is not None:
+            self._current.update(objects)
+
+    def reload(self, force=False):
+        """Load, validate and swap in the artifact on disk if it changed (or always, with force); True on swap"""
+        with self._reload_lock:
+            fingerprint = artifact_fingerprint(self.model_path)
+            if not force and (fingerprint is None or fingerprint == self._fingerprint):
+                return False
+
+            started = time.perf_counter()
+            candidate, message = load_model_robust(self.model_path)
+            try:
+                if candidate is None:
+                    raise ValueError(message)
+                warm_up(candidate)
+            except Exception as e:
+                # Remember the failed artifact so it is not reloaded on every poll; a new write retries
+                self._fingerprint = fingerprint
+                self.last_error = str(e)
+                if self._current is None:
+                    self.message = message if candidate is None else self.last_error
+                else:
+                    self.failed_reloads += 1
+                    logger.error(f"Model at {self.model_path} not loaded, keeping the active model: {e}")
+                return False
+
+            candidate.update(self.shared)
+            with self.swap_lock:
+                if self.prepare is not None:
+                    self.prepare(candidate)
+                previous = self._current
+                self._current = candidate
+            self._fingerprint = fingerprint
+            self.loaded_at = datetime.now().isoformat(timespec='seconds')
+            self.last_error = None
+            self.message = message
+            if previous is not None:
+                self.reloads += 1
+                logger.info(f"Model reloaded: {previous.get('model_version')} -> {candidate.get('model_version')} "
+                            f"({time.perf_counter() - started:.2f}s off the request path)")
+            return True
+
+    def poll(self):
+        """One watcher step: reload once a changed artifact has looked the same on two polls in a row"""
+        fingerprint = artifact_fingerprint(self.model_path)
+        if fingerprint is None or fingerprint == self._fingerprint:
+            self._pending = None
+            return False
+        if fingerprint != self._pending:
+            self._pending = fingerprint
+            return False
+        self._pending = None
+        return self.reload()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Model watcher error: {e}")
+
+    def start(self):
+        """Start the background watcher (a poll_interval of 0 disables it)"""
+        if self.poll_interval > 0 and self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name='vms-model-watcher', daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def status(self):
+        """Active model version and info, plus reload counters for /health and /model"""
+        model_objects = self._current
+        model_info = model_objects.get('model_info', {}) if model_objects else {}
+        return {
+            'model_path': self.model_path,
+            'model_version': model_objects.get('model_version') if model_objects else None,
+            'model_info': {key: value.item() if hasattr(value, 'item') else value for key, value in model_info.items()}
+            if model_objects else None,
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+            'failed_reloads': self.failed_reloads,
+            'last_error': self.last_error,
+            'watching': self._watcher is not None,
+            'poll_interval_seconds': self.poll_interval
+        }
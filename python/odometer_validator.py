@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Whole-history odometer validation
+Checks every vehicle's Odometer series in one vectorized pass (per-vehicle date order,
+groupby shifts, no per-record loop) and gives each record an anomaly reason and a
+corrected estimate. The rules are PredictionController's validateMileageAdvanced,
+validateVehicleProgression and detectKnownAnomalies, applied to the whole history:
+- value rules: known_error_ranges (10M-20M), extreme_mileage (> 5M),
+  suspicious_round_numbers (0, 1, 10, ... and typed placeholders like 123456),
+  impossible_low (< 500), too_low (< 1,000), extreme_outlier (> 3M)
+- progression rules, over the readings that pass the value rules:
+  spike / dip (out of line with neighbouring readings that agree with each other),
+  backward_progression (below an earlier good reading), implausible_rate (more than
+  MAX_KM_PER_DAY, plus RATE_SLACK_KM, since the previous good reading)
+A record's estimate is its own reading when it is good. Otherwise it is the
+vehicle's good readings interpolated linearly in time, or the nearest good reading
+at either end of the history. It is NaN when the vehicle has no good reading.
+With look_ahead=False a record is judged from earlier records only: no spike/dip
+rule, and a flagged reading's estimate is the last good reading before it. This is
+the point-in-time form training uses. repair_reading applies it to one submitted
+mileage at serving time, except that an exact round number (e.g. 100000) typed in
+by the user is only replaced when it conflicts with the vehicle's last good reading.
+"""
+
+import numpy as np
+import pandas as pd
+
+from feature_store import normalize_vehicle
+
+MIN_ODOMETER = 1000
+MAX_ODOMETER = 3000000
+IMPOSSIBLE_LOW_ODOMETER = 500
+EXTREME_ODOMETER = 5000000
+KNOWN_ERROR_RANGE = (10000000, 20000000)
+# detectKnownAnomalies' round numbers plus placeholder readings seen in the exports
+SENTINEL_ODOMETERS = [0, 1, 10, 100, 1000, 10000, 100000, 1000000, 123456, 1234567, 999999, 9999999]
+# About 24 hours at 80 km/h; p95 of the real exports' day-over-day rate is about 1,250 km/day
+MAX_KM_PER_DAY = 2000
+# Allowance on top of the rate, for a stale reading typed in again a few days later
+RATE_SLACK_KM = 5000
+# Stand-in for a flagged reading with no earlier good reading (training's Odometer default)
+UNKNOWN_ODOMETER = 150000
+
+# Reason codes in precedence order; 0 means the reading is good
+ODOMETER_REASONS = [
+    'ok', 'missing', 'known_error_ranges', 'extreme_mileage', 'suspicious_round_numbers', 'impossible_low',
+    'too_low', 'extreme_outlier', 'spike', 'dip', 'backward_progression', 'implausible_rate'
+]
+REASON_CODES = {reason: code for code, reason in enumerate(ODOMETER_REASONS)}
+
+def value_reasons(odometer, sentinels=True):
+    """Reason code per reading from its value alone (detectKnownAnomalies plus the basic range)
+
+    sentinels=False skips the round-number/placeholder rule; the other rules still
+    catch the implausible ones (0, 1, 10 and 100 are impossible_low).
+    """
+    odometer = np.asarray(odometer, dtype=float)
+    conditions = [
+        np.isnan(odometer),
+        (odometer >= KNOWN_ERROR_RANGE[0]) & (odometer <= KNOWN_ERROR_RANGE[1]),
+        odometer > EXTREME_ODOMETER,
+        np.isin(odometer, SENTINEL_ODOMETERS) & sentinels,
+        odometer < IMPOSSIBLE_LOW_ODOMETER,
+        odometer < MIN_ODOMETER,
+        odometer > MAX_ODOMETER
+    ]
+    choices = [REASON_CODES[reason] for reason in ODOMETER_REASONS[1:len(conditions) + 1]]
+    return np.select(conditions, choices, default=0).astype(np.int8)
+
+def too_fast(distance, days):
+    """True where covering distance (KM) in days exceeds MAX_KM_PER_DAY plus the slack (days floored at 1)"""
+    return distance > MAX_KM_PER_DAY * np.maximum(days, 1) + RATE_SLACK_KM
+
+def _neighbours(frame, good, direction):
+    """Odometer and time of each row's nearest good row before (direction=1) or after (direction=-1) it"""
+    masked = frame[['odometer', 'time']].where(pd.Series(good, index=frame.index), axis=0)
+    filled = masked.groupby(frame['vehicle'], sort=False).shift(direction).groupby(frame['vehicle'], sort=False)
+    return filled.ffill() if direction == 1 else filled.bfill()
+
+def _local_breaks(frame, good):
+    """Spikes and dips among the good readings, judged against their good neighbours
+
+    Inside a history a reading breaks the series when its neighbours agree
+    (before <= after) and it is above the later one or below the earlier one.
+    The first reading has one neighbour, so it is judged against the next two,
+    when those two make a plausible step. It is a spike when above them, and a
+    dip when the step up to the next one is too fast.
+    """
+    rows = frame[good]
+    by_vehicle = rows.groupby('vehicle', sort=False)
+    value, time = rows['odometer'], rows['time']
+    before, after = by_vehicle['odometer'].shift(1), by_vehicle['odometer'].shift(-1)
+    after_time = by_vehicle['time'].shift(-1)
+    after_next, after_next_time = by_vehicle['odometer'].shift(-2), by_vehicle['time'].shift(-2)
+
+    def plausible_step(low, high, low_time, high_time):
+        return (low <= high) & ~too_fast(high - low, high_time - low_time)
+
+    interior = before.notna() & after.notna() & (before <= after)
+    opening = before.isna() & after_next.notna() & plausible_step(after, after_next, after_time, after_next_time)
+    spike = (interior | opening) & (value > after)
+    dip = (interior & (value < before)) | (opening & ~plausible_step(value, after, time, after_time))
+
+    spike_rows, dip_rows = np.zeros(len(frame), dtype=bool), np.zeros(len(frame), dtype=bool)
+    positions = np.flatnonzero(good)
+    spike_rows[positions] = spike.to_numpy()
+    dip_rows[positions] = dip.to_numpy() & ~spike.to_numpy()
+    return spike_rows, dip_rows
+
+def validate_odometer_history(df, date_column='Datereceived', look_ahead=True):
+    """odometer_anomaly (reason), odometer_flag and odometer_estimate for every row of a ServiceRequest frame"""
+    frame = pd.DataFrame({
+        'vehicle': df['Vehicle'].astype(str).map(normalize_vehicle).to_numpy() if 'Vehicle' in df.columns else '',
+        'odometer': pd.to_numeric(df['Odometer'], errors='coerce').to_numpy(dtype=float),
+        'date': pd.to_datetime(df[date_column], errors='coerce').to_numpy() if date_column in df.columns else pd.NaT
+    })
+    # Stable sort keeps file order for records with the same timestamp; undated records first
+    frame = frame.sort_values(['vehicle', 'date'], kind='mergesort', na_position='first')
+    order = frame.index.to_numpy()
+    frame = frame.reset_index(drop=True)
+    frame['time'] = (frame['date'] - pd.Timestamp(0)) / pd.Timedelta(days=1)
+    value = frame['odometer']
+
+    reasons = value_reasons(value.to_numpy())
+    good = reasons == 0
+
+    if look_ahead:
+        spike, dip = _local_breaks(frame, good)
+        reasons[spike] = REASON_CODES['spike']
+        reasons[dip] = REASON_CODES['dip']
+        good &= ~(spike | dip)
+
+    # Progression over what is left: no going below an earlier good reading, then km/day since the previous one
+    by_vehicle = frame['vehicle']
+    highest_before = value.where(good).groupby(by_vehicle, sort=False).cummax()
+    highest_before = highest_before.groupby(by_vehicle, sort=False).shift().groupby(by_vehicle, sort=False).ffill()
+    backward = good & (value < highest_before).to_numpy()
+    reasons[backward] = REASON_CODES['backward_progression']
+    good &= ~backward
+
+    previous = _neighbours(frame, good, 1)
+    implausible_rate = good & too_fast(value - previous['odometer'], frame['time'] - previous['time']).to_numpy()
+    reasons[implausible_rate] = REASON_CODES['implausible_rate']
+    good &= ~implausible_rate
+
+    # Estimates: good readings as-is, others interpolated in time between the nearest good readings
+    # (or, point in time, the last good reading carried forward)
+    previous = _neighbours(frame, good, 1)
+    if look_ahead:
+        following = _neighbours(frame, good, -1)
+        span = following['time'] - previous['time']
+        share = ((frame['time'] - previous['time']) / span).where(span > 0, 0.0).clip(0, 1).fillna(0.0)
+        interpolated = previous['odometer'] + (following['odometer'] - previous['odometer']) * share
+        estimate = value.where(good, interpolated.fillna(previous['odometer']).fillna(following['odometer']))
+    else:
+        estimate = value.where(good, previous['odometer'])
+
+    # Back to the caller's row order
+    restore = np.empty_like(order)
+    restore[order] = np.arange(len(order))
+    reasons = reasons[restore]
+    return pd.DataFrame({
+        'odometer_anomaly': pd.Categorical.from_codes(reasons, ODOMETER_REASONS),
+        'odometer_flag': reasons != 0,
+        'odometer_estimate': estimate.round().to_numpy()[restore]
+    }, index=df.index)
+
+def check_new_reading(mileage, last_good_odometer=None, days_since_last_good=None, sentinels=True):
+    """(valid, reason) for a submitted mileage against the vehicle's last good reading
+
+    The same rules as the history pass, so a request needs the last good reading
+    (e.g. from the history store) instead of a scan of the vehicle's history.
+    """
+    reason = ODOMETER_REASONS[int(value_reasons([mileage], sentinels)[0])]
+    if reason != 'ok' or last_good_odometer is None or np.isnan(last_good_odometer):
+        return reason == 'ok', reason
+    if mileage < last_good_odometer:
+        return False, 'backward_progression'
+    if days_since_last_good is not None and too_fast(mileage - last_good_odometer, days_since_last_good):
+        return False, 'implausible_rate'
+    return True, 'ok'
+
+def repair_reading(mileage, last_good_odometer=None, days_since_last_good=None):
+    """(odometer, reason) for a submitted mileage: itself when valid, else the last good reading carried forward
+
+    The serving form of training's point-in-time repair; without a last good
+    reading a flagged mileage becomes UNKNOWN_ODOMETER, as in training. A round
+    number is the user's own reading here, not an export placeholder, so it is
+    judged only by the range and progression rules.
+    """
+    valid, reason = check_new_reading(mileage, last_good_odometer, days_since_last_good, sentinels=False)
+    if valid:
+        return mileage, reason
+    if last_good_odometer is None or np.isnan(last_good_odometer):
+        return UNKNOWN_ODOMETER, reason
+    return last_good_odometer, reason
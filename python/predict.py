@@ -7,9 +7,15 @@ import pandas as pd
 import numpy as np
 import os
 import warnings
+import threading
 from datetime import datetime
 import logging
 
+from feature_store import VehicleFeatureStore, find_feature_store, HISTORY_FEATURES
+from categorical_encoder import StableCategoricalEncoder, crc32_code
+from odometer_validator import repair_reading
+from stage_timing import StageTimer
+
 # Configure logging to go to stderr (not stdout)
 logging.basicConfig(
     level=logging.ERROR,  # Only errors to stderr, info goes to file
@@ -20,10 +26,26 @@ logger = logging.getLogger(__name__)
 
 warnings.filterwarnings('ignore')
 
-def convert_and_validate_data(data):
+# Largest batch scored with CompiledTreeEnsemble before handing over to the sklearn estimator
+COMPILED_MODEL_MAX_ROWS = 32
+# Rows in CompiledFeatureTransform's per-thread output buffer; larger batches get a fresh array
+TRANSFORM_BUFFER_ROWS = 32
+
+def convert_and_validate_data(data, feature_store=None, categorical_encoders=None, history_store=None):
     """Enhanced data conversion with validation"""
     try:
         converted = data.copy()
+        # Response option, not a model input (and not part of the cache key)
+        converted.pop('include_timings', None)
+        
+        # Vehicle history the caller did not send comes from the feature store before any default
+        if feature_store is not None:
+            missing_history = [field for field in HISTORY_FEATURES if converted.get(field) is None]
+            if missing_history:
+                history = feature_store.lookup(converted.get('Vehicle', 'UNKNOWN'))
+                if history is not None:
+                    for field in missing_history:
+                        converted[field] = history[field]
         
         # Define fields that should be numeric with defaults
         numeric_fields = {
@@ -74,25 +96,56 @@ def convert_and_validate_data(data):
         converted['Description'] = str(converted.get('Description', 'Vehicle prediction request'))
         converted['Vehicle'] = str(converted.get('Vehicle', 'UNKNOWN'))
         
-        # Generate encoded values if missing
-        if 'Vehicle_encoded' not in converted or converted['Vehicle_encoded'] == 1:
-            converted['Vehicle_encoded'] = abs(hash(converted['Vehicle'])) % 10000
-            
-        if 'Building_encoded' not in converted or converted['Building_encoded'] == 1:
-            building = str(converted.get('Building', 'DEFAULT'))
-            converted['Building_encoded'] = abs(hash(building)) % 1000
+        # Training's point-in-time odometer repair: a flagged reading becomes the vehicle's last good one.
+        # The result reports the replacement (odometer_repair), so callers can see their reading was not used
+        if 'Odometer' in data:
+            last_good, _, days = (history_store.last_good_reading(converted['Vehicle'])
+                                  if history_store is not None else (None, None, None))
+            submitted = converted['Odometer']
+            converted['Odometer'], reason = repair_reading(submitted, last_good, days)
+            if reason != 'ok':
+                converted['odometer_repair'] = {'submitted': submitted, 'used': converted['Odometer'], 'reason': reason}
+        
+        # Encode Vehicle/Building with the model's own vocabulary so codes match training
+        if categorical_encoders:
+            for column, encoder in categorical_encoders.items():
+                converted[f'{column}_encoded'] = encoder.encode(converted.get(column))
+        else:
+            # Models saved without encoders: stable crc32 codes, abs(crc32) % 10000 like PHP hashToNumeric
+            # (which encodes both Vehicle and Building), so filled-in codes match the ones PHP sends
+            if 'Vehicle_encoded' not in data or converted['Vehicle_encoded'] == 1:
+                converted['Vehicle_encoded'] = crc32_code(converted['Vehicle'])
+                
+            if 'Building_encoded' not in data or converted['Building_encoded'] == 1:
+                building = str(converted.get('Building', 'DEFAULT'))
+                converted['Building_encoded'] = crc32_code(building)
         
         return converted
         
     except Exception as e:
         raise Exception(f"Data conversion failed: {str(e)}")
 
+def validate_request(data, model_objects):
+    """convert_and_validate_data with the loaded model's feature store, encoders and history store"""
+    return convert_and_validate_data(data, model_objects.get('feature_store'),
+                                     model_objects.get('categorical_encoders'), model_objects.get('history_store'))
+
 def load_model_robust(model_path):
     """Load model with enhanced error handling"""
     try:
         if not os.path.exists(model_path):
             return None, f"Model file does not exist: {model_path}"
         
+        # Versioned bundle directory: memory-mapped arrays instead of a full unpickle
+        from model_bundle import is_model_bundle, load_model_bundle
+        if is_model_bundle(model_path):
+            model_objects = load_model_bundle(model_path)
+            attach_feature_store(model_objects, model_path)
+            attach_history_store(model_objects, model_path)
+            attach_categorical_encoders(model_objects)
+            attach_compiled_transform(model_objects)
+            return model_objects, "Success"
+        
         file_size = os.path.getsize(model_path)
         if file_size < 10000:  # Less than 10KB
             return None, f"Model file too small ({file_size} bytes), may be corrupted"
@@ -106,11 +159,305 @@ def load_model_robust(model_path):
         if missing_keys:
             return None, f"Model missing required components: {missing_keys}"
         
+        # Prefer the flat-array tree engine when the trainer exported one
+        if model_objects.get('compiled_trees') is not None:
+            model_objects['compiled_model'] = CompiledTreeEnsemble(model_objects['compiled_trees'])
+        
+        attach_feature_store(model_objects, model_path)
+        attach_history_store(model_objects, model_path)
+        attach_categorical_encoders(model_objects)
+        attach_compiled_transform(model_objects)
+        
+        # Bundles carry a version in their manifest; for a pickle the file identity stands in
+        model_objects.setdefault('model_version', f"{os.path.basename(model_path)}@{int(os.path.getmtime(model_path))}:{file_size}")
+        
         return model_objects, "Success"
         
     except Exception as e:
         return None, f"Model loading error: {str(e)}"
 
+def attach_categorical_encoders(model_objects):
+    """Turn saved encoder vocabularies into encoders (O(1) lookups per request)"""
+    model_objects['categorical_encoders'] = {
+        column: StableCategoricalEncoder.from_dict(state)
+        for column, state in (model_objects.get('categorical_encoders') or {}).items()
+    }
+
+def attach_compiled_transform(model_objects):
+    """Fuse the fitted imputers, scaler, TF-IDF and selector into one transform (when they allow it)"""
+    try:
+        model_objects['compiled_transform'] = CompiledFeatureTransform.from_model_objects(model_objects)
+    except Exception as e:
+        logger.error(f"Compiled feature transform not built, using the step-by-step pipeline: {e}")
+        model_objects['compiled_transform'] = None
+
+def attach_feature_store(model_objects, model_path):
+    """Load the per-vehicle feature store saved next to the model, if there is one"""
+    store_path = find_feature_store(model_path)
+    if store_path is None:
+        return
+    try:
+        model_objects['feature_store'] = VehicleFeatureStore.load(store_path)
+    except Exception as e:
+        logger.error(f"Feature store not loaded from {store_path}: {e}")
+
+def attach_history_store(model_objects, model_path):
+    """Memory-map the fleet history store saved next to the model, if there is one (last good odometer readings)"""
+    from history_store import FleetHistoryStore, find_history_store
+    store_path = find_history_store(model_path)
+    if store_path is None:
+        return
+    try:
+        model_objects['history_store'] = FleetHistoryStore.load(store_path)
+    except Exception as e:
+        logger.error(f"History store not loaded from {store_path}: {e}")
+
+class CompiledTreeEnsemble:
+    """Vectorized gradient boosting evaluator over flat node arrays
+    
+    Arrays come from ShapeFixedVMSTrainer.export_compiled_trees: every tree is a
+    complete binary tree stored level by level, so one step for all trees and
+    rows is two gathers and a compare, with children found arithmetically.
+    NaN features follow each split's missing_left (HistGradientBoosting's
+    missing_go_to_left); trees exported without it send NaN left.
+    """
+    
+    def __init__(self, compiled, chunk_size=64):
+        self.feature = np.ascontiguousarray(compiled['feature']).ravel()
+        self.threshold = np.ascontiguousarray(compiled['threshold']).ravel()
+        self.value = np.ascontiguousarray(compiled['value']).ravel()
+        self.init_raw = compiled['init_raw']
+        # Only kept when some split sends NaN right, so NaN-free ensembles skip the extra check
+        missing_left = compiled.get('missing_left')
+        self.missing_right = None
+        if missing_left is not None and not np.all(missing_left):
+            self.missing_right = ~np.ascontiguousarray(missing_left).ravel().astype(bool)
+        # GradientBoosting trees compare float32 features; HistGradientBoosting compares float64
+        self.input_dtype = np.float32 if bool(compiled.get('float32_inputs', True)) else np.float64
+        self.n_trees = compiled['feature'].shape[0]
+        self.n_internal = compiled['feature'].shape[1]
+        self.n_tree_classes = int(compiled['n_tree_classes'])
+        self.max_depth = int(compiled['max_depth'])
+        self.n_features = int(compiled['n_features'])
+        self.classes_ = np.arange(int(compiled['n_classes']))
+        # Small chunks keep the (trees x rows) working set in cache
+        self.chunk_size = chunk_size
+        
+        self._internal_offsets = (np.arange(self.n_trees, dtype=np.int32) * self.n_internal)[:, None]
+        self._leaf_offsets = (np.arange(self.n_trees, dtype=np.int32) * (self.n_internal + 1))[:, None]
+    
+    def decision_function(self, X):
+        """Raw boosting scores, shape (n_rows, n_tree_classes)"""
+        if hasattr(X, 'toarray'):
+            X = X.toarray()
+        X = np.asarray(X, dtype=self.input_dtype)
+        
+        raw = np.empty((X.shape[0], self.n_tree_classes))
+        for start in range(0, X.shape[0], self.chunk_size):
+            X_chunk = X[start:start + self.chunk_size]
+            n_rows = X_chunk.shape[0]
+            columns = np.ascontiguousarray(X_chunk.T).ravel()  # feature-major, so x[f, r] = columns[f * n_rows + r]
+            row_ids = np.arange(n_rows, dtype=np.int32)[None, :]
+            position = np.zeros((self.n_trees, n_rows), dtype=np.int32)
+            
+            for _ in range(self.max_depth):
+                node = position + self._internal_offsets
+                x = columns.take(self.feature.take(node) * n_rows + row_ids)
+                go_right = x > self.threshold.take(node)
+                if self.missing_right is not None:
+                    go_right |= np.isnan(x) & self.missing_right.take(node)
+                position = 2 * position + 1 + go_right
+            
+            leaf_values = self.value.take(position - self.n_internal + self._leaf_offsets)
+            raw[start:start + n_rows] = self.init_raw + leaf_values.reshape(-1, self.n_tree_classes, n_rows).sum(axis=0).T
+        
+        return raw
+    
+    def predict_proba(self, X):
+        raw = self.decision_function(X)
+        if self.n_tree_classes == 1:
+            positive = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        
+        raw = raw - raw.max(axis=1, keepdims=True)
+        exp_raw = np.exp(raw)
+        return exp_raw / exp_raw.sum(axis=1, keepdims=True)
+    
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+class CompiledFeatureTransform:
+    """Impute + scale + TF-IDF + SelectKBest fused into a few vectorized operations
+    
+    Built once at model load from the fitted preprocessors. Only the columns the
+    selector keeps are computed: their fill values, scaler offset and scale are
+    gathered into vectors, and TF-IDF emits only the selected terms into a dense
+    output matrix. Unselected terms are still looked up when the vectorizer
+    L2-normalizes, because they count towards each document's norm.
+    Matches process_features_robust; frames it cannot handle return None.
+    """
+    
+    def __init__(self, required_columns, dense_columns, fill, offset, scale, analyzer, vocabulary, idf,
+                 term_output, n_outputs, norm, sublinear_tf, binary):
+        self.required_columns = set(required_columns)
+        self.dense_columns = dense_columns
+        self.fill = fill
+        self.offset = offset
+        self.scale = scale
+        self.analyzer = analyzer
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.term_output = term_output
+        self.n_dense = len(dense_columns)
+        self.n_outputs = n_outputs
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+        self.binary = binary
+        # Per-thread output buffer for the serving path (the server scores on several threads)
+        self._local = threading.local()
+    
+    @classmethod
+    def from_model_objects(cls, model_objects):
+        """Compiled transform for a loaded model, or None when a component cannot be fused"""
+        numerical_imputer = model_objects.get('numerical_imputer')
+        numerical_scaler = model_objects.get('numerical_scaler')
+        categorical_imputer = model_objects.get('categorical_imputer')
+        tfidf = model_objects.get('tfidf')
+        selector = model_objects.get('feature_selector')
+        numerical_features = model_objects.get('numerical_features') or []
+        categorical_features = model_objects.get('categorical_features') or []
+        if (numerical_imputer is None or numerical_scaler is None or categorical_imputer is None
+                or selector is None or not numerical_features or not categorical_features):
+            return None
+        
+        # Hashing vectorizers (out-of-core models) and l1 norms are left to the step-by-step pipeline
+        if not hasattr(tfidf, 'vocabulary_') or not hasattr(tfidf, 'idf_') or tfidf.norm not in ('l2', None):
+            return None
+        for imputer in (numerical_imputer, categorical_imputer):
+            missing_values = getattr(imputer, 'missing_values', np.nan)
+            if not (isinstance(missing_values, float) and np.isnan(missing_values)):
+                return None
+        
+        # Column layout of the hstack in process_features_robust (imputers drop all-NaN columns)
+        numerical_statistics = np.asarray(numerical_imputer.statistics_, dtype=np.float64)
+        categorical_statistics = np.asarray(categorical_imputer.statistics_, dtype=np.float64)
+        numerical_valid = np.flatnonzero(~np.isnan(numerical_statistics))
+        categorical_valid = np.flatnonzero(~np.isnan(categorical_statistics))
+        n_numerical, n_categorical = len(numerical_valid), len(categorical_valid)
+        n_terms = len(tfidf.vocabulary_)
+        
+        support = selector.get_support() if hasattr(selector, 'get_support') else None
+        if support is None and hasattr(selector, '_columns'):
+            support = np.zeros(n_numerical + n_categorical + n_terms, dtype=bool)
+            support[selector._columns] = True
+        if support is None or len(support) != n_numerical + n_categorical + n_terms:
+            return None
+        selected = np.flatnonzero(support)
+        
+        mean = getattr(numerical_scaler, 'mean_', None)
+        scale = getattr(numerical_scaler, 'scale_', None)
+        if not getattr(numerical_scaler, 'with_mean', True) or mean is None:
+            mean = np.zeros(n_numerical)
+        if not getattr(numerical_scaler, 'with_std', True) or scale is None:
+            scale = np.ones(n_numerical)
+        mean, scale = np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+        
+        # Selected numerical and categorical columns come first in the output, in layout order
+        dense_sources = selected[selected < n_numerical + n_categorical]
+        dense_columns, fill, offset, column_scale = [], [], [], []
+        for source in dense_sources:
+            if source < n_numerical:
+                column = numerical_valid[source]
+                dense_columns.append(numerical_features[column])
+                fill.append(numerical_statistics[column])
+                offset.append(mean[source])
+                column_scale.append(scale[source])
+            else:
+                column = categorical_valid[source - n_numerical]
+                dense_columns.append(categorical_features[column])
+                fill.append(categorical_statistics[column])
+                offset.append(0.0)
+                column_scale.append(1.0)
+        
+        # TF-IDF column -> output position (-1 for unselected terms)
+        term_output = np.full(n_terms, -1, dtype=np.intp)
+        text_sources = selected[selected >= n_numerical + n_categorical]
+        term_output[text_sources - n_numerical - n_categorical] = np.arange(len(dense_sources), len(selected))
+        
+        # Without normalization unselected terms change nothing, so they leave the vocabulary
+        vocabulary = {term: int(column) for term, column in tfidf.vocabulary_.items()
+                      if tfidf.norm is not None or term_output[column] >= 0}
+        idf = np.asarray(tfidf.idf_, dtype=np.float64) if getattr(tfidf, 'use_idf', True) else np.ones(n_terms)
+        
+        return cls(list(numerical_features) + list(categorical_features), dense_columns, np.array(fill), np.array(offset), np.array(column_scale),
+                   tfidf.build_analyzer(), vocabulary, idf, term_output, len(selected), tfidf.norm,
+                   getattr(tfidf, 'sublinear_tf', False), getattr(tfidf, 'binary', False))
+    
+    def _output(self, n_rows, reuse_buffer):
+        # Only small batches share the per-thread buffer, so one large batch cannot pin its memory
+        if not reuse_buffer or n_rows > TRANSFORM_BUFFER_ROWS:
+            return np.zeros((n_rows, self.n_outputs))
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.empty((TRANSFORM_BUFFER_ROWS, self.n_outputs))
+            self._local.buffer = buffer
+        out = buffer[:n_rows]
+        out[:, self.n_dense:] = 0.0
+        return out
+    
+    def transform(self, df, text, reuse_buffer=False):
+        """Selected feature matrix (dense) for an enhanced frame and its text column, or None
+        
+        reuse_buffer=True writes batches of up to TRANSFORM_BUFFER_ROWS rows into this
+        thread's preallocated buffer; the result is only valid until the next call on the
+        same thread. Larger batches always get a fresh array.
+        """
+        # Missing feature columns (unselected ones included) take the step-by-step pipeline's fallbacks
+        if not self.required_columns.issubset(df.columns):
+            return None
+        try:
+            # Column by column: a multi-column frame selection costs more than the whole transform
+            values = np.array([df[column].to_numpy() for column in self.dense_columns], dtype=np.float64).T
+        except (TypeError, ValueError):
+            return None  # non-numeric values: the step-by-step pipeline has the fallbacks
+        
+        out = self._output(len(df), reuse_buffer)
+        dense = out[:, :self.n_dense]
+        np.copyto(dense, values)
+        missing = np.isnan(dense)
+        if missing.any():
+            dense[missing] = np.broadcast_to(self.fill, dense.shape)[missing]
+        dense -= self.offset
+        dense /= self.scale
+        
+        # Tokenize in Python (as the vectorizer does), then weight, normalize and scatter in bulk
+        vocabulary = self.vocabulary
+        rows, columns = [], []
+        for row, document in enumerate(text):
+            for term in self.analyzer(document):
+                column = vocabulary.get(term)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+        if not rows:
+            return out
+        
+        n_terms = len(self.idf)
+        keys, counts = np.unique(np.array(rows, dtype=np.int64) * n_terms + np.array(columns, dtype=np.int64),
+                                 return_counts=True)
+        rows, columns = keys // n_terms, keys % n_terms
+        weights = np.ones(len(keys)) if self.binary else counts.astype(np.float64)
+        if self.sublinear_tf:
+            weights = np.log(weights) + 1
+        weights *= self.idf[columns]
+        if self.norm == 'l2':
+            weights /= np.sqrt(np.bincount(rows, weights * weights, minlength=len(out)))[rows]
+        positions = self.term_output[columns]
+        kept = positions >= 0
+        out[rows[kept], positions[kept]] = weights[kept]
+        
+        return out
+
 def create_robust_features(df):
     """Create features with fallback handling"""
     try:
@@ -170,17 +517,44 @@ def prepare_features_adaptive(data, model_objects):
     """Adaptive feature preparation that works with different model versions"""
     try:
         # Convert and validate data first
-        converted_data = convert_and_validate_data(data)
-        
-        # Convert to DataFrame
-        if isinstance(converted_data, dict):
-            df = pd.DataFrame([converted_data])
+        if isinstance(data, list):
+            df = pd.DataFrame([validate_request(record, model_objects) for record in data])
         else:
-            df = converted_data.copy()
+            converted_data = validate_request(data, model_objects)
+            
+            # Convert to DataFrame
+            if isinstance(converted_data, dict):
+                df = pd.DataFrame([converted_data])
+            else:
+                df = converted_data.copy()
+        
+        return prepare_features_from_frame(df, model_objects)
         
+    except Exception as e:
+        raise Exception(f"Feature preparation failed: {str(e)}")
+
+def prepare_features_from_frame(df, model_objects, reuse_buffer=False):
+    """Build the model matrix for a DataFrame of already-validated records (one or many rows)
+    
+    reuse_buffer=True lets the compiled transform write into its per-thread buffer
+    (for callers that score the matrix immediately).
+    """
+    try:
         # Create enhanced features
         df_enhanced = create_robust_features(df)
         
+        # Fused impute/scale/TF-IDF/select when the model's preprocessors allow it
+        compiled_transform = model_objects.get('compiled_transform')
+        if compiled_transform is not None:
+            text_feature = model_objects.get('text_feature', 'Description')
+            if text_feature in df_enhanced.columns:
+                text = df_enhanced[text_feature].fillna('').astype(str)
+            else:
+                text = ['Vehicle prediction request'] * len(df_enhanced)
+            X_processed = compiled_transform.transform(df_enhanced, text, reuse_buffer)
+            if X_processed is not None:
+                return X_processed
+        
         # Get feature configuration from model (with fallbacks)
         numerical_features = model_objects.get('numerical_features', [])
         categorical_features = model_objects.get('categorical_features', [])
@@ -204,7 +578,7 @@ def prepare_features_adaptive(data, model_objects):
         if text_feature and text_feature in df_enhanced.columns:
             X_text = df_enhanced[text_feature].fillna('').astype(str)
         else:
-            X_text = pd.Series(['Vehicle prediction request'], index=df_enhanced.index)
+            X_text = pd.Series('Vehicle prediction request', index=df_enhanced.index)
         
         return process_features_robust(X_numerical, X_categorical, X_text, model_objects)
         
@@ -248,20 +622,19 @@ def process_features_robust(X_numerical, X_categorical, X_text, model_objects):
         # Process text features
         try:
             if model_objects.get('tfidf') is not None:
-                X_text_processed = model_objects['tfidf'].transform(X_text)
-                processed_features.append(X_text_processed.toarray())
+                processed_features.append(model_objects['tfidf'].transform(X_text))
         except Exception as e:
             pass
         
         if not processed_features:
             raise ValueError("No features could be processed successfully")
         
-        # Combine features
+        # Combine features (TF-IDF output is already CSR; only the small dense blocks are converted)
         if len(processed_features) == 1:
             X_combined = csr_matrix(processed_features[0])
         else:
             matrices = [csr_matrix(f) for f in processed_features]
-            X_combined = hstack(matrices)
+            X_combined = hstack(matrices, format='csr')
         
         # Apply feature selection if available
         if model_objects.get('feature_selector') is not None:
@@ -277,75 +650,265 @@ def process_features_robust(X_numerical, X_categorical, X_text, model_objects):
     except Exception as e:
         raise Exception(f"Feature processing failed: {str(e)}")
 
+def timings_requested(data):
+    """True when the request asks for stage timings in its response ("include_timings": true)"""
+    return isinstance(data, dict) and bool(data.get('include_timings'))
+
+def request_timer(data):
+    """Prediction timer: on for VMS_STAGE_TIMING (stderr) or for requests that ask for timings"""
+    return StageTimer.from_env('prediction', force=timings_requested(data))
+
+def attach_timings(result, data, timer):
+    """Finish the timer; the report joins the response only when the request asked for it"""
+    report = timer.finish()
+    if report is not None and timings_requested(data) and isinstance(result, dict):
+        result['timings'] = report
+    return result
+
 def make_prediction_enhanced(data, model_path):
     """Enhanced prediction with clean JSON output"""
+    timer = request_timer(data)
     try:
         # Load model
-        model_objects, error_msg = load_model_robust(model_path)
+        with timer.stage('load_model'):
+            model_objects, error_msg = load_model_robust(model_path)
         if model_objects is None:
-            return {'error': f'Could not load model: {error_msg}'}
-        
-        # Prepare features
-        X_processed = prepare_features_adaptive(data, model_objects)
+            return attach_timings({'error': f'Could not load model: {error_msg}'}, data, timer)
         
-        # Make prediction
-        model = model_objects['final_model']
-        prediction = model.predict(X_processed)[0]
+        return predict_with_model(data, model_objects, timer)
         
-        # Get prediction probabilities and confidence
-        confidence = 0.75  # Default confidence
-        probabilities = None
+    except Exception as e:
+        return attach_timings({'error': f'Prediction failed: {str(e)}'}, data, timer)
+
+def predict_with_model(data, model_objects, timer=None):
+    """Predict with already-loaded model objects (shared by the CLI and the prediction server)"""
+    if timer is None:
+        timer = request_timer(data)
+    return attach_timings(score_request(data, model_objects, timer), data, timer)
+
+def score_request(data, model_objects, timer):
+    """predict_with_model without the timing report: validate, cache lookup, features, score, result"""
+    try:
+        with timer.stage('validate_request'):
+            converted = validate_request(data, model_objects)
+        
+        # Repeated requests (same vehicle, mileage, description) are answered from the result cache
+        cache = model_objects.get('prediction_cache')
+        cache_key = cache.key_for(converted, model_objects.get('model_version')) if cache is not None else None
+        if cache_key is not None:
+            with timer.stage('cache_lookup'):
+                cached = cache.get(cache_key)
+            if cached is not None:
+                cached['timestamp'] = datetime.now().isoformat()
+                return cached
+        
+        # Part of the cache key (a different submitted reading is a different answer), not a model input
+        odometer_repair = converted.pop('odometer_repair', None)
         
-        if hasattr(model, 'predict_proba'):
-            try:
-                probabilities = model.predict_proba(X_processed)
-                confidence = np.max(probabilities, axis=1)[0]
-            except Exception as e:
-                pass
+        # Prepare features
+        with timer.stage('prepare_features'):
+            X_processed = prepare_features_from_frame(pd.DataFrame([converted]), model_objects, reuse_buffer=True)
         
-        # Convert prediction back to category name
+        # Make prediction
         try:
-            label_encoder = model_objects['label_encoder']
-            predicted_category = label_encoder.inverse_transform([prediction])[0]
+            with timer.stage('score'):
+                categories, confidences, probabilities = score_feature_matrix(X_processed, model_objects)
         except Exception as e:
-            return {'error': f'Label decoding error: {str(e)}'}
-        
-        # Prepare result
-        result = {
-            'prediction': predicted_category,
-            'confidence': float(confidence),
-            'timestamp': datetime.now().isoformat(),
-            'model_type': model_objects.get('model_type', 'Enhanced ML Model'),
-            'method_used': 'ml_prediction',
-            'feature_count': X_processed.shape[1],
-            'status_used': data.get('Status', 2)
-        }
-        
-        # Add probability distribution if available
-        if probabilities is not None and hasattr(label_encoder, 'classes_'):
-            try:
-                prob_dict = {}
-                for i, class_name in enumerate(label_encoder.classes_):
-                    prob_dict[class_name] = float(probabilities[0][i])
-                result['probability_distribution'] = prob_dict
-            except Exception as e:
-                pass
-        
+            return {'error': str(e)}
+        
+        with timer.stage('build_result'):
+            result = build_prediction_result(data, categories[0], confidences[0],
+                                             probabilities[0] if probabilities is not None else None,
+                                             X_processed.shape[1], model_objects, odometer_repair)
+        if cache_key is not None:
+            cache.put(cache_key, result)
         return result
         
     except Exception as e:
         return {'error': f'Prediction failed: {str(e)}'}
 
+def predict_batch_with_model(records, model_objects):
+    """Score many requests with one pass through each pipeline stage; results keep input order"""
+    results = [None] * len(records)
+    valid_positions = []
+    converted_records = []
+    odometer_repairs = []
+    cache_keys = []
+    cache = model_objects.get('prediction_cache')
+    
+    # One timer for the whole batch; its report goes to every request that asked for timings
+    timer = StageTimer.from_env('prediction_batch', force=any(timings_requested(record) for record in records))
+    
+    # Validate row by row so one bad request cannot fail the batch
+    for position, record in enumerate(records):
+        if isinstance(record, ValueError):
+            results[position] = {'error': f'Invalid request at index {position}: {str(record)}'}
+            continue
+        if not isinstance(record, dict):
+            results[position] = {'error': f'Invalid request at index {position}: expected a JSON object'}
+            continue
+        try:
+            with timer.stage('validate_request'):
+                converted = validate_request(record, model_objects)
+        except Exception as e:
+            results[position] = {'error': f'Prediction failed: {str(e)}'}
+            continue
+        
+        cache_key = cache.key_for(converted, model_objects.get('model_version')) if cache is not None else None
+        if cache_key is not None:
+            with timer.stage('cache_lookup'):
+                cached = cache.get(cache_key)
+            if cached is not None:
+                cached['timestamp'] = datetime.now().isoformat()
+                results[position] = cached
+                continue
+        
+        odometer_repairs.append(converted.pop('odometer_repair', None))
+        converted_records.append(converted)
+        valid_positions.append(position)
+        cache_keys.append(cache_key)
+    
+    if valid_positions:
+        try:
+            with timer.stage('prepare_features'):
+                X_processed = prepare_features_from_frame(pd.DataFrame(converted_records), model_objects,
+                                                          reuse_buffer=True)
+            with timer.stage('score'):
+                categories, confidences, probabilities = score_feature_matrix(X_processed, model_objects)
+            
+            with timer.stage('build_result'):
+                for row, position in enumerate(valid_positions):
+                    results[position] = build_prediction_result(
+                        records[position], categories[row], confidences[row],
+                        probabilities[row] if probabilities is not None else None,
+                        X_processed.shape[1], model_objects, odometer_repairs[row]
+                    )
+                    if cache_keys[row] is not None:
+                        cache.put(cache_keys[row], results[position])
+        except Exception as e:
+            # Vectorized pass failed; isolate the offending rows by scoring individually
+            logger.error(f"Batch scoring failed, falling back to per-row scoring: {e}")
+            with timer.stage('per_row_fallback'):
+                for position in valid_positions:
+                    results[position] = score_request(records[position], model_objects, timer)
+    
+    report = timer.finish()
+    if report is not None:
+        for position, record in enumerate(records):
+            if timings_requested(record) and isinstance(results[position], dict):
+                results[position]['timings'] = report
+    return results
+
+def score_feature_matrix(X_processed, model_objects):
+    """Run the model over a processed feature matrix and decode labels for every row"""
+    model = model_objects['final_model']
+    compiled_model = model_objects.get('compiled_model')
+    
+    # Flat arrays win on per-request latency; sklearn's Cython traversal wins on large batches.
+    # HistGradientBoosting predicts tree by tree from Python, so flat arrays win at every batch size.
+    hist_model = model_objects.get('model_info', {}).get('model_type') == 'hist_gradient_boosting'
+    if compiled_model is not None and (hist_model or X_processed.shape[0] <= COMPILED_MODEL_MAX_ROWS):
+        model = compiled_model
+    
+    # HistGradientBoosting models only accept dense input (the compiled engine densifies by itself)
+    if model is not compiled_model and model_objects.get('dense_input') and hasattr(X_processed, 'toarray'):
+        X_processed = X_processed.toarray()
+    
+    probabilities = None
+    
+    # One predict_proba pass gives label, confidence and distribution (predict would walk every tree again)
+    if hasattr(model, 'predict_proba'):
+        try:
+            probabilities = model.predict_proba(X_processed)
+        except Exception as e:
+            pass
+    
+    if probabilities is not None:
+        best = np.argmax(probabilities, axis=1)
+        predictions = model.classes_[best] if hasattr(model, 'classes_') else best
+        confidences = probabilities[np.arange(len(best)), best]
+    else:
+        predictions = model.predict(X_processed)
+        confidences = np.full(len(predictions), 0.75)  # Default confidence
+    
+    # Convert predictions back to category names
+    try:
+        categories = model_objects['label_encoder'].inverse_transform(predictions)
+    except Exception as e:
+        raise Exception(f'Label decoding error: {str(e)}')
+    
+    return categories, confidences, probabilities
+
+def build_prediction_result(data, predicted_category, confidence, probability_row, feature_count, model_objects,
+                            odometer_repair=None):
+    """Format one scored row as the JSON result returned to PHP (odometer_repair when the reading was replaced)"""
+    result = {
+        'prediction': predicted_category,
+        'confidence': float(confidence),
+        'timestamp': datetime.now().isoformat(),
+        'model_type': model_objects.get('model_type', 'Enhanced ML Model'),
+        'method_used': 'ml_prediction',
+        'feature_count': feature_count,
+        'status_used': data.get('Status', 2)
+    }
+    
+    # Add probability distribution if available
+    label_encoder = model_objects['label_encoder']
+    if probability_row is not None and hasattr(label_encoder, 'classes_'):
+        try:
+            prob_dict = {}
+            for i, class_name in enumerate(label_encoder.classes_):
+                prob_dict[class_name] = float(probability_row[i])
+            result['probability_distribution'] = prob_dict
+        except Exception as e:
+            pass
+    
+    if odometer_repair is not None:
+        result['odometer_repair'] = odometer_repair
+    
+    return result
+
+def read_batch_requests(data_file):
+    """Read a JSON array or JSONL file of prediction requests"""
+    with open(data_file, 'r') as f:
+        content = f.read()
+    
+    if content.lstrip().startswith('['):
+        return json.loads(content)
+    
+    # JSONL: one request per line, malformed lines become per-row errors
+    records = []
+    for line_number, line in enumerate(content.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            records.append(ValueError(f'line {line_number}: {str(e)}'))
+    return records
+
+def make_batch_prediction(data_file, model_path):
+    """Batch prediction over a JSON array or JSONL file"""
+    model_objects, error_msg = load_model_robust(model_path)
+    if model_objects is None:
+        return {'error': f'Could not load model: {error_msg}'}
+    
+    return predict_batch_with_model(read_batch_requests(data_file), model_objects)
+
 def main():
     """Main function with clean JSON output only"""
     try:
-        if len(sys.argv) != 3:
-            error_msg = 'Usage: python predict.py <data_file> <model_path>'
+        args = sys.argv[1:]
+        batch_mode = bool(args) and args[0] == '--batch'
+        if batch_mode:
+            args = args[1:]
+        
+        if len(args) != 2:
+            error_msg = 'Usage: python predict.py [--batch] <data_file> <model_path>'
             print(json.dumps({'error': error_msg}))
             sys.exit(1)
         
-        data_file = sys.argv[1]
-        model_path = sys.argv[2]
+        data_file, model_path = args
         
         # Validate input file
         if not os.path.exists(data_file):
@@ -353,6 +916,14 @@ def main():
             print(json.dumps({'error': error_msg}))
             sys.exit(1)
         
+        if batch_mode:
+            try:
+                results = make_batch_prediction(data_file, model_path)
+            except Exception as e:
+                results = {'error': f'Could not read data file: {str(e)}'}
+            print(json.dumps(results, indent=2))
+            return
+        
         # Read input data
         try:
             with open(data_file, 'r') as f:
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+LRU + TTL cache of prediction results
+Keys are a canonical hash of the validated request (the output of
+convert_and_validate_data) plus the model version, so a different model never
+serves a stale answer. Used by predict_with_model / predict_batch_with_model
+when the prediction server puts a cache into model_objects['prediction_cache'].
+"""
+
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL_SECONDS = 300
+
+def _canonical_value(value):
+    """JSON-stable form: numpy scalars unwrapped, integral floats as ints"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def canonical_request_key(converted, model_version):
+    """sha256 of the validated request fields (sorted) and the model version"""
+    payload = {key: _canonical_value(value) for key, value in converted.items()}
+    encoded = json.dumps([str(model_version), payload], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+class PredictionCache:
+    """Thread-safe bounded LRU of prediction results with a time-to-live per entry"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._lock = threading.Lock()
+        self._model_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key_for(self, converted, model_version):
+        """Cache key for a validated request; a new model version drops every cached entry"""
+        if model_version != self._model_version:
+            with self._lock:
+                if model_version != self._model_version:
+                    if self._entries:
+                        self.invalidations += 1
+                    self._entries.clear()
+                    self._model_version = model_version
+        return canonical_request_key(converted, model_version)
+
+    def get(self, key):
+        """Cached result (a deep copy, so nested probabilities cannot be mutated in place) or None; counts a hit or a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = entry[1]
+        return copy.deepcopy(result)
+
+    def put(self, key, result):
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'model_version': self._model_version
+        }
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Persistent VMS prediction server
+Loads the model once and answers JSON prediction requests over HTTP or a Unix socket.
+The one-shot CLI (python predict.py <data_file> <model_path>) keeps working as a fallback.
+"""
+
+import os
+import time
+import argparse
+import logging
+import threading
+from collections import deque
+
+from typing import List, Optional
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Body, Query
+import uvicorn
+
+from predict import predict_with_model, predict_batch_with_model
+from model_registry import ModelRegistry, DEFAULT_POLL_INTERVAL_SECONDS
+from feature_store import VehicleFeatureStore
+from history_store import FleetHistoryStore, find_history_store
+from fleet_statistics import FleetStatistics, find_fleet_statistics, STATE_SAVE_RECORDS, STATE_SAVE_SECONDS
+from prediction_cache import PredictionCache, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS
+from micro_batcher import MicroBatcher, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS
+from stage_timing import disable_memory_tracing, STAGE_TIMING_ENV
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'model_training_output', 'maintenance_prediction_model.pkl'
+)
+
+# Posted records kept for replay into a reloaded model's store; older ones are expected to be in the
+# exports the next retrain reads, so a server that is never retrained holds at most this many
+POSTED_RECORDS_KEPT = 100000
+
+def create_app(model_path, cache_size=DEFAULT_MAX_ENTRIES, cache_ttl=DEFAULT_TTL_SECONDS,
+               batch_window_ms=DEFAULT_MAX_WAIT_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE, history_store_path=None,
+               fleet_statistics_path=None, reload_interval=DEFAULT_POLL_INTERVAL_SECONDS):
+    """Create the FastAPI app with the model loaded at startup and hot-reloaded when it changes on disk"""
+    # Requests run concurrently on the thread pool, and tracemalloc's peak is process-wide, so per-span
+    # memory peaks would mix requests; timings stay available
+    disable_memory_tracing()
+    if os.environ.get(STAGE_TIMING_ENV, '').strip().lower() == 'memory':
+        logger.warning(f"{STAGE_TIMING_ENV}=memory: memory peaks are not recorded by the server, timings only")
+    # Vehicle history keeps updating between retrains as new service requests arrive. Records posted
+    # since startup (the newest POSTED_RECORDS_KEPT) are replayed into a reloaded model's store,
+    # skipping any its retrain already covered.
+    posted_records = deque(maxlen=POSTED_RECORDS_KEPT)
+
+    def prepare_model(candidate):
+        store = candidate.setdefault('feature_store', VehicleFeatureStore())
+        pending = store.replay(posted_records)
+        posted_records.clear()
+        posted_records.extend(pending)
+
+    registry = ModelRegistry(model_path, reload_interval, prepare=prepare_model)
+    if registry.current is None:
+        logger.error(f"Prediction server could not load model: {registry.message}")
+    
+    # Dashboards re-request the same vehicle/mileage/description; serve repeats from memory
+    # (entries are keyed by model version, so a reloaded model never serves an old answer)
+    prediction_cache = PredictionCache(cache_size, cache_ttl) if cache_size > 0 else None
+    if prediction_cache is not None:
+        registry.share(prediction_cache=prediction_cache)
+
+    def current_feature_store():
+        model_objects = registry.current
+        return model_objects['feature_store'] if model_objects is not None else None
+
+    def unavailable():
+        return {'error': f'Could not load model: {registry.message}'}
+
+    # Full per-vehicle service history, memory-mapped (built by history_store.py next to the model)
+    history_store = None
+    history_store_path = history_store_path or find_history_store(model_path)
+    if history_store_path:
+        try:
+            history_store = FleetHistoryStore.load(history_store_path)
+        except Exception as e:
+            logger.warning(f"Could not load history store {history_store_path}: {e}")
+    if history_store is not None:
+        # Requests repair odometer readings against this store's last good readings
+        registry.share(history_store=history_store)
+
+    # Materialized fleet aggregates (built by fleet_statistics.py); new records fold in and the snapshot is rewritten
+    fleet_statistics = None
+    fleet_statistics_path = fleet_statistics_path or find_fleet_statistics(model_path)
+    if fleet_statistics_path:
+        try:
+            fleet_statistics = FleetStatistics.load(fleet_statistics_path)
+        except Exception as e:
+            logger.warning(f"Could not load fleet statistics {fleet_statistics_path}: {e}")
+    fleet_statistics_lock = threading.Lock()
+    # Records folded in since the state file was last written, and when that was
+    state_save = {'pending': 0, 'at': time.monotonic()}
+
+    def save_fleet_statistics(force_state=False):
+        """Rewrite the snapshot; the full state only every STATE_SAVE_RECORDS records or STATE_SAVE_SECONDS"""
+        include_state = state_save['pending'] > 0 and (
+            force_state or state_save['pending'] >= STATE_SAVE_RECORDS
+            or time.monotonic() - state_save['at'] >= STATE_SAVE_SECONDS)
+        try:
+            fleet_statistics.save(fleet_statistics_path, include_state=include_state)
+        except OSError as e:
+            logger.warning(f"Could not write fleet statistics {fleet_statistics_path}: {e}")
+            return
+        if include_state:
+            state_save.update(pending=0, at=time.monotonic())
+
+    # Concurrent /predict requests are coalesced into one batched pipeline call (max batch size 1 disables)
+    # Each batch scores with the model active when it starts
+    micro_batcher = None
+    if max_batch_size > 1:
+        micro_batcher = MicroBatcher(lambda records: predict_batch_with_model(records, registry.current),
+                                     max_batch_size, batch_window_ms)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        registry.start()
+        yield
+        registry.stop()
+        if fleet_statistics is not None and state_save['pending']:
+            with fleet_statistics_lock:
+                save_fleet_statistics(force_state=True)
+        if micro_batcher is not None:
+            await micro_batcher.close()
+
+    app = FastAPI(title='VMS Prediction Server', lifespan=lifespan)
+
+    @app.get('/health')
+    def health():
+        model = registry.status()
+        return {
+            'status': 'ok' if model['model_version'] is not None else 'model_unavailable',
+            'model_path': model_path,
+            'model_version': model['model_version'],
+            'model_info': model['model_info'],
+            'feature_store_vehicles': len(current_feature_store() or ()),
+            'history_store_records': len(history_store) if history_store is not None else 0,
+            'fleet_statistics_records': len(fleet_statistics) if fleet_statistics is not None else 0,
+            'prediction_cache': prediction_cache.stats() if prediction_cache is not None else None,
+            'micro_batching': micro_batcher.stats() if micro_batcher is not None else None,
+            'message': registry.message
+        }
+
+    @app.get('/model')
+    def model_status():
+        return registry.status()
+
+    @app.post('/model/reload')
+    def reload_model():
+        # Runs in the threadpool: requests keep scoring on the active model while this one loads
+        swapped = registry.reload(force=True)
+        return dict(registry.status(), swapped=swapped)
+
+    # Plain def endpoints run in FastAPI's threadpool, so CPU-bound scoring does not block the event loop
+    if micro_batcher is not None:
+        @app.post('/predict')
+        async def predict(data: dict = Body(...)):
+            if registry.current is None:
+                return unavailable()
+            # Scoring happens on the batcher's thread; this coroutine only waits for its row
+            return await micro_batcher.submit(data)
+    else:
+        @app.post('/predict')
+        def predict(data: dict = Body(...)):
+            model_objects = registry.current
+            if model_objects is None:
+                return unavailable()
+            return predict_with_model(data, model_objects)
+
+    @app.post('/predict/batch')
+    def predict_batch(records: List = Body(...)):
+        model_objects = registry.current
+        if model_objects is None:
+            return unavailable()
+        return predict_batch_with_model(records, model_objects)
+
+    @app.post('/vehicles/history')
+    def add_vehicle_history(records: List[dict] = Body(...)):
+        # The swap lock keeps a reload from replacing the store between the update and the log
+        with registry.swap_lock:
+            feature_store = current_feature_store()
+            if feature_store is None:
+                return unavailable()
+            # Records whose ID was already counted (a retried post, or one in the exports) are skipped
+            # and not logged for replay
+            added = [record for record in records if feature_store.update(record)]
+            posted_records.extend(added)
+        if fleet_statistics is not None:
+            with fleet_statistics_lock:
+                state_save['pending'] += sum(fleet_statistics.update(record) for record in records)
+                save_fleet_statistics()
+        return {'updated': len(added), 'vehicles': len(feature_store)}
+
+    @app.get('/vehicles/{vehicle}/history')
+    def vehicle_history(vehicle: str):
+        feature_store = current_feature_store()
+        history = feature_store.lookup(vehicle) if feature_store is not None else None
+        if history is None:
+            return {'error': f'No service history for vehicle {vehicle}'}
+        return history
+
+    @app.get('/vehicles/{vehicle}/services')
+    def vehicle_services(vehicle: str, limit: Optional[int] = None):
+        if history_store is None:
+            return {'error': 'No history store loaded'}
+        if vehicle not in history_store:
+            return {'error': f'No service history for vehicle {vehicle}'}
+        return history_store.records(vehicle, limit)
+
+    @app.get('/vehicles/{vehicle}/services/last')
+    def vehicle_last_service(vehicle: str, tag: List[str] = Query(...)):
+        if history_store is None:
+            return {'error': 'No history store loaded'}
+        unknown = [name for name in tag if name not in history_store.tag_ids]
+        if unknown:
+            return {'error': f'Unknown service tags: {unknown}'}
+        record = history_store.last_service(vehicle, tag)
+        if record is None:
+            return {'error': f'No matching service for vehicle {vehicle}'}
+        return record
+
+    @app.get('/vehicles/{vehicle}/odometer/check')
+    def check_odometer(vehicle: str, mileage: float):
+        if history_store is None:
+            return {'error': 'No history store loaded'}
+        return history_store.check_reading(vehicle, mileage)
+
+    @app.get('/fleet/statistics')
+    def fleet_statistics_snapshot():
+        if fleet_statistics is None:
+            return {'error': 'No fleet statistics loaded'}
+        with fleet_statistics_lock:
+            return fleet_statistics.snapshot()
+
+    return app
+
+def main():
+    """Run the prediction server"""
+    parser = argparse.ArgumentParser(description='VMS persistent prediction server')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help='Path to the trained model')
+    parser.add_argument('--host', default='127.0.0.1', help='HTTP bind address')
+    parser.add_argument('--port', type=int, default=8765, help='HTTP port')
+    parser.add_argument('--uds', default=None, help='Serve on this Unix socket path instead of TCP')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help='Prediction result cache entries (0 disables the cache)')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL_SECONDS,
+                        help='Seconds a cached prediction stays valid')
+    parser.add_argument('--batch-window-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help='How long /predict waits to coalesce concurrent requests into one batch '
+                             '(0 only batches requests that are already queued)')
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help='Largest coalesced /predict batch (1 scores every request on its own)')
+    parser.add_argument('--history-store', default=None,
+                        help='History store directory (default: history_store next to the model)')
+    parser.add_argument('--fleet-statistics', default=None,
+                        help='Fleet statistics file (default: fleet_statistics.json next to the model)')
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_POLL_INTERVAL_SECONDS,
+                        help='Seconds between checks for a new model on disk (0 disables hot reload)')
+    args = parser.parse_args()
+
+    app = create_app(args.model, args.cache_size, args.cache_ttl, args.batch_window_ms, args.max_batch_size,
+                     args.history_store, args.fleet_statistics, args.reload_interval)
+
+    if args.uds:
+        uvicorn.run(app, uds=args.uds, log_level='warning')
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Compact set of ServiceRequest IDs for de-duplicating posted records
+The IDs already seen (from the exports a store was built on, plus every record
+posted since) are kept as one sorted int64 array. New IDs go into a small set and
+are merged into the array in batches, so membership is a binary search plus a set
+lookup and no save has to sort all IDs again. Saved inside JSON state files as
+base64 of the array bytes, which loads without parsing one number per ID.
+Used by VehicleFeatureStore and FleetStatistics.
+"""
+
+import base64
+
+import numpy as np
+import pandas as pd
+
+from categorical_encoder import normalize_category
+
+RECENT_IDS_LIMIT = 4096
+INT64_MIN, INT64_MAX = int(np.iinfo(np.int64).min), int(np.iinfo(np.int64).max)
+
+def record_id(value):
+    """ServiceRequest ID as an int (exports and JSON posts may carry it as text or a number), or None"""
+    text = normalize_category(value)
+    try:
+        value = int(text) if text is not None else None
+    except ValueError:
+        return None
+    return value if value is not None and INT64_MIN <= value <= INT64_MAX else None
+
+class RecordIdSet:
+    """Sorted int64 array of IDs plus a small set of recent additions not merged in yet"""
+
+    def __init__(self, ids=None):
+        self.ids = np.unique(np.asarray(ids if ids is not None else [], dtype=np.int64))
+        self.recent = set()
+
+    @classmethod
+    def from_column(cls, values):
+        """IDs of a DataFrame column (non-numeric and missing IDs are left out)"""
+        numeric = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').dropna()
+        return cls(numeric[numeric == numeric.round()].to_numpy(dtype=np.int64))
+
+    def __len__(self):
+        return len(self.ids) + len(self.recent)
+
+    def __contains__(self, value):
+        if value in self.recent:
+            return True
+        position = np.searchsorted(self.ids, value)
+        return bool(position < len(self.ids) and self.ids[position] == value)
+
+    def add(self, value):
+        """Add an ID; False when it was already in the set"""
+        if value in self:
+            return False
+        self.recent.add(value)
+        if len(self.recent) >= RECENT_IDS_LIMIT:
+            self._merge_recent()
+        return True
+
+    def _merge_recent(self):
+        if self.recent:
+            # Recent IDs are never in self.ids, so inserting them at their sorted positions keeps it unique
+            recent = np.sort(np.fromiter(self.recent, dtype=np.int64, count=len(self.recent)))
+            self.ids = np.insert(self.ids, np.searchsorted(self.ids, recent), recent)
+            self.recent = set()
+
+    def union(self, other):
+        """New set holding the IDs of both (IDs on both sides are kept once)"""
+        self._merge_recent()
+        other._merge_recent()
+        return RecordIdSet(np.union1d(self.ids, other.ids))
+
+    def to_json(self):
+        self._merge_recent()
+        return base64.b64encode(self.ids.astype('<i8').tobytes()).decode('ascii')
+
+    @classmethod
+    def from_json(cls, payload):
+        ids = cls()
+        ids.ids = np.frombuffer(base64.b64decode(payload), dtype='<i8').astype(np.int64)
+        return ids
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Bulk fleet scoring
+Scores every vehicle in data/Vehicle_profile.txt with the maintenance model and writes
+a ranked table (Parquet or CSV) the dashboard can read instead of scoring on demand.
+
+Each vehicle gets the request PredictionController::preparePredictionDataEnhanced
+builds, with its own history: service_count, average_interval and days_since_last
+come from a VehicleFeatureStore built over the ServiceRequest exports. Odometer is
+the vehicle's highest reading and Building is the one on its latest request.
+Batches of requests go through the vectorized predict.py pipeline in a process pool.
+Each worker loads the model once, and a bundle is memory-mapped and shared between them.
+
+Vehicles are ranked by risk_score, the probability of a repair category (anything
+but routine maintenance or cleaning). Ties are broken by days since the last service.
+
+Usage: python python/score_fleet.py [--model PATH] [--output fleet_risk_scores.parquet]
+                                    [--data EXPORT ...] [--workers N] [--all-vehicles]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from predict import load_model_robust, validate_request, prepare_features_from_frame, score_feature_matrix
+from feature_store import VehicleFeatureStore, normalize_vehicle, HISTORY_FEATURES
+from service_request_loader import DATA_DIR, NA_VALUES, find_service_request_exports, iter_service_request_chunks
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL_PATH = os.path.join(PROJECT_ROOT, 'model_training_output', 'maintenance_prediction_model.pkl')
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'model_training_output')
+VEHICLE_PROFILE_PATH = os.path.join(DATA_DIR, 'Vehicle_profile.txt')
+
+HISTORY_COLUMNS = ['ID', 'Vehicle', 'Odometer', 'MrType', 'Building', 'Datereceived']
+ACTIVE_VEHICLE_STATUS = '1'
+DEFAULT_BATCH_SIZE = 2000
+
+# Categories that are not repairs; every other category's probability counts towards risk
+NON_REPAIR_CATEGORIES = {'routine_maintenance', 'cleaning_service'}
+
+# Fields PredictionController sends for every vehicle prediction
+BASE_REQUEST = {
+    'Description': 'Vehicle prediction request',
+    'Priority': 2,
+    'Status': 2,
+    'MrType': 3
+}
+
+def load_vehicle_profiles(profile_path=VEHICLE_PROFILE_PATH, active_only=True):
+    """One row per registration number (vh_regno) with its depot and profile status"""
+    profiles = pd.read_csv(profile_path, sep='\t', dtype=str, na_values=NA_VALUES,
+                           usecols=lambda name: name in ('vh_regno', 'depot_kod', 'Status', 'UnderMaintenance'))
+    profiles['vehicle'] = profiles['vh_regno'].fillna('').map(normalize_vehicle)
+    profiles = profiles[profiles['vehicle'] != '']
+    if active_only:
+        profiles = profiles[profiles['Status'].str.strip() == ACTIVE_VEHICLE_STATUS]
+    profiles = profiles.drop_duplicates('vehicle')
+    return profiles.rename(columns={'depot_kod': 'depot', 'Status': 'profile_status',
+                                    'UnderMaintenance': 'under_maintenance'})[
+        ['vehicle', 'depot', 'profile_status', 'under_maintenance']].reset_index(drop=True)
+
+def load_service_history(data_paths=None):
+    """ServiceRequest rows needed for vehicle features, streamed from the exports (duplicates by ID dropped)"""
+    frames = []
+    for path in data_paths or find_service_request_exports():
+        try:
+            frames.extend(iter_service_request_chunks(path, columns=HISTORY_COLUMNS))
+        except Exception as e:
+            logger.warning(f"Failed to load {path}: {e}")
+    if not frames:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    history = pd.concat(frames, ignore_index=True)
+    if 'ID' in history.columns:
+        history = history.drop_duplicates(subset='ID')
+    return history
+
+def build_fleet_requests(profiles, history, as_of=None):
+    """Prediction request per vehicle: PHP's request shape filled with the vehicle's own history"""
+    store = VehicleFeatureStore.from_history(history)
+    as_of = as_of or datetime.now()
+
+    latest = pd.DataFrame({
+        'vehicle': history['Vehicle'].astype(str).map(normalize_vehicle),
+        'odometer': pd.to_numeric(history['Odometer'], errors='coerce'),
+        'building': history['Building'],
+        'date': pd.to_datetime(history['Datereceived'], errors='coerce')
+    }).sort_values('date', kind='mergesort')
+    grouped = latest.groupby('vehicle', sort=False)
+    highest_odometer = grouped['odometer'].max()
+    last_building = grouped['building'].last()
+
+    requests, has_history = [], []
+    for vehicle in profiles['vehicle']:
+        request = dict(BASE_REQUEST, Vehicle=vehicle)
+        odometer = highest_odometer.get(vehicle)
+        if odometer is not None and pd.notna(odometer):
+            request['Odometer'] = float(odometer)
+        building = last_building.get(vehicle)
+        if building is not None and pd.notna(building):
+            request['Building'] = building
+        features = store.lookup(vehicle, as_of)
+        if features is not None:
+            request.update(features)
+        requests.append(request)
+        has_history.append(features is not None)
+    return requests, np.array(has_history)
+
+_worker_model_objects = None
+
+def _load_worker_model(model_path):
+    """Pool initializer: load the model once per worker process"""
+    global _worker_model_objects
+    _worker_model_objects, message = load_model_robust(model_path)
+    if _worker_model_objects is None:
+        raise RuntimeError(f"Could not load model: {message}")
+
+def score_requests(requests, model_objects=None):
+    """Labels, confidences and probability matrix for a batch of requests in one vectorized pass"""
+    model_objects = model_objects or _worker_model_objects
+    converted = [validate_request(request, model_objects) for request in requests]
+    X_processed = prepare_features_from_frame(pd.DataFrame(converted), model_objects)
+    categories, confidences, probabilities = score_feature_matrix(X_processed, model_objects)
+    return np.asarray(categories), np.asarray(confidences), probabilities
+
+def score_fleet(requests, model_path, model_objects, workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    """Score all requests in batches; batches run in a process pool when workers > 1"""
+    batches = [requests[start:start + batch_size] for start in range(0, len(requests), batch_size)]
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches)), initializer=_load_worker_model,
+                                 initargs=(model_path,)) as pool:
+            results = list(pool.map(score_requests, batches))
+    else:
+        results = [score_requests(batch, model_objects) for batch in batches]
+
+    categories = np.concatenate([result[0] for result in results])
+    confidences = np.concatenate([result[1] for result in results])
+    probabilities = np.vstack([result[2] for result in results]) if results[0][2] is not None else None
+    return categories, confidences, probabilities
+
+def rank_fleet(profiles, requests, has_history, categories, confidences, probabilities, class_names,
+               model_version=None):
+    """Ranked result table: one row per vehicle, highest repair risk first"""
+    table = profiles.copy()
+    table['predicted_category'] = categories
+    table['confidence'] = confidences.astype(float)
+
+    if probabilities is not None:
+        repair = np.array([name not in NON_REPAIR_CATEGORIES for name in class_names])
+        table['risk_score'] = probabilities[:, repair].sum(axis=1)
+        for position, name in enumerate(class_names):
+            table[f'prob_{name}'] = probabilities[:, position]
+    else:
+        table['risk_score'] = np.where(np.isin(categories, list(NON_REPAIR_CATEGORIES)), 0.0, confidences)
+
+    table['odometer'] = [request.get('Odometer') for request in requests]
+    for field in HISTORY_FEATURES:
+        table[field] = [request.get(field) for request in requests]
+    table['has_history'] = has_history
+    table['model_version'] = model_version
+    table['scored_at'] = datetime.now().isoformat(timespec='seconds')
+
+    table = table.sort_values(['risk_score', 'days_since_last'], ascending=[False, False],
+                              kind='mergesort', na_position='last').reset_index(drop=True)
+    table.insert(0, 'rank', np.arange(1, len(table) + 1))
+    return table
+
+def write_fleet_scores(table, output_path):
+    """Parquet for .parquet paths (needs pyarrow), CSV otherwise; written atomically"""
+    staging_path = f"{output_path}.tmp"
+    if output_path.endswith('.parquet'):
+        table.to_parquet(staging_path, index=False)
+    else:
+        table.to_csv(staging_path, index=False)
+    os.replace(staging_path, output_path)
+    return output_path
+
+def default_output_path():
+    try:
+        import pyarrow  # noqa: F401
+        return os.path.join(DEFAULT_OUTPUT_DIR, 'fleet_risk_scores.parquet')
+    except ImportError:
+        return os.path.join(DEFAULT_OUTPUT_DIR, 'fleet_risk_scores.csv')
+
+def main():
+    parser = argparse.ArgumentParser(description='Score the whole fleet and write ranked maintenance risk')
+    parser.add_argument('--model', default=os.environ.get('VMS_MODEL_PATH', DEFAULT_MODEL_PATH),
+                        help='Model pickle or bundle directory (default: VMS_MODEL_PATH or the trained pickle)')
+    parser.add_argument('--profiles', default=VEHICLE_PROFILE_PATH, help='Vehicle profile export')
+    parser.add_argument('--data', nargs='+', metavar='EXPORT',
+                        help='ServiceRequest exports with the service history (default: data/ exports)')
+    parser.add_argument('--output', help='Result file, .parquet or .csv (default: model_training_output/fleet_risk_scores.*)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Scoring processes (default: all cores)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--all-vehicles', action='store_true',
+                        help='Include vehicles whose profile Status is not active')
+    args = parser.parse_args()
+    # predict.py configures the root logger for errors only; progress is useful for this CLI
+    logging.getLogger().setLevel(logging.INFO)
+
+    start = time.perf_counter()
+    model_objects, message = load_model_robust(args.model)
+    if model_objects is None:
+        sys.exit(f"Could not load model: {message}")
+
+    profiles = load_vehicle_profiles(args.profiles, active_only=not args.all_vehicles)
+    history = load_service_history(args.data)
+    requests, has_history = build_fleet_requests(profiles, history)
+    logger.info(f"{len(requests)} vehicles ({int(has_history.sum())} with service history), "
+                f"{len(history)} service requests")
+
+    categories, confidences, probabilities = score_fleet(requests, args.model, model_objects,
+                                                         args.workers, args.batch_size)
+    table = rank_fleet(profiles, requests, has_history, categories, confidences, probabilities,
+                       model_objects['label_encoder'].classes_, model_objects.get('model_version'))
+
+    output_path = write_fleet_scores(table, args.output or default_output_path())
+    logger.info(f"Fleet scores written to {output_path} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Chunked ServiceRequest export reader
+Detects encoding and delimiter from a small byte sample and streams the file in
+chunks with explicit dtypes taken from data/column information.txt.
+
+Supported layouts:
+- delimited exports (tab, comma, semicolon or pipe), e.g. data/WRH311_2020-2025.txt
+- Excel "formatted text" .prn exports, e.g. data/ServiceRequest_Sample.prn: fixed-width
+  columns whose header names are truncated to the column width, written as several
+  vertical blocks (first columns of every row, then a new header and the remaining columns)
+"""
+
+import io
+import os
+import csv
+from itertools import islice
+from collections import OrderedDict
+
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+SCHEMA_PATH = os.path.join(DATA_DIR, 'column information.txt')
+
+SAMPLE_BYTES = 64 * 1024
+DEFAULT_CHUNKSIZE = 50000
+NA_VALUES = ['NULL', '#NAME?', '########']
+DELIMITERS = ['\t', ',', ';', '|']
+# Lookup tables that share the export naming pattern but are not ServiceRequest rows
+LOOKUP_TABLE_FILES = {'ServiceRequest_Status.prn'}
+
+# Excel-saved exports keep only mm:ss.f in these datetime columns; the full timestamp is in the paired text column
+DATETIME_FALLBACK_COLUMNS = {
+    'Datereceived': 'timereceived',
+    'responseDate': 'ResponseTime',
+    'DateClose': 'TimeClose'
+}
+
+DATETIME_FORMATS = ['%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%b %d %Y %I:%M%p']
+
+SQL_TO_PANDAS_DTYPES = {
+    'int': 'Int64',
+    'bigint': 'Int64',
+    'float': 'float64',
+    'bit': 'Int8',
+    'datetime': 'datetime64[ns]'
+}
+
+def load_schema(schema_path=SCHEMA_PATH):
+    """Ordered {column: sql type} from the INFORMATION_SCHEMA dump"""
+    schema = OrderedDict()
+    with open(schema_path, 'r', encoding='utf-8', errors='replace') as f:
+        reader = csv.DictReader(f, delimiter='\t')
+        rows = sorted(reader, key=lambda row: int(row['ORDINAL_POSITION']))
+    for row in rows:
+        schema[row['COLUMN_NAME']] = row['DATA_TYPE'].strip().lower()
+    return schema
+
+def detect_encoding(sample):
+    """Pick an encoding from a byte sample (BOM first, then strict UTF-8, then cp1252/latin-1)"""
+    if sample.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    if sample.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16'
+
+    for encoding in ['utf-8', 'cp1252']:
+        try:
+            # A multi-byte character may be cut at the end of the sample
+            sample[:-4].decode(encoding) if len(sample) > 4 else sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+def detect_format(path, schema=None):
+    """Detect encoding, delimiter and column layout from the first SAMPLE_BYTES of a file"""
+    schema = schema or load_schema()
+
+    with open(path, 'rb') as f:
+        sample = f.read(SAMPLE_BYTES)
+
+    encoding = detect_encoding(sample)
+    lines = sample.decode(encoding, errors='replace').splitlines()
+    if not lines:
+        raise ValueError(f"Empty export: {path}")
+    header = lines[0]
+
+    # Delimited: the delimiter that splits the header into the most known schema columns
+    best_delimiter, best_columns = None, []
+    for delimiter in DELIMITERS:
+        columns = [name.strip().strip('"') for name in header.split(delimiter)]
+        known = [name for name in columns if name in schema]
+        if len(known) > len(best_columns):
+            best_delimiter, best_columns = delimiter, known
+
+    if len(best_columns) >= 5:
+        return {'encoding': encoding, 'delimiter': best_delimiter, 'columns': best_columns, 'blocks': None}
+
+    # Fixed width: recover column boundaries from the truncated header names
+    blocks = _locate_fixed_width_blocks(path, encoding, list(schema))
+    columns = [name for block in blocks for name, _ in block['colspecs']]
+    if len(columns) < 5:
+        raise ValueError(f"Unrecognised ServiceRequest export layout: {path}")
+    return {'encoding': encoding, 'delimiter': None, 'columns': columns, 'blocks': blocks}
+
+def _fixed_width_layout(header, schema_columns, column_index=0):
+    """Map a truncated fixed-width header onto schema columns, starting at column_index
+
+    A column name shorter than its width is followed by padding spaces; a longer
+    name is cut to exactly the column width, so the next column starts right after it.
+    Returns [(column, (start, end))] and the index of the next unmatched schema column.
+    """
+    colspecs = []
+    position = 0
+    header = header.rstrip()
+
+    while position < len(header) and column_index < len(schema_columns):
+        name = schema_columns[column_index]
+        matched = 0
+        while (matched < len(name) and position + matched < len(header)
+               and header[position + matched] == name[matched]):
+            matched += 1
+        if matched == 0:
+            break
+
+        end = position + matched
+        if matched == len(name):
+            while end < len(header) and header[end] == ' ':
+                end += 1
+        colspecs.append((name, (position, end)))
+        position = end
+        column_index += 1
+
+    # The last column runs to the end of the line
+    if colspecs:
+        name, (start, _) = colspecs[-1]
+        colspecs[-1] = (name, (start, None))
+    return colspecs, column_index
+
+def _locate_fixed_width_blocks(path, encoding, schema_columns):
+    """Find the byte offset and layout of each vertical block in a .prn export"""
+    blocks = []
+    column_index = 0
+
+    with open(path, 'rb') as f:
+        offset = 0
+        for raw_line in f:
+            if column_index >= len(schema_columns):
+                break
+            line = raw_line.decode(encoding, errors='replace').rstrip('\r\n')
+            # The first line is always a header; later blocks start with the next schema column name
+            next_name = schema_columns[column_index]
+            if not blocks or line.startswith(next_name[:8]):
+                colspecs, next_index = _fixed_width_layout(line, schema_columns, column_index)
+                if colspecs:
+                    blocks.append({'offset': offset, 'colspecs': colspecs})
+                    column_index = next_index
+                elif not blocks:
+                    break
+            offset += len(raw_line)
+
+    return blocks
+
+def _read_fixed_width_chunks(path, layout, columns, chunksize):
+    """Stream a multi-block .prn file, reading every block's rows in lockstep"""
+    handles = []
+    try:
+        for block in layout['blocks']:
+            handle = open(path, 'r', encoding=layout['encoding'], errors='replace', newline='')
+            handle.seek(block['offset'])
+            handle.readline()  # block header
+            handles.append(handle)
+
+        while True:
+            parts = []
+            for handle, block in zip(handles, layout['blocks']):
+                lines = list(islice(handle, chunksize))
+                wanted = [(name, spec) for name, spec in block['colspecs'] if name in columns]
+                if not lines or not wanted:
+                    parts.append(pd.DataFrame(index=pd.RangeIndex(len(lines))))
+                    continue
+                parts.append(pd.read_fwf(
+                    io.StringIO(''.join(lines)),
+                    colspecs=[spec for _, spec in wanted],
+                    names=[name for name, _ in wanted],
+                    header=None,
+                    dtype=str,
+                    na_values=NA_VALUES
+                ))
+
+            n_rows = min(len(part) for part in parts)
+            if n_rows == 0:
+                break
+            yield pd.concat([part.iloc[:n_rows].reset_index(drop=True) for part in parts], axis=1)
+    finally:
+        for handle in handles:
+            handle.close()
+
+def detect_datetime_format(values, sample_size=50):
+    """First known format that parses every value in a small sample, or None (e.g. Excel-mangled mm:ss.f)"""
+    sample = values.dropna().head(sample_size)
+    for date_format in DATETIME_FORMATS:
+        if pd.to_datetime(sample, format=date_format, errors='coerce').notna().all():
+            return date_format
+    return None
+
+def parse_export_datetime(series):
+    """Parse export timestamps with one explicit format per column (no per-element format inference)"""
+    date_format = detect_datetime_format(series)
+    if date_format is None:
+        return pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    return pd.to_datetime(series, format=date_format, errors='coerce')
+
+def apply_schema_types(chunk, schema):
+    """Convert string columns to the dtypes declared in the schema"""
+    for column in list(chunk.columns):
+        sql_type = schema.get(column)
+        target = SQL_TO_PANDAS_DTYPES.get(sql_type)
+        if target is None:
+            continue
+        if target == 'datetime64[ns]':
+            parsed = parse_export_datetime(chunk[column])
+            fallback = DATETIME_FALLBACK_COLUMNS.get(column)
+            if fallback in chunk.columns:
+                parsed = parsed.fillna(parse_export_datetime(chunk[fallback]))
+            chunk[column] = parsed
+        else:
+            chunk[column] = pd.to_numeric(chunk[column], errors='coerce').astype(target)
+    return chunk
+
+def iter_service_request_chunks(path, columns=None, chunksize=DEFAULT_CHUNKSIZE, schema=None):
+    """Yield typed DataFrame chunks of a ServiceRequest export, reading only the requested columns"""
+    schema = schema or load_schema()
+    layout = detect_format(path, schema)
+
+    wanted = [name for name in layout['columns'] if columns is None or name in columns]
+    # Datetime columns may need their paired text column to recover the timestamp
+    wanted += [fallback for column, fallback in DATETIME_FALLBACK_COLUMNS.items()
+               if column in wanted and fallback in layout['columns'] and fallback not in wanted]
+
+    if layout['delimiter'] is not None:
+        reader = pd.read_csv(
+            path,
+            sep=layout['delimiter'],
+            encoding=layout['encoding'],
+            usecols=lambda name: name.strip() in wanted,
+            dtype=str,
+            na_values=NA_VALUES,
+            chunksize=chunksize
+        )
+    else:
+        reader = _read_fixed_width_chunks(path, layout, wanted, chunksize)
+
+    for chunk in reader:
+        chunk.columns = [name.strip() for name in chunk.columns]
+        chunk = apply_schema_types(chunk, schema)
+        if columns is not None:
+            chunk = chunk[[name for name in chunk.columns if name in columns]]
+        yield chunk
+
+def find_service_request_exports(data_dir=DATA_DIR):
+    """ServiceRequest export files shipped in data/ (per-vehicle .txt exports and .prn samples)"""
+    import glob
+    paths = sorted(glob.glob(os.path.join(data_dir, '*_2020-2025.txt')))
+    paths += sorted(path for path in glob.glob(os.path.join(data_dir, 'ServiceRequest_*.prn'))
+                    if os.path.basename(path) not in LOOKUP_TABLE_FILES)
+    return paths
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Named timing spans (and optional tracemalloc peaks) for training and prediction stages
+A StageTimer records one span per `with timer.stage(name):` block; nested spans get
+'/'-joined names. finish() returns the report and, when VMS_STAGE_TIMING is set,
+writes it to stderr as one JSON line:
+    VMS_STAGE_TIMING=1       timings
+    VMS_STAGE_TIMING=memory  timings plus tracemalloc peak memory per span
+Disabled timers cost one attribute check per stage. PHP runs predict.py with stderr
+merged into stdout, so keep the variable unset there and ask for timings in the
+request ("include_timings": true) instead.
+tracemalloc is process-wide: the first memory-tracing timer starts it and it stays on
+for the life of the process (no timer stops it). Peaks are measured by resetting the
+process peak, so they are only meaningful while one timer runs at a time (training,
+the predict.py CLI). A multithreaded server calls disable_memory_tracing() at startup.
+"""
+
+import os
+import sys
+import json
+import time
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+STAGE_TIMING_ENV = 'VMS_STAGE_TIMING'
+
+_tracing_lock = threading.Lock()
+_memory_tracing = {'allowed': True}
+
+def disable_memory_tracing():
+    """Turn off per-span memory peaks for the rest of the process (concurrent timers would reset each other's)"""
+    _memory_tracing['allowed'] = False
+
+def _start_tracing():
+    """Start tracemalloc once for the process; it is never stopped by a timer"""
+    with _tracing_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+class StageTimer:
+    """Collects named spans for one training run or one prediction request (not shared between threads)"""
+
+    def __init__(self, name, enabled=True, trace_memory=False, emit=False):
+        self.name = name
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory and _memory_tracing['allowed']
+        self.emit = emit
+        self.spans = []
+        self._stack = []  # open spans: (name, start, start_memory, peak_memory)
+        self._started = time.perf_counter()
+        if self.trace_memory:
+            _start_tracing()
+
+    @classmethod
+    def from_env(cls, name, force=False):
+        """Timer configured by VMS_STAGE_TIMING; force=True records even when the variable is unset"""
+        setting = os.environ.get(STAGE_TIMING_ENV, '').strip().lower()
+        emit = setting not in ('', '0', 'false', 'no')
+        return cls(name, enabled=emit or force, trace_memory=setting == 'memory', emit=emit)
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        if self.trace_memory:
+            self._fold_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            self._stack.append([name, time.perf_counter(), current, current])
+        else:
+            self._stack.append([name, time.perf_counter(), 0, 0])
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - self._stack[-1][1]
+            if self.trace_memory:
+                self._fold_peak()
+            span_name, _, start_memory, peak_memory = self._stack.pop()
+            span = {'stage': '/'.join([entry[0] for entry in self._stack] + [span_name]),
+                    'seconds': round(seconds, 6)}
+            if self.trace_memory:
+                span['peak_memory_kb'] = round((peak_memory - start_memory) / 1024, 1)
+            self.spans.append(span)
+
+    def _fold_peak(self):
+        """Credit tracemalloc's peak since the last reset to every open span, then reset it"""
+        peak = tracemalloc.get_traced_memory()[1]
+        for entry in self._stack:
+            entry[3] = max(entry[3], peak)
+        tracemalloc.reset_peak()
+
+    def report(self):
+        """Spans in completion order plus per-stage totals (stages can repeat, e.g. per column)"""
+        totals = {}
+        for span in self.spans:
+            total = totals.setdefault(span['stage'], {'count': 0, 'seconds': 0.0})
+            total['count'] += 1
+            total['seconds'] = round(total['seconds'] + span['seconds'], 6)
+        return {
+            'timer': self.name,
+            'total_seconds': round(time.perf_counter() - self._started, 6),
+            'pid': os.getpid(),
+            'spans': self.spans,
+            'totals': totals
+        }
+
+    def finish(self):
+        """Report for this timer (None when disabled); written to stderr as JSON when emitting"""
+        if not self.enabled:
+            return None
+        report = self.report()
+        if self.emit:
+            sys.stderr.write(json.dumps(report) + '\n')
+            sys.stderr.flush()
+        return report
+
+def timed_stage(name=None):
+    """Method decorator: run the method inside self.timer.stage(name or method name)"""
+    def decorator(method):
+        stage_name = name or method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.timer.stage(stage_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
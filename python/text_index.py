@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Multi-pattern keyword index over service request text
+The bilingual (Malay/English) keyword dictionaries used for maintenance labels,
+parts analysis and safety analysis are compiled into one regex. The regex is a
+trie of every keyword inside a lookahead, so one scan reports the longest keyword
+starting at each position. Shorter keywords that begin at the same place are
+prefixes of it, and a precomputed closure adds their tags.
+Matching is plain substring matching on lowercased text, like str_contains and
+`in`, with no word boundaries. Each record's tags are stored as a bitset
+(uint64 words). FleetHistoryStore (history_store.py) keeps these bitsets per
+record and answers "last brake service for vehicle X" from them.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Keyword rules for maintenance categories, in precedence order (ShapeFixedVMSTrainer.create_maintenance_categories)
+MAINTENANCE_KEYWORD_RULES = [
+    ('brake_system', ['brake', 'brek', 'rem', 'brake pad', 'brake fluid']),
+    ('tire_service', ['tire', 'tayar', 'tyre', 'wheel']),
+    ('engine_repair', ['engine', 'enjin', 'motor', 'piston']),
+    ('routine_maintenance', ['oil', 'minyak', 'pelincir', 'lubricant']),
+    ('electrical_system', ['electrical', 'elektrik', 'wiring', 'battery']),
+    ('body_work', ['body', 'badan', 'panel', 'paint']),
+    ('air_system', ['air', 'udara', 'pneumatic', 'compressor']),
+    ('hydraulic_system', ['hydraulic', 'hidraulik', 'pump'])
+]
+
+# PredictionController keyword dictionaries, grouped by the analysis that uses them (tags are "group:name")
+SERVICE_TAG_GROUPS = [
+    ('category', MAINTENANCE_KEYWORD_RULES),
+    # vehicleParts in the parts analysis (findLastServiceForVehiclePart)
+    ('part', [
+        ('Engine Oil & Hydraulics', ['engine oil', 'minyak enjin', 'minyak hitam', 'oil change', 'minyak hydraulic',
+                                     'minyak power steering', 'minyak gearbox', 'oil filter', 'minyak jet']),
+        ('Brake System', ['brake', 'brek', 'adjust brake', 'brake chamber', 'lining brake', 'brake jammed',
+                          'angin bocor', 'pad brek']),
+        ('Oil Seals', ['oil seal', 'oilseal', 'seal minyak', 'bocor']),
+        ('Tires & Wheels', ['tayar', 'tire', 'tukar tayar', 'tayar pancit']),
+        ('Electrical & Lighting', ['lampu', 'wiring', 'electrical', 'signal', 'battery']),
+        ('Air System', ['angin bocor', 'air bocor', 'belon bocor']),
+        ('Cooling System', ['coolant', 'air coolant', 'radiator']),
+        ('General Maintenance', ['servis', 'service', 'check', 'inspection'])
+    ]),
+    # analyzeBrakeSystemSafety / analyzeTireSystemSafety severities (first matching severity wins)
+    ('brake_safety', [
+        ('critical', ['brake jammed', 'brek jammed', 'brake fail', 'pedal kosong', 'no brake']),
+        ('urgent', ['brake issue', 'brake berbunyi', 'angin bocor', 'lining brake', 'pad brek']),
+        ('routine', ['adjust brake', 'check brake', 'brake service'])
+    ]),
+    ('tire_safety', [
+        ('critical', ['tayar meletup', 'tire blowout', 'tayar tercabut', 'breakdown tayar']),
+        ('urgent', ['tayar botak', 'tayar terkopak', 'bunga terkopak', 'tayar makan sebelah']),
+        ('routine', ['tukar tayar', 'tayar pancit', 'tampal tayar'])
+    ]),
+    ('air_safety', [('leak', ['angin bocor', 'air bocor', 'belon bocor', 'angin tidak naik', 'chamber bocor'])]),
+    ('electrical_safety', [('fault', ['lampu brake', 'signal tidak', 'lampu mati', 'wiring short', 'lampu emergency'])]),
+    # getAdvancedTireAnalysis
+    ('tire_service', [
+        ('Tire Replacement', ['ganti tayar', 'tukar tayar', 'replace tire', 'tire replacement']),
+        ('Tire Repair', ['tampal tayar', 'repair tire', 'tayar pancit', 'tire puncture']),
+        ('Tire Inspection', ['check tayar', 'inspect tire', 'tayar check']),
+        ('Tire Wear', ['tayar botak', 'tire wear', 'bunga tayar', 'tread wear']),
+        ('Tire Pressure', ['angin tayar', 'tire pressure', 'pump tire']),
+        ('Tire Rotation', ['putar tayar', 'tire rotation', 'rotate tire'])
+    ]),
+    # analyzePartsUsageTrends
+    ('parts_trend', [
+        ('Oil Services', ['minyak', 'oil', 'oil change', 'oil filter']),
+        ('Brake Services', ['brake', 'brek', 'lining', 'pad']),
+        ('Tire Services', ['tayar', 'tire', 'tyre']),
+        ('Electrical', ['lampu', 'wiring', 'electrical', 'battery']),
+        ('Engine Services', ['enjin', 'engine', 'motor']),
+        ('Air System', ['angin', 'air', 'belon'])
+    ])
+]
+
+# Joins records into one string for a single scan; no keyword contains it, so matches never span records
+RECORD_SEPARATOR = '\x00'
+
+def _trie_regex(keywords):
+    """Regex matching the longest keyword at a position: a trie with greedy optional continuations"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[None] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(
+            ((char, child) for char, child in node.items() if char is not None))]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if None in node else body
+
+    return build(trie)
+
+class KeywordTagger:
+    """Tags texts with every (tag, keywords) rule they match, in one regex scan for all rules"""
+
+    def __init__(self, tag_keywords):
+        self.tags = [tag for tag, _ in tag_keywords]
+        self.tag_ids = {tag: position for position, tag in enumerate(self.tags)}
+        self.n_words = max(1, (len(self.tags) + 63) // 64)
+
+        keyword_bits = {}
+        for position, (_, keywords) in enumerate(tag_keywords):
+            for keyword in keywords:
+                keyword = keyword.lower()
+                keyword_bits[keyword] = keyword_bits.get(keyword, 0) | (1 << position)
+
+        # The scan reports the longest keyword per position; keywords that are its prefixes matched there too
+        self.keywords = sorted(keyword_bits)
+        self.keyword_ids = {keyword: position for position, keyword in enumerate(self.keywords)}
+        closure = [0] * len(self.keywords)
+        for position, keyword in enumerate(self.keywords):
+            for other, bits in keyword_bits.items():
+                if keyword.startswith(other):
+                    closure[position] |= bits
+        self.keyword_masks = self._words(closure)
+        self.pattern = re.compile(f"(?=({_trie_regex(self.keywords)}))")
+
+    @classmethod
+    def from_groups(cls, groups):
+        """Tagger over grouped rules; tags are named "group:name" """
+        return cls([(f"{group}:{name}", keywords) for group, rules in groups for name, keywords in rules])
+
+    def _words(self, masks):
+        """Python int bitmasks -> (n, n_words) uint64 array"""
+        return np.array([[(mask >> (64 * word)) & 0xFFFFFFFFFFFFFFFF for word in range(self.n_words)]
+                         for mask in masks], dtype=np.uint64).reshape(len(masks), self.n_words)
+
+    def mask(self, tags):
+        """Bitset (n_words,) selecting the given tag names"""
+        bits = 0
+        for tag in ([tags] if isinstance(tags, str) else tags):
+            bits |= 1 << self.tag_ids[tag]
+        return self._words([bits])[0]
+
+    def tag_texts(self, texts):
+        """Tag bitsets (n_texts, n_words) for raw texts (lowercased here, like strtolower)"""
+        texts = pd.Series(texts, dtype=object).fillna('').astype(str).str.lower()
+        bits = np.zeros((len(texts), self.n_words), dtype=np.uint64)
+        if len(texts) == 0:
+            return bits
+
+        joined = RECORD_SEPARATOR.join(texts.to_numpy())
+        starts, keyword_ids = [], []
+        for match in self.pattern.finditer(joined):
+            starts.append(match.start())
+            keyword_ids.append(self.keyword_ids[match.group(1)])
+        if not starts:
+            return bits
+
+        row_starts = np.concatenate([[0], np.cumsum(texts.str.len().to_numpy() + 1)[:-1]])
+        rows = np.searchsorted(row_starts, np.asarray(starts, dtype=np.int64), side='right') - 1
+        masks = self.keyword_masks[np.asarray(keyword_ids, dtype=np.intp)]
+        for word in range(self.n_words):
+            np.bitwise_or.at(bits[:, word], rows, masks[:, word])
+        return bits
+
+    def has_any(self, bits, tags):
+        """Boolean per record: does its bitset contain any of the tags"""
+        return (bits & self.mask(tags)).any(axis=1)
+
+    def first_match(self, bits, tags):
+        """Per record, the first tag in `tags` it carries (precedence order), or None"""
+        tags = list(tags)
+        conditions = [self.has_any(bits, tag) for tag in tags]
+        return np.select(conditions, tags, default=None) if conditions else np.full(len(bits), None)
+
+    def tags_of(self, record_bits):
+        """Tag names in one record's bitset"""
+        return [tag for tag, position in self.tag_ids.items()
+                if (int(record_bits[position // 64]) >> (position % 64)) & 1]
+
+MAINTENANCE_TAGGER = KeywordTagger(MAINTENANCE_KEYWORD_RULES)
+SERVICE_TAGGER = KeywordTagger.from_groups(SERVICE_TAG_GROUPS)
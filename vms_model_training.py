@@ -9,19 +9,39 @@ import numpy as np
 import pickle
 import os
 from datetime import datetime
+import json
+import sys
+import time
+import shutil
+import hashlib
+import inspect
+import argparse
 import warnings
 import logging
 
 # ML imports
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.model_selection import train_test_split, cross_val_score, ParameterGrid, StratifiedKFold
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.impute import SimpleImputer
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
 from sklearn.feature_selection import SelectKBest, f_classif
 from sklearn.metrics import classification_report, accuracy_score
-from scipy.sparse import hstack, csr_matrix
+from scipy import special
+from scipy.sparse import hstack, csr_matrix, save_npz, load_npz
+from joblib import Parallel, delayed
+
+# Runtime modules (export loader) live in python/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python'))
+from service_request_loader import iter_service_request_chunks, find_service_request_exports
+from feature_store import (VehicleFeatureStore, point_in_time_history_features,
+                           HISTORY_FEATURES, FEATURE_STORE_FILENAME)
+from categorical_encoder import StableCategoricalEncoder
+from stage_timing import StageTimer, timed_stage
+from text_index import MAINTENANCE_KEYWORD_RULES, MAINTENANCE_TAGGER
+from odometer_validator import validate_odometer_history, UNKNOWN_ODOMETER
+from model_bundle import BUNDLE_FORMAT_VERSION, MANIFEST_FILENAME, CURRENT_FILENAME
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -29,11 +49,153 @@ logger = logging.getLogger(__name__)
 
 warnings.filterwarnings('ignore')
 
+# Raw ServiceRequest columns used by preprocessing; everything else is dropped while streaming.
+# Datereceived is the only date create_time_features needs when it is present (it always is in the exports).
+TRAINING_COLUMNS = [
+    'ID', 'Vehicle', 'Odometer', 'Priority', 'Status', 'MrType', 'Building',
+    'Description', 'Response', 'Datereceived'
+]
+
+NUMERIC_TRAINING_COLUMNS = ['Odometer', 'Priority', 'Status', 'MrType', 'Building']
+
+# Every label create_maintenance_categories can produce, sorted (LabelEncoder order)
+MAINTENANCE_CATEGORIES = np.array(sorted(
+    {'cleaning_service', 'engine_repair', 'mechanical_repair', 'routine_maintenance'}
+    | {category for category, _ in MAINTENANCE_KEYWORD_RULES}
+))
+
+# Bundle versions kept on disk after a save (CURRENT's target is never removed)
+BUNDLE_VERSIONS_KEPT = 3
+
+# Out-of-core training (--out-of-core): text columns streamed separately from everything else
+OUT_OF_CORE_TEXT_COLUMNS = ['Description', 'Response']
+OUT_OF_CORE_TEXT_FEATURES = 2 ** 12  # HashingVectorizer buckets (stateless, so no vocabulary pass)
+OUT_OF_CORE_CHUNK_ROWS = 50000
+OUT_OF_CORE_BLOCK_ROWS = 8192  # rows densified at a time while writing the design matrix
+OUT_OF_CORE_IMPUTER_SAMPLE = 200000  # rows the median/most-frequent imputers are fitted on
+
+# Bump when cleaning semantics change in a way the source hash below cannot see (e.g. library behaviour)
+CLEANED_DATA_CACHE_VERSION = 1
+
+# Parquet cache of preprocessed data is optional: without pyarrow every run re-parses and re-cleans
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Small grid for --search; every configuration early-stops on a held-out slice of its training fold
+HYPERPARAMETER_GRID = {
+    'n_estimators': [100, 200],
+    'max_depth': [3, 5],
+    'learning_rate': [0.05, 0.1]
+}
+
+EARLY_STOPPING_PARAMS = {'n_iter_no_change': 10, 'validation_fraction': 0.1, 'tol': 1e-4}
+
+DEFAULT_HYPERPARAMETERS = {'n_estimators': 100, 'learning_rate': 0.1, 'max_depth': 5}
+
+# 'gradient_boosting': exact splits on the sparse matrix; the compiled tree engine scores batches of up to
+#   COMPILED_MODEL_MAX_ROWS rows, larger ones go to sklearn
+# 'hist_gradient_boosting': features binned to 255 levels, multithreaded, needs dense input; predictions
+#   always use the compiled tree engine (score_feature_matrix), whatever the batch size
+MODEL_BACKENDS = ['gradient_boosting', 'hist_gradient_boosting']
+DENSE_INPUT_BACKENDS = {'hist_gradient_boosting'}
+
+def build_classifier(backend, hyperparameters):
+    """Unfitted classifier for a backend from GradientBoosting-style hyperparameters"""
+    if backend == 'gradient_boosting':
+        return GradientBoostingClassifier(random_state=42, **hyperparameters)
+    if backend == 'hist_gradient_boosting':
+        params = dict(hyperparameters)
+        params['max_iter'] = params.pop('n_estimators', 100)
+        # Early stopping only when requested, as with GradientBoosting ('auto' would switch it on above 10k rows)
+        params['early_stopping'] = 'n_iter_no_change' in params
+        return HistGradientBoostingClassifier(random_state=42, **params)
+    raise ValueError(f"Unknown model backend '{backend}' (expected one of {MODEL_BACKENDS})")
+
+def boosting_stages_used(model):
+    """Boosting iterations actually fitted (fewer than requested when early stopping kicked in)"""
+    return int(model.n_estimators_ if hasattr(model, 'n_estimators_') else model.n_iter_)
+
+def evaluate_configuration(backend, params, X, y, train_index, validation_index):
+    """Fit one grid configuration on one CV fold (runs in a worker process)"""
+    start = time.perf_counter()
+    model = build_classifier(backend, dict(params, **EARLY_STOPPING_PARAMS))
+    model.fit(X[train_index], y[train_index])
+    accuracy = accuracy_score(y[validation_index], model.predict(X[validation_index]))
+    return {
+        'accuracy': float(accuracy),
+        'stages_used': boosting_stages_used(model),
+        'seconds': time.perf_counter() - start
+    }
+
+class StreamingFClassif:
+    """f_classif (one-way ANOVA F per feature) from per-class sums accumulated chunk by chunk
+    
+    F does not change when a feature is shifted or scaled, so chunks can be fed
+    before the scaler is fitted and still give the scores of the scaled matrix.
+    """
+    
+    def __init__(self, n_features):
+        self.n_features = n_features
+        self.class_counts = {}
+        self.class_sums = {}
+        self.squared_sum = np.zeros(n_features)
+    
+    def update(self, X, y):
+        X = csr_matrix(X, dtype=np.float64)
+        self.squared_sum += np.asarray(X.multiply(X).sum(axis=0)).ravel()
+        for label in np.unique(y):
+            rows = X[y == label]
+            self.class_counts[label] = self.class_counts.get(label, 0) + rows.shape[0]
+            self.class_sums[label] = self.class_sums.get(label, 0) + np.asarray(rows.sum(axis=0)).ravel()
+    
+    def scores(self):
+        """F statistics and p-values, computed as sklearn.feature_selection.f_classif does"""
+        labels = list(self.class_counts)
+        counts = np.array([self.class_counts[label] for label in labels], dtype=np.float64)
+        sums = np.array([self.class_sums[label] for label in labels])
+        n_samples, n_classes = counts.sum(), len(labels)
+        
+        total_sum = sums.sum(axis=0)
+        total_ss = self.squared_sum - total_sum ** 2 / n_samples
+        between_ss = (sums ** 2 / counts[:, None]).sum(axis=0) - total_sum ** 2 / n_samples
+        within_ss = total_ss - between_ss
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f = (between_ss / (n_classes - 1)) / (within_ss / (n_samples - n_classes))
+        return f, special.fdtrc(n_classes - 1, n_samples - n_classes, f)
+    
+    def selector(self, k):
+        """SelectKBest fitted from the accumulated scores, without another pass over the data"""
+        selector = SelectKBest(f_classif, k=min(k, self.n_features))
+        selector.scores_, selector.pvalues_ = self.scores()
+        selector.n_features_in_ = self.n_features
+        return selector
+
 class ShapeFixedVMSTrainer:
-    def __init__(self):
+    def __init__(self, n_jobs=1, backend='gradient_boosting', timer=None):
         self.model_output_dir = 'model_training_output'
         self.model_filename = 'maintenance_prediction_model.pkl'
         self.model_path = os.path.join(self.model_output_dir, self.model_filename)
+        self.bundle_dir = os.path.join(self.model_output_dir, 'model_bundle')
+        self.cache_dir = os.path.join(self.model_output_dir, 'cleaned_data_cache')
+        self.feature_store_path = os.path.join(self.model_output_dir, FEATURE_STORE_FILENAME)
+        self.feature_store = None
+        self.categorical_encoders = {}
+        self.source_row_counts = []
+        self.search_report_path = os.path.join(self.model_output_dir, 'hyperparameter_search.json')
+        self.out_of_core_dir = os.path.join(self.model_output_dir, 'out_of_core')
+        
+        # Worker processes for cross-validation and the hyperparameter search (-1 = all cores)
+        self.n_jobs = n_jobs
+        
+        if backend not in MODEL_BACKENDS:
+            raise ValueError(f"Unknown model backend '{backend}' (expected one of {MODEL_BACKENDS})")
+        self.backend = backend
+        
+        # Stage timings (VMS_STAGE_TIMING or --timings); a disabled timer costs nothing
+        self.timer = timer or StageTimer.from_env('training')
         
         # Create output directory
         os.makedirs(self.model_output_dir, exist_ok=True)
@@ -53,54 +215,59 @@ class ShapeFixedVMSTrainer:
         
         self.text_feature = 'Description'
     
-    def load_and_clean_data(self):
-        """Load and clean real ServiceRequest data with robust error handling"""
+    @timed_stage()
+    def load_and_clean_data(self, data_paths=None, columns=TRAINING_COLUMNS):
+        """Load and clean real ServiceRequest data with robust error handling
+
+        Exports are streamed in chunks: encoding, delimiter and dtypes are detected once
+        from a byte sample and the schema, and only the requested columns are kept.
+        Rows keep their position in the export stream as index, and the rows read per
+        source are recorded in self.source_row_counts, so a later pass can re-read
+        other columns of the same rows (out-of-core training).
+        Chunking bounds parsing memory only: every cleaned chunk is kept and concatenated
+        into one frame, so peak memory still grows with the export size. Only
+        --out-of-core (train_out_of_core) keeps memory bounded for exports larger than RAM.
+        """
         try:
             logger.info("🔄 Loading and cleaning ServiceRequest data...")
             
-            # Try different data sources
-            data_sources = [
-                'ServiceRequest.csv',
-                'ServiceRequest_Sample.csv', 
-                'database_export.csv',
-                'service_requests.csv'
-            ]
-            
-            df = None
-            for source in data_sources:
-                if os.path.exists(source):
-                    logger.info(f"📁 Loading data from: {source}")
-                    try:
-                        # Try different encodings and separators
-                        encodings = ['utf-8', 'latin-1', 'cp1252']
-                        separators = [',', ';', '\t']
-                        
-                        for encoding in encodings:
-                            for sep in separators:
-                                try:
-                                    df = pd.read_csv(source, encoding=encoding, sep=sep)
-                                    if len(df.columns) > 5:  # Reasonable number of columns
-                                        logger.info(f"✅ Successfully loaded with encoding={encoding}, sep='{sep}'")
-                                        logger.info(f"Loaded {len(df)} records with {len(df.columns)} columns")
-                                        break
-                                except:
-                                    continue
-                            if df is not None:
-                                break
-                        
-                        if df is not None:
-                            break
-                            
-                    except Exception as e:
-                        logger.warning(f"Failed to load {source}: {e}")
-                        continue
+            sources = self.resolve_data_sources(data_paths)
             
-            if df is None:
-                logger.warning("❌ No CSV data found, generating synthetic data for testing...")
+            frames = []
+            coerced_counts = {}
+            self.source_row_counts = []
+            for source in sources:
+                logger.info(f"📁 Loading data from: {source}")
+                n_rows = 0
+                try:
+                    for chunk in iter_service_request_chunks(source, columns=columns):
+                        frames.append(self.clean_chunk(chunk, coerced_counts))
+                        n_rows += len(chunk)
+                    logger.info(f"✅ Loaded {n_rows} records from {source}")
+                except Exception as e:
+                    logger.warning(f"Failed to load {source}: {e}")
+                    continue
+                finally:
+                    if n_rows:
+                        self.source_row_counts.append((source, n_rows))
+            
+            df = pd.concat(frames, ignore_index=True) if frames else None
+            
+            if df is None or df.empty:
+                logger.warning("❌ No ServiceRequest data found, generating synthetic data for testing...")
                 df = self.generate_synthetic_data()
             else:
+                if 'ID' in df.columns:
+                    # Per-vehicle exports and samples can overlap
+                    df = df.drop_duplicates(subset='ID')
+                if 'Vehicle' in df.columns:
+                    df['Vehicle'] = df['Vehicle'].astype('category')
+                for column, count in coerced_counts.items():
+                    if count:
+                        logger.info(f"Found {count} non-numeric {column} values while loading")
                 logger.info(f"Data columns: {list(df.columns)}")
                 logger.info(f"Data shape: {df.shape}")
+                logger.info(f"Data memory: {df.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB")
             
             return df
             
@@ -108,20 +275,119 @@ class ShapeFixedVMSTrainer:
             logger.error(f"Data loading error: {e}")
             raise
     
+    def resolve_data_sources(self, data_paths=None):
+        """Export files to train on: explicit paths, else the first legacy CSV, else data/ exports"""
+        if data_paths:
+            return list(data_paths)
+        
+        # Legacy CSV names in the working directory take precedence (first found)
+        legacy_sources = [
+            'ServiceRequest.csv',
+            'ServiceRequest_Sample.csv', 
+            'database_export.csv',
+            'service_requests.csv'
+        ]
+        sources = [source for source in legacy_sources if os.path.exists(source)][:1]
+        return sources or find_service_request_exports()
+    
+    def cleaned_data_cache_key(self, sources):
+        """Hash of the source file contents and the loading/cleaning code"""
+        digest = hashlib.sha256(f"v{CLEANED_DATA_CACHE_VERSION}".encode())
+        
+        # Any edit to the cleaning code invalidates the cache without a manual version bump
+        cleaning_steps = [
+            self.load_and_clean_data, self.clean_chunk, self.preprocess_data_robust, self.repair_odometer,
+            self.clean_numeric_column, self.clean_description, self.create_maintenance_categories, self.create_time_features,
+            self.create_enhanced_features, self.safe_encode_categorical, self.remove_outliers_and_invalid
+        ]
+        for step in cleaning_steps:
+            digest.update(inspect.getsource(step).encode())
+        for helper in [iter_service_request_chunks, VehicleFeatureStore, StableCategoricalEncoder, MAINTENANCE_TAGGER,
+                       validate_odometer_history]:
+            digest.update(inspect.getsource(sys.modules[helper.__module__]).encode())
+        digest.update(repr((TRAINING_COLUMNS, MAINTENANCE_KEYWORD_RULES)).encode())
+        
+        for source in sources:
+            digest.update(os.path.basename(source).encode())
+            with open(source, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+        
+        return digest.hexdigest()[:16]
+    
+    def load_processed_data(self, data_paths=None, use_cache=True):
+        """Preprocessed training data, from the Parquet cache when the sources and code are unchanged"""
+        sources = [source for source in self.resolve_data_sources(data_paths) if os.path.exists(source)]
+        
+        if not (use_cache and sources and PARQUET_AVAILABLE):
+            if use_cache and sources:
+                logger.info("pyarrow not installed, cleaned data cache disabled")
+            return self.preprocess_data_robust(self.load_and_clean_data(data_paths), copy=False)
+        
+        cache_path = os.path.join(self.cache_dir, f"cleaned_{self.cleaned_data_cache_key(sources)}.parquet")
+        store_cache_path = cache_path.replace('.parquet', f"_{FEATURE_STORE_FILENAME}")
+        encoders_cache_path = cache_path.replace('.parquet', '_encoders.json')
+        columns = self.numerical_features + self.categorical_features + [self.text_feature, 'maintenance_category']
+        
+        if os.path.exists(cache_path):
+            try:
+                df_processed = pd.read_parquet(cache_path, columns=columns)
+                if os.path.exists(store_cache_path):
+                    self.feature_store = VehicleFeatureStore.load(store_cache_path)
+                with open(encoders_cache_path, 'r') as f:
+                    self.categorical_encoders = {name: StableCategoricalEncoder.from_dict(state)
+                                                 for name, state in json.load(f).items()}
+                logger.info(f"⚡ Loaded cleaned data from cache: {cache_path} {df_processed.shape}")
+                return df_processed
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cleaned data cache {cache_path}: {e}")
+        
+        df_processed = self.preprocess_data_robust(self.load_and_clean_data(data_paths), copy=False)
+        
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            staging_path = f"{cache_path}.tmp"
+            with open(encoders_cache_path, 'w') as f:
+                json.dump({name: encoder.to_dict() for name, encoder in self.categorical_encoders.items()}, f)
+            df_processed.to_parquet(staging_path)
+            os.replace(staging_path, cache_path)
+            if self.feature_store is not None:
+                self.feature_store.save(store_cache_path)
+            logger.info(f"💾 Cleaned data cached to: {cache_path}")
+        except Exception as e:
+            logger.warning(f"Could not write cleaned data cache: {e}")
+        
+        return df_processed
+    
+    def clean_chunk(self, chunk, coerced_counts):
+        """Shrink one streamed chunk to compact dtypes before it is accumulated"""
+        for column in NUMERIC_TRAINING_COLUMNS:
+            if column in chunk.columns and not pd.api.types.is_numeric_dtype(chunk[column]):
+                present = chunk[column].notna()
+                numeric = pd.to_numeric(chunk[column], errors='coerce')
+                coerced_counts[column] = coerced_counts.get(column, 0) + int((present & numeric.isna()).sum())
+                chunk[column] = numeric
+        
+        if 'Vehicle' in chunk.columns:
+            chunk['Vehicle'] = chunk['Vehicle'].str.strip()
+        
+        return chunk
+    
+    @timed_stage()
     def clean_numeric_column(self, series, column_name, default_value=0):
         """Clean numeric columns by removing non-numeric values"""
         try:
             logger.info(f"🧹 Cleaning column: {column_name}")
             
-            # Convert to string first to handle mixed types
-            series_str = series.astype(str)
-            
-            # Find non-numeric values for logging
-            non_numeric_mask = ~series_str.str.match(r'^-?\d*\.?\d*$')
-            non_numeric_values = series_str[non_numeric_mask].unique()
-            
-            if len(non_numeric_values) > 0:
-                logger.info(f"Found {len(non_numeric_values)} non-numeric values in {column_name}: {non_numeric_values[:10]}")
+            # Find non-numeric values for logging (streamed columns are already numeric; skip the string copy)
+            if not pd.api.types.is_numeric_dtype(series):
+                # Convert to string first to handle mixed types
+                series_str = series.astype(str)
+                non_numeric_mask = ~series_str.str.match(r'^-?\d*\.?\d*$')
+                non_numeric_values = series_str[non_numeric_mask].unique()
+                
+                if len(non_numeric_values) > 0:
+                    logger.info(f"Found {len(non_numeric_values)} non-numeric values in {column_name}: {non_numeric_values[:10]}")
             
             # Convert to numeric, replacing non-numeric with NaN
             numeric_series = pd.to_numeric(series, errors='coerce')
@@ -149,20 +415,52 @@ class ShapeFixedVMSTrainer:
             logger.error(f"Error cleaning {column_name}: {e}")
             return pd.Series([default_value] * len(series))
     
-    def preprocess_data_robust(self, df):
-        """Robust data preprocessing that handles all data quality issues"""
+    @timed_stage()
+    def repair_odometer(self, df):
+        """Replace anomalous odometer readings with the vehicle's last good reading before them
+        
+        validate_odometer_history checks every vehicle's Odometer series in one pass
+        (sentinels, the 10M-20M error band, backward steps and implausible km/day).
+        It runs point in time (look_ahead=False): each reading is judged and repaired
+        from earlier readings only, so no row sees later mileage. That is the rule
+        predict.py applies to a submitted reading with the history store's last good
+        reading. Flagged readings with no earlier good reading become missing and take
+        clean_numeric_column's default (UNKNOWN_ODOMETER), as they do at serving.
+        """
+        if 'Vehicle' not in df.columns or 'Datereceived' not in df.columns:
+            return df
+        
+        validation = validate_odometer_history(df, look_ahead=False)
+        flagged = validation['odometer_flag']
+        df['Odometer'] = pd.to_numeric(df['Odometer'], errors='coerce').where(~flagged, validation['odometer_estimate'])
+        
+        anomalies = validation.loc[flagged, 'odometer_anomaly'].value_counts()
+        logger.info(f"🛠️ Odometer anomalies: {int(flagged.sum())} of {len(df)} readings, "
+                    f"{int((flagged & validation['odometer_estimate'].notna()).sum())} replaced by the last good reading")
+        logger.info(f"Anomaly reasons: {anomalies[anomalies > 0].to_dict()}")
+        return df
+    
+    @timed_stage()
+    def preprocess_data_robust(self, df, include_text=True, copy=True):
+        """Robust data preprocessing that handles all data quality issues
+        
+        include_text=False skips the Description cleaning and the text-derived target,
+        for out-of-core training, which streams the text columns separately.
+        copy=False cleans df in place, for callers that discard the raw frame anyway.
+        """
         try:
             logger.info("🔄 Starting robust data preprocessing...")
             logger.info(f"Initial data shape: {df.shape}")
             
             # Make a copy to avoid modifying original
-            df_clean = df.copy()
+            df_clean = df.copy() if copy else df
             
             # Clean critical numeric columns first
             logger.info("🧹 Cleaning numeric columns...")
             
             if 'Odometer' in df_clean.columns:
-                df_clean['Odometer'] = self.clean_numeric_column(df_clean['Odometer'], 'Odometer', 150000)
+                df_clean = self.repair_odometer(df_clean)
+                df_clean['Odometer'] = self.clean_numeric_column(df_clean['Odometer'], 'Odometer', UNKNOWN_ODOMETER)
             else:
                 df_clean['Odometer'] = 150000
                 logger.info("Added default Odometer column")
@@ -195,10 +493,8 @@ class ShapeFixedVMSTrainer:
                 df_clean['Vehicle'] = 'UNKNOWN'
             
             # Clean Description
-            if 'Description' in df_clean.columns:
-                df_clean['Description'] = df_clean['Description'].astype(str).fillna('Vehicle maintenance service')
-            else:
-                df_clean['Description'] = 'Vehicle maintenance service'
+            if include_text:
+                df_clean = self.clean_description(df_clean)
             
             # Clean Building
             if 'Building' in df_clean.columns:
@@ -206,6 +502,16 @@ class ShapeFixedVMSTrainer:
             else:
                 df_clean['Building'] = 1701404
             
+            # History features from the vehicle's earlier requests (point in time, no later history)
+            missing_history = [col for col in HISTORY_FEATURES if col not in df_clean.columns]
+            if missing_history and 'Datereceived' in df_clean.columns:
+                logger.info("🚚 Computing per-vehicle history features...")
+                history_features = point_in_time_history_features(df_clean)
+                for col in missing_history:
+                    df_clean[col] = history_features[col]
+                self.feature_store = VehicleFeatureStore.from_history(df_clean)
+                logger.info(f"Built feature store for {len(self.feature_store)} vehicles")
+            
             # Add missing required columns
             required_columns = ['service_count', 'average_interval', 'days_since_last']
             for col in required_columns:
@@ -220,8 +526,9 @@ class ShapeFixedVMSTrainer:
                     logger.info(f"Added missing column {col} with estimated values")
             
             # Create target variable (maintenance categories)
-            logger.info("🎯 Creating maintenance categories...")
-            df_clean['maintenance_category'] = self.create_maintenance_categories(df_clean)
+            if include_text:
+                logger.info("🎯 Creating maintenance categories...")
+                df_clean['maintenance_category'] = self.create_maintenance_categories(df_clean)
             
             # Create encoded features
             logger.info("🔢 Creating encoded features...")
@@ -230,8 +537,8 @@ class ShapeFixedVMSTrainer:
             df_clean['Priority_encoded'] = df_clean['Priority'].astype(int)
             
             # Encode categorical string fields safely
-            df_clean['Vehicle_encoded'] = self.safe_encode_categorical(df_clean['Vehicle'])
-            df_clean['Building_encoded'] = self.safe_encode_categorical(df_clean['Building'])
+            df_clean['Vehicle_encoded'] = self.safe_encode_categorical(df_clean['Vehicle'], 'Vehicle')
+            df_clean['Building_encoded'] = self.safe_encode_categorical(df_clean['Building'], 'Building')
             
             # Create time-based features
             df_clean = self.create_time_features(df_clean)
@@ -245,7 +552,8 @@ class ShapeFixedVMSTrainer:
             # Final validation
             logger.info("✅ Data preprocessing completed!")
             logger.info(f"Final data shape: {df_clean.shape}")
-            logger.info(f"Target distribution:\n{df_clean['maintenance_category'].value_counts()}")
+            if include_text:
+                logger.info(f"Target distribution:\n{df_clean['maintenance_category'].value_counts()}")
             
             return df_clean
             
@@ -253,46 +561,47 @@ class ShapeFixedVMSTrainer:
             logger.error(f"Preprocessing error: {e}")
             raise
     
+    def clean_description(self, df):
+        """Description as text, with a default when the export has no Description column"""
+        if 'Description' in df.columns:
+            df['Description'] = df['Description'].astype(str).fillna('Vehicle maintenance service')
+        else:
+            df['Description'] = 'Vehicle maintenance service'
+        return df
+    
+    @timed_stage()
     def create_maintenance_categories(self, df):
-        """Create realistic maintenance categories from actual data"""
-        categories = []
-        
-        for index, row in df.iterrows():
-            description = str(row.get('Description', '')).lower()
-            response = str(row.get('Response', '')).lower()
-            mr_type = str(row.get('MrType', '3'))
-            odometer = float(row.get('Odometer', 150000))
-            
-            # Combine description and response
-            full_text = f"{description} {response}"
-            
-            # Categorize based on patterns
-            if mr_type == '2':  # Cleaning
-                categories.append('cleaning_service')
-            elif any(word in full_text for word in ['brake', 'brek', 'rem', 'brake pad', 'brake fluid']):
-                categories.append('brake_system') 
-            elif any(word in full_text for word in ['tire', 'tayar', 'tyre', 'wheel']):
-                categories.append('tire_service')
-            elif any(word in full_text for word in ['engine', 'enjin', 'motor', 'piston']):
-                categories.append('engine_repair')
-            elif any(word in full_text for word in ['oil', 'minyak', 'pelincir', 'lubricant']):
-                categories.append('routine_maintenance')
-            elif any(word in full_text for word in ['electrical', 'elektrik', 'wiring', 'battery']):
-                categories.append('electrical_system')
-            elif any(word in full_text for word in ['body', 'badan', 'panel', 'paint']):
-                categories.append('body_work')
-            elif any(word in full_text for word in ['air', 'udara', 'pneumatic', 'compressor']):
-                categories.append('air_system')
-            elif any(word in full_text for word in ['hydraulic', 'hidraulik', 'pump']):
-                categories.append('hydraulic_system')
-            elif odometer > 800000:  # High mileage vehicles likely need major service
-                categories.append('engine_repair')
-            elif mr_type == '1':  # Repair
-                categories.append('mechanical_repair')
-            else:
-                categories.append('routine_maintenance')
+        """Create realistic maintenance categories from actual data
+        
+        Vectorized: MAINTENANCE_TAGGER tags every row's combined Description/Response
+        text with all keyword categories in one scan (bitsets), and np.select applies
+        the precedence order.
+        """
+        def text_column(name):
+            if name in df.columns:
+                return df[name].astype(str)
+            return pd.Series('', index=df.index)
         
-        return categories
+        # Combine description and response (the tagger lowercases)
+        full_text = text_column('Description') + ' ' + text_column('Response')
+        mr_type = df['MrType'].astype(str) if 'MrType' in df.columns else pd.Series('3', index=df.index)
+        odometer = pd.to_numeric(df['Odometer'], errors='coerce') if 'Odometer' in df.columns else pd.Series(150000.0, index=df.index)
+        tag_bits = MAINTENANCE_TAGGER.tag_texts(full_text)
+        
+        # Categorize based on patterns (first matching condition wins)
+        conditions = [(mr_type == '2').to_numpy()]  # Cleaning
+        choices = ['cleaning_service']
+        for category, _ in MAINTENANCE_KEYWORD_RULES:
+            conditions.append(MAINTENANCE_TAGGER.has_any(tag_bits, category))
+            choices.append(category)
+        
+        conditions.append((odometer > 800000).to_numpy())  # High mileage vehicles likely need major service
+        choices.append('engine_repair')
+        conditions.append((mr_type == '1').to_numpy())  # Repair
+        choices.append('mechanical_repair')
+        
+        categories = np.select(conditions, choices, default='routine_maintenance')
+        return pd.Series(categories, index=df.index)
     
     def create_time_features(self, df):
         """Create time-based features with fallbacks"""
@@ -344,31 +653,39 @@ class ShapeFixedVMSTrainer:
         
         # Service frequency category
         df['service_rate'] = df['service_count'] / (df['Odometer'] / 10000 + 1)
+        # include_lowest: a vehicle's first request has service_count 0 (category 0, as in predict.py)
         df['service_frequency_category'] = pd.cut(df['service_rate'],
                                                 bins=[0, 2, 5, float('inf')],
-                                                labels=[0, 1, 2]).astype(int)
+                                                labels=[0, 1, 2], include_lowest=True).astype(int)
         
         return df
     
-    def safe_encode_categorical(self, series):
-        """Safely encode categorical variables"""
+    def safe_encode_categorical(self, series, name):
+        """Encode a categorical column with a stable vocabulary that is saved with the model"""
         try:
-            return pd.Series(series).astype(str).apply(lambda x: abs(hash(x)) % 10000)
-        except:
-            return pd.Series([1] * len(series))
+            encoder = StableCategoricalEncoder.fit(series)
+            self.categorical_encoders[name] = encoder
+            logger.info(f"Encoded {name}: {len(encoder)} known values, rare/unseen -> 0")
+            return encoder.transform(series)
+        except Exception as e:
+            logger.warning(f"Could not encode {name}, using a constant code: {e}")
+            return pd.Series([1] * len(series), index=pd.Series(series).index)
     
     def remove_outliers_and_invalid(self, df):
         """Remove outliers and invalid records"""
         initial_len = len(df)
         
         # Remove records with obviously invalid odometer
-        df = df[(df['Odometer'] >= 1000) & (df['Odometer'] <= 3000000)]
+        keep = (df['Odometer'] >= 1000) & (df['Odometer'] <= 3000000)
         
         # Remove records with invalid vehicle identifiers
-        df = df[df['Vehicle'] != 'UNKNOWN']
+        keep &= df['Vehicle'] != 'UNKNOWN'
+        
+        # Keep records with reasonable service counts (percentile of the rows kept so far)
+        keep &= df['service_count'] <= df.loc[keep, 'service_count'].quantile(0.99)
         
-        # Keep records with reasonable service counts
-        df = df[df['service_count'] <= df['service_count'].quantile(0.99)]
+        # One filtered copy instead of one per rule
+        df = df[keep]
         
         logger.info(f"Removed {initial_len - len(df)} invalid/outlier records")
         return df
@@ -402,6 +719,7 @@ class ShapeFixedVMSTrainer:
         logger.info("✅ Synthetic data generated")
         return df
     
+    @timed_stage()
     def prepare_features(self, df):
         """Prepare feature matrices for training with proper shape handling"""
         try:
@@ -447,7 +765,333 @@ class ShapeFixedVMSTrainer:
         else:
             raise ValueError(f"{name} has unexpected dimensionality: {array.ndim}D with shape {array.shape}")
     
-    def train_model_with_shape_fix(self, X_numerical, X_categorical, X_text, y):
+    def export_compiled_trees(self, model):
+        """Flatten every boosting tree (either backend) into contiguous node arrays for python/predict.py
+        
+        Each tree is padded to a complete binary tree of the ensemble's max depth, so
+        node i's children are 2i+1 and 2i+2 and no child pointers need storing.
+        Padding nodes below a shallow leaf always go left (threshold +inf) and every
+        bottom slot under that leaf carries its value. missing_left records where each
+        split sends NaN (HistGradientBoosting learns it per node; GradientBoosting
+        rejects NaN input, so its nodes keep the left default).
+        """
+        if isinstance(model, GradientBoostingClassifier):
+            # Stage-major: tree t scores class t % n_tree_classes; leaf values still need shrinking
+            trees = [(tree.children_left, tree.children_right, tree.feature, tree.threshold,
+                      tree.value[:, 0, 0] * model.learning_rate, tree.max_depth,
+                      np.ones(tree.node_count, dtype=np.uint8))
+                     for tree in (estimator.tree_ for estimator in model.estimators_.ravel())]
+            n_tree_classes = model.estimators_.shape[1]
+            # Constant prior from the init estimator (raw scores before the first stage)
+            init_raw = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0]
+            # sklearn trees compare float32 features against their thresholds
+            float32_inputs = True
+        elif isinstance(model, HistGradientBoostingClassifier):
+            # Same stage-major order; leaf values are already shrunk and thresholds are real-valued
+            trees = []
+            for iteration in model._predictors:
+                for predictor in iteration:
+                    nodes = predictor.nodes
+                    if nodes['is_categorical'].any():
+                        logger.info("Skipping compiled tree export: categorical splits are not supported")
+                        return None
+                    leaf = nodes['is_leaf'].astype(bool)
+                    trees.append((np.where(leaf, -1, nodes['left']), np.where(leaf, -1, nodes['right']),
+                                  nodes['feature_idx'], nodes['num_threshold'], nodes['value'],
+                                  int(nodes['depth'].max()), nodes['missing_go_to_left']))
+            n_tree_classes = len(model._predictors[0])
+            init_raw = np.ravel(model._baseline_prediction)
+            # Its predictors compare float64 features against the bin thresholds
+            float32_inputs = False
+        else:
+            logger.info(f"Skipping compiled tree export for {type(model).__name__}")
+            return None
+        
+        max_depth = max(tree[5] for tree in trees)
+        n_internal = 2 ** max_depth - 1
+        n_leaves = 2 ** max_depth
+        
+        feature = np.zeros((len(trees), n_internal), dtype=np.int32)
+        threshold = np.full((len(trees), n_internal), np.inf)
+        missing_left = np.ones((len(trees), n_internal), dtype=np.uint8)
+        value = np.zeros((len(trees), n_leaves))
+        
+        for t, (children_left, children_right, tree_feature, tree_threshold, leaf_value, _,
+                tree_missing_left) in enumerate(trees):
+            stack = [(0, 0, 0)]  # (source node, complete-tree position, depth)
+            while stack:
+                node, position, depth = stack.pop()
+                if children_left[node] == -1:
+                    span = 2 ** (max_depth - depth)
+                    first = (position - (2 ** depth - 1)) * span
+                    value[t, first:first + span] = leaf_value[node]
+                    continue
+                feature[t, position] = tree_feature[node]
+                threshold[t, position] = tree_threshold[node]
+                missing_left[t, position] = tree_missing_left[node]
+                stack.append((children_left[node], 2 * position + 1, depth + 1))
+                stack.append((children_right[node], 2 * position + 2, depth + 1))
+        
+        compiled = {
+            'feature': feature,
+            'threshold': threshold,
+            'missing_left': missing_left,
+            'value': value,
+            'init_raw': np.asarray(init_raw, dtype=np.float64),
+            'float32_inputs': float32_inputs,
+            'n_tree_classes': n_tree_classes,
+            'n_classes': len(model.classes_),
+            'max_depth': max_depth,
+            'n_features': model.n_features_in_
+        }
+        
+        logger.info(f"Compiled {len(trees)} trees to depth {max_depth} ({feature.size} internal slots)")
+        return compiled
+    
+    def save_model_bundle(self, model_objects, bundle_root=None, keep_versions=BUNDLE_VERSIONS_KEPT):
+        """Write model objects as a versioned, memory-mappable bundle (read by python/model_bundle.py)
+        
+        Numeric parts go to one .npy file each and everything else to manifest.json.
+        The version directory is completed before CURRENT is switched to it, so
+        readers never see a half-written bundle. Afterwards only the newest
+        keep_versions version directories are kept.
+        """
+        bundle_root = bundle_root or self.bundle_dir
+        compiled = model_objects.get('compiled_trees') or self.export_compiled_trees(model_objects['final_model'])
+        if compiled is None:
+            logger.warning("Model bundle needs compiled trees; bundle not written")
+            return None
+        
+        tfidf = model_objects['tfidf']
+        if not isinstance(tfidf, TfidfVectorizer):
+            raise ValueError(f"Model bundles store a fitted TfidfVectorizer, not {type(tfidf).__name__}")
+        if tfidf.tokenizer is not None or tfidf.preprocessor is not None:
+            raise ValueError("Custom TF-IDF tokenizer/preprocessor cannot be stored in a bundle")
+        
+        scaler = model_objects['numerical_scaler']
+        n_numerical = len(scaler.scale_ if scaler.scale_ is not None else scaler.mean_)
+        arrays = {
+            'tree_feature': compiled['feature'],
+            'tree_threshold': compiled['threshold'],
+            'tree_missing_left': compiled['missing_left'],
+            'tree_value': compiled['value'],
+            'tree_init_raw': compiled['init_raw'],
+            'numerical_imputer_statistics': model_objects['numerical_imputer'].statistics_.astype(np.float64),
+            'numerical_scaler_mean': scaler.mean_ if scaler.mean_ is not None else np.zeros(n_numerical),
+            'numerical_scaler_scale': scaler.scale_ if scaler.scale_ is not None else np.ones(n_numerical),
+            'categorical_imputer_statistics': model_objects['categorical_imputer'].statistics_.astype(np.float64),
+            'tfidf_idf': tfidf.idf_,
+            'feature_selector_mask': model_objects['feature_selector'].get_support()
+        }
+        
+        model_version = datetime.now().strftime('%Y%m%d%H%M%S')
+        version_dir = os.path.join(bundle_root, f"v{model_version}")
+        suffix = 1
+        while os.path.exists(version_dir):
+            version_dir = os.path.join(bundle_root, f"v{model_version}_{suffix}")
+            suffix += 1
+        
+        staging_dir = f"{version_dir}.tmp"
+        os.makedirs(staging_dir)
+        
+        manifest_arrays = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            np.save(os.path.join(staging_dir, f"{name}.npy"), array, allow_pickle=False)
+            manifest_arrays[name] = {'file': f"{name}.npy", 'dtype': str(array.dtype), 'shape': list(array.shape)}
+        
+        tfidf_params = {
+            'analyzer': tfidf.analyzer,
+            'lowercase': tfidf.lowercase,
+            'strip_accents': tfidf.strip_accents,
+            'stop_words': tfidf.stop_words if isinstance(tfidf.stop_words, (str, type(None))) else sorted(tfidf.stop_words),
+            'token_pattern': tfidf.token_pattern,
+            'ngram_range': list(tfidf.ngram_range),
+            'norm': tfidf.norm,
+            'use_idf': tfidf.use_idf,
+            'sublinear_tf': tfidf.sublinear_tf,
+            'binary': tfidf.binary
+        }
+        
+        manifest = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'model_version': os.path.basename(version_dir)[1:],
+            'created': datetime.now().isoformat(),
+            'classes': [str(name) for name in model_objects['label_encoder'].classes_],
+            'numerical_features': list(model_objects['numerical_features']),
+            'categorical_features': list(model_objects['categorical_features']),
+            'text_feature': model_objects['text_feature'],
+            'categorical_encoders': model_objects.get('categorical_encoders', {}),
+            'trees': dict({key: int(compiled[key]) for key in ['n_tree_classes', 'n_classes', 'max_depth', 'n_features']},
+                          float32_inputs=bool(compiled['float32_inputs'])),
+            'tfidf': {
+                'params': tfidf_params,
+                'vocabulary': {term: int(index) for term, index in tfidf.vocabulary_.items()}
+            },
+            'arrays': manifest_arrays,
+            'model_info': {key: value.item() if hasattr(value, 'item') else value
+                           for key, value in model_objects.get('model_info', {}).items()}
+        }
+        
+        with open(os.path.join(staging_dir, MANIFEST_FILENAME), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        
+        os.rename(staging_dir, version_dir)
+        
+        # Switch CURRENT atomically so readers see either the old or the new version
+        current_staging = os.path.join(bundle_root, f"{CURRENT_FILENAME}.tmp")
+        with open(current_staging, 'w') as f:
+            f.write(os.path.basename(version_dir))
+        os.replace(current_staging, os.path.join(bundle_root, CURRENT_FILENAME))
+        
+        logger.info(f"✅ Model bundle {manifest['model_version']} saved to: {version_dir}")
+        self.prune_model_bundles(bundle_root, os.path.basename(version_dir), keep_versions)
+        return version_dir
+    
+    def prune_model_bundles(self, bundle_root, current_version, keep_versions=BUNDLE_VERSIONS_KEPT):
+        """Remove all but the newest keep_versions bundle versions (never the one CURRENT points at)
+        
+        Versions are ordered by when their manifest was written (a name can be reused once
+        pruned, so names alone do not sort by age). A server still on a removed version
+        keeps working: its memory-mapped files stay readable until closed.
+        """
+        manifests = {name: os.path.join(bundle_root, name, MANIFEST_FILENAME) for name in os.listdir(bundle_root)
+                     if name.startswith('v') and not name.endswith('.tmp')}
+        versions = sorted((name for name, path in manifests.items() if os.path.isfile(path)),
+                          key=lambda name: os.stat(manifests[name]).st_mtime_ns)
+        for name in versions[:max(0, len(versions) - max(1, keep_versions))]:
+            if name != current_version:
+                shutil.rmtree(os.path.join(bundle_root, name), ignore_errors=True)
+                logger.info(f"Removed old model bundle {name}")
+    
+    def export_bundle_from_pickle(self, model_path):
+        """Convert an existing pickled model into a model bundle"""
+        with open(model_path, 'rb') as f:
+            model_objects = pickle.load(f)
+        return self.save_model_bundle(model_objects)
+    
+    @timed_stage()
+    def fit_feature_pipeline(self, X_numerical, X_categorical, X_text, y_encoded):
+        """Fit imputers, scaler, TF-IDF and selector; the matrix stays CSR from TF-IDF to the model"""
+        # Prepare preprocessing pipelines
+        numerical_imputer = SimpleImputer(strategy='median')
+        numerical_scaler = StandardScaler()
+        categorical_imputer = SimpleImputer(strategy='most_frequent')
+        
+        # Process numerical features
+        logger.info("Processing numerical features...")
+        X_num_imputed = numerical_imputer.fit_transform(X_numerical)
+        X_num_processed = numerical_scaler.fit_transform(X_num_imputed)
+        logger.info(f"Numerical processed shape: {X_num_processed.shape}")
+        
+        # Process categorical features  
+        logger.info("Processing categorical features...")
+        X_cat_processed = categorical_imputer.fit_transform(X_categorical)
+        logger.info(f"Categorical processed shape: {X_cat_processed.shape}")
+        
+        # Process text features (kept sparse: densifying 500 TF-IDF columns costs ~4 KB per row)
+        logger.info("Processing text features...")
+        tfidf = TfidfVectorizer(max_features=500, stop_words='english', lowercase=True)
+        with self.timer.stage('tfidf'):
+            X_text_processed = tfidf.fit_transform(X_text)
+        logger.info(f"Text processed shape: {X_text_processed.shape} ({X_text_processed.nnz} non-zeros)")
+        
+        # Ensure all arrays are 2D
+        X_num_processed = self.ensure_2d_array(X_num_processed, "numerical features")
+        X_cat_processed = self.ensure_2d_array(X_cat_processed, "categorical features")
+        
+        # Combine all features as one CSR matrix
+        logger.info("Combining feature matrices...")
+        feature_matrices = [csr_matrix(X_num_processed), csr_matrix(X_cat_processed), X_text_processed]
+        
+        # Log shapes before combination
+        for i, matrix in enumerate(feature_matrices):
+            logger.info(f"Matrix {i} shape: {matrix.shape}")
+        
+        X_combined = hstack(feature_matrices, format='csr')
+        logger.info(f"Combined features shape: {X_combined.shape} ({X_combined.nnz} non-zeros)")
+        
+        # Feature selection
+        logger.info("Applying feature selection...")
+        feature_selector = SelectKBest(f_classif, k=min(300, X_combined.shape[1]))
+        with self.timer.stage('select_k_best'):
+            X_selected = feature_selector.fit_transform(X_combined, y_encoded)
+        
+        logger.info(f"Final feature matrix shape: {X_selected.shape}")
+        
+        fitted = {
+            'numerical_imputer': numerical_imputer,
+            'numerical_scaler': numerical_scaler,
+            'categorical_imputer': categorical_imputer,
+            'tfidf': tfidf,
+            'feature_selector': feature_selector
+        }
+        return X_selected, fitted
+    
+    @timed_stage()
+    def search_hyperparameters(self, X_train, y_train, grid=None, cv=3):
+        """Cross-validate every grid configuration, with all (configuration, fold) fits in a process pool
+        
+        The feature matrix is handed to joblib once; its arrays are memory-mapped
+        read-only into the workers instead of being pickled into every task.
+        """
+        configurations = list(ParameterGrid(grid or HYPERPARAMETER_GRID))
+        folds = list(StratifiedKFold(n_splits=cv, shuffle=True, random_state=42).split(X_train, y_train))
+        logger.info(f"🔍 Searching {len(configurations)} {self.backend} configurations x {cv} folds "
+                    f"with n_jobs={self.n_jobs}...")
+        
+        # Both backends train on float32; convert once so workers do not each make a copy
+        X_shared = self.model_input(X_train)
+        
+        start = time.perf_counter()
+        fold_results = Parallel(n_jobs=self.n_jobs, max_nbytes='1M', mmap_mode='r')(
+            delayed(evaluate_configuration)(self.backend, params, X_shared, y_train, train_index, validation_index)
+            for params in configurations
+            for train_index, validation_index in folds
+        )
+        wall_seconds = time.perf_counter() - start
+        
+        results = []
+        for i, params in enumerate(configurations):
+            folds_for_config = fold_results[i * cv:(i + 1) * cv]
+            accuracies = [fold['accuracy'] for fold in folds_for_config]
+            results.append({
+                'params': params,
+                'mean_accuracy': float(np.mean(accuracies)),
+                'std_accuracy': float(np.std(accuracies)),
+                'mean_stages_used': float(np.mean([fold['stages_used'] for fold in folds_for_config])),
+                'fit_seconds': round(sum(fold['seconds'] for fold in folds_for_config), 2),
+                'folds': folds_for_config
+            })
+        results.sort(key=lambda result: result['mean_accuracy'], reverse=True)
+        
+        for result in results:
+            logger.info(f"  {result['params']}: accuracy {result['mean_accuracy']:.4f} "
+                        f"(+/- {result['std_accuracy'] * 2:.4f}), {result['mean_stages_used']:.0f} stages, "
+                        f"{result['fit_seconds']:.1f}s")
+        logger.info(f"Search wall-clock: {wall_seconds:.1f}s (sum of fits: {sum(r['fit_seconds'] for r in results):.1f}s)")
+        
+        report = {
+            'backend': self.backend,
+            'n_jobs': self.n_jobs,
+            'cv_folds': cv,
+            'early_stopping': EARLY_STOPPING_PARAMS,
+            'wall_seconds': round(wall_seconds, 2),
+            'best_params': results[0]['params'],
+            'results': results
+        }
+        with open(self.search_report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"✅ Search report saved to: {self.search_report_path}")
+        
+        return report
+    
+    def model_input(self, X):
+        """Feature matrix in the layout the backend trains on: float32 CSR, or dense for HistGradientBoosting"""
+        X = csr_matrix(X, dtype=np.float32)
+        return X.toarray() if self.backend in DENSE_INPUT_BACKENDS else X
+    
+    def train_model_with_shape_fix(self, X_numerical, X_categorical, X_text, y, search=False):
         """Train the ML model with proper shape handling"""
         try:
             logger.info("🤖 Training ML model with shape fixes...")
@@ -456,132 +1100,284 @@ class ShapeFixedVMSTrainer:
             label_encoder = LabelEncoder()
             y_encoded = label_encoder.fit_transform(y)
             
-            # Prepare preprocessing pipelines
-            numerical_imputer = SimpleImputer(strategy='median')
-            numerical_scaler = StandardScaler()
-            categorical_imputer = SimpleImputer(strategy='most_frequent')
-            
-            # Process numerical features
-            logger.info("Processing numerical features...")
-            X_num_imputed = numerical_imputer.fit_transform(X_numerical)
-            X_num_processed = numerical_scaler.fit_transform(X_num_imputed)
-            logger.info(f"Numerical processed shape: {X_num_processed.shape}")
-            
-            # Process categorical features  
-            logger.info("Processing categorical features...")
-            X_cat_processed = categorical_imputer.fit_transform(X_categorical)
-            logger.info(f"Categorical processed shape: {X_cat_processed.shape}")
-            
-            # Ensure categorical is 2D
-            X_cat_processed = self.ensure_2d_array(X_cat_processed, "categorical features")
-            
-            # Process text features
-            logger.info("Processing text features...")
-            tfidf = TfidfVectorizer(max_features=500, stop_words='english', lowercase=True)
-            X_text_processed = tfidf.fit_transform(X_text)
-            X_text_array = X_text_processed.toarray()
-            logger.info(f"Text processed shape: {X_text_array.shape}")
-            
-            # Ensure all arrays are 2D
-            X_num_processed = self.ensure_2d_array(X_num_processed, "numerical features")
-            X_cat_processed = self.ensure_2d_array(X_cat_processed, "categorical features")
-            X_text_array = self.ensure_2d_array(X_text_array, "text features")
-            
-            # Combine all features using numpy concatenation (more reliable than scipy hstack)
-            logger.info("Combining feature matrices...")
-            feature_matrices = [X_num_processed, X_cat_processed, X_text_array]
-            
-            # Log shapes before combination
-            for i, matrix in enumerate(feature_matrices):
-                logger.info(f"Matrix {i} shape: {matrix.shape}")
-            
-            # Use numpy concatenation instead of scipy hstack
-            X_combined = np.concatenate(feature_matrices, axis=1)
-            logger.info(f"Combined features shape: {X_combined.shape}")
-            
-            # Feature selection
-            logger.info("Applying feature selection...")
-            feature_selector = SelectKBest(f_classif, k=min(300, X_combined.shape[1]))
-            X_selected = feature_selector.fit_transform(X_combined, y_encoded)
-            
-            logger.info(f"Final feature matrix shape: {X_selected.shape}")
+            X_selected, fitted = self.fit_feature_pipeline(X_numerical, X_categorical, X_text, y_encoded)
             
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(
-                X_selected, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
+                self.model_input(X_selected), y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
             )
             
-            # Train models (simplified to avoid complexity)
-            logger.info("Training model...")
-            model = GradientBoostingClassifier(
-                n_estimators=100, learning_rate=0.1, max_depth=5, random_state=42
-            )
+            if search:
+                # Parallel grid search with early stopping, then refit the best configuration
+                report = self.search_hyperparameters(X_train, y_train)
+                hyperparameters = dict(report['best_params'], **EARLY_STOPPING_PARAMS)
+                mean_score = report['results'][0]['mean_accuracy']
+                logger.info(f"Best configuration: {report['best_params']} (cv accuracy {mean_score:.4f})")
+            else:
+                hyperparameters = dict(DEFAULT_HYPERPARAMETERS)
             
-            # Cross-validation
-            cv_scores = cross_val_score(model, X_train, y_train, cv=3, scoring='accuracy')
-            mean_score = cv_scores.mean()
+            # Train models (simplified to avoid complexity)
+            logger.info(f"Training {self.backend} model...")
+            model = build_classifier(self.backend, hyperparameters)
             
-            logger.info(f"Cross-validation accuracy: {mean_score:.4f} (+/- {cv_scores.std() * 2:.4f})")
+            if not search:
+                # Cross-validation (folds run in parallel when n_jobs > 1)
+                with self.timer.stage('cross_validation'):
+                    cv_scores = cross_val_score(model, X_train, y_train, cv=3, scoring='accuracy', n_jobs=self.n_jobs)
+                mean_score = cv_scores.mean()
+                
+                logger.info(f"Cross-validation accuracy: {mean_score:.4f} (+/- {cv_scores.std() * 2:.4f})")
             
             # Train on full training set
-            model.fit(X_train, y_train)
+            with self.timer.stage('fit'):
+                model.fit(X_train, y_train)
             
             # Evaluate
-            y_pred = model.predict(X_test)
+            with self.timer.stage('evaluate'):
+                y_pred = model.predict(X_test)
             test_accuracy = accuracy_score(y_test, y_pred)
             
             logger.info(f"Test accuracy: {test_accuracy:.4f}")
             
-            # Save model
-            model_objects = {
-                'final_model': model,
-                'label_encoder': label_encoder,
-                'numerical_imputer': numerical_imputer,
-                'numerical_scaler': numerical_scaler,
-                'categorical_imputer': categorical_imputer,
-                'tfidf': tfidf,
-                'feature_selector': feature_selector,
-                'numerical_features': self.numerical_features,
-                'categorical_features': self.categorical_features,
-                'text_feature': self.text_feature,
-                'model_info': {
-                    'model_type': 'gradient_boosting',
-                    'cv_accuracy': mean_score,
-                    'test_accuracy': test_accuracy,
-                    'training_date': datetime.now().isoformat(),
-                    'feature_count': X_selected.shape[1],
-                    'training_samples': len(X_train)
-                }
+            return self.save_trained_model(model, label_encoder, fitted, hyperparameters, mean_score,
+                                           test_accuracy, X_selected.shape[1], X_train.shape[0])
+            
+        except Exception as e:
+            logger.error(f"Model training error: {e}")
+            raise
+    
+    @timed_stage()
+    def save_trained_model(self, model, label_encoder, fitted, hyperparameters, cv_accuracy, test_accuracy,
+                           feature_count, training_samples):
+        """Pickle the model with its fitted preprocessors (the dict predict.py loads), then write a bundle"""
+        model_objects = {
+            'final_model': model,
+            'label_encoder': label_encoder,
+            **fitted,
+            'compiled_trees': self.export_compiled_trees(model),
+            'dense_input': self.backend in DENSE_INPUT_BACKENDS,
+            'numerical_features': self.numerical_features,
+            'categorical_features': self.categorical_features,
+            'text_feature': self.text_feature,
+            'categorical_encoders': {name: encoder.to_dict() for name, encoder in self.categorical_encoders.items()},
+            'model_info': {
+                'model_type': self.backend,
+                'hyperparameters': hyperparameters,
+                'n_estimators_used': boosting_stages_used(model),
+                'cv_accuracy': cv_accuracy,
+                'test_accuracy': test_accuracy,
+                'training_date': datetime.now().isoformat(),
+                'feature_count': feature_count,
+                'training_samples': training_samples
             }
+        }
+        
+        # Per-vehicle history lookups for predict.py, saved next to the model. Written (atomically) before
+        # the model: a server that hot-loads the new pickle or bundle must find this run's store with it
+        if self.feature_store is not None:
+            self.feature_store.save(self.feature_store_path)
+            logger.info(f"✅ Feature store saved to: {self.feature_store_path}")
+        
+        # Write then rename, so a running prediction server never loads a half-written pickle
+        staging_path = f"{self.model_path}.tmp"
+        with open(staging_path, 'wb') as f:
+            pickle.dump(model_objects, f)
+        os.replace(staging_path, self.model_path)
+        
+        logger.info(f"✅ Model saved to: {self.model_path}")
+        logger.info(f"Model file size: {os.path.getsize(self.model_path) / 1024:.1f} KB")
+        
+        try:
+            self.save_model_bundle(model_objects)
+        except Exception as e:
+            logger.warning(f"Model bundle export failed (pickle still saved): {e}")
+        
+        return model_objects
+    
+    @timed_stage()
+    def train_out_of_core(self, data_paths=None):
+        """Train from memory-mapped design matrices built in three streaming passes
+        
+        1. Load only the non-text columns and preprocess them as usual (dedup, vehicle
+           history, encoders, time features and outlier rules need every row); the
+           model inputs go to a float32 memmap and the frame is released.
+        2. Re-stream the Description/Response text of the kept rows chunk by chunk:
+           target labels, HashingVectorizer features (saved per chunk), partial-fit
+           scaler and the per-class sums for feature selection.
+        3. Scale, combine and select each chunk into dense float32 train/test memmaps;
+           GradientBoosting trains on the train file without loading it into memory.
+        
+        Peak memory is the non-text columns plus one chunk, instead of the full
+        export and several copies of its feature matrices. Cross-validation is
+        skipped (its folds would copy the matrix); test accuracy is still reported.
+        """
+        if self.backend in DENSE_INPUT_BACKENDS:
+            raise ValueError(f"Out-of-core training needs the gradient_boosting backend "
+                             f"({self.backend} copies its input to float64 in memory)")
+        
+        try:
+            logger.info("💽 Out-of-core training: streaming exports through fitted preprocessors...")
+            shutil.rmtree(self.out_of_core_dir, ignore_errors=True)
+            os.makedirs(self.out_of_core_dir)
+            
+            # Pass 1: non-text columns, preprocessed over the whole history
+            sources = [source for source in self.resolve_data_sources(data_paths) if os.path.exists(source)]
+            if not sources:
+                raise ValueError("Out-of-core training needs ServiceRequest exports (no synthetic fallback)")
+            columns = [column for column in TRAINING_COLUMNS if column not in OUT_OF_CORE_TEXT_COLUMNS]
+            df = self.preprocess_data_robust(self.load_and_clean_data(sources, columns), include_text=False, copy=False)
+            if not self.source_row_counts:
+                raise ValueError("No rows could be loaded from the ServiceRequest exports")
+            
+            feature_columns = self.numerical_features + self.categorical_features
+            for feature in feature_columns:
+                if feature not in df.columns:
+                    logger.warning(f"Missing feature {feature}, using default")
+                    df[feature] = 0
             
-            with open(self.model_path, 'wb') as f:
-                pickle.dump(model_objects, f)
+            n_rows, n_numerical = len(df), len(self.numerical_features)
+            positions = df.index.to_numpy()  # rows kept, as positions in the export stream
+            label_inputs = df[['MrType', 'Odometer']].reset_index(drop=True)
+            features = np.lib.format.open_memmap(os.path.join(self.out_of_core_dir, 'features.npy'), mode='w+',
+                                                 dtype=np.float32, shape=(n_rows, len(feature_columns)))
+            for start in range(0, n_rows, OUT_OF_CORE_CHUNK_ROWS):
+                block = df.iloc[start:start + OUT_OF_CORE_CHUNK_ROWS][feature_columns]
+                features[start:start + len(block)] = block.fillna(0).to_numpy(dtype=np.float32)
+            del df
+            logger.info(f"Pass 1: {n_rows} rows x {len(feature_columns)} model inputs memory-mapped")
+            
+            # Pass 2: text of the kept rows, streamed in the order pass 1 read it
+            with self.timer.stage('text_pass'):
+                hasher = HashingVectorizer(n_features=OUT_OF_CORE_TEXT_FEATURES, stop_words='english',
+                                           lowercase=True, alternate_sign=False)
+                numerical_scaler = StandardScaler()
+                statistics = StreamingFClassif(len(feature_columns) + OUT_OF_CORE_TEXT_FEATURES)
+                label_codes = np.zeros(n_rows, dtype=np.int16)
+                text_chunks = []
+                stream_offset = 0
+                for source, n_source_rows in self.source_row_counts:
+                    read = 0
+                    for chunk in iter_service_request_chunks(source, columns=OUT_OF_CORE_TEXT_COLUMNS):
+                        chunk = chunk.iloc[:n_source_rows - read]
+                        lo, hi = np.searchsorted(positions, [stream_offset, stream_offset + len(chunk)])
+                        kept = chunk.iloc[positions[lo:hi] - stream_offset].reset_index(drop=True)
+                        read += len(chunk)
+                        stream_offset += len(chunk)
+                        if hi > lo:
+                            frame = self.clean_description(pd.concat([kept, label_inputs.iloc[lo:hi].reset_index(drop=True)], axis=1))
+                            label_codes[lo:hi] = np.searchsorted(MAINTENANCE_CATEGORIES, self.create_maintenance_categories(frame))
+                        
+                            X_text = hasher.transform(frame[self.text_feature].fillna('').astype(str))
+                            numerical_scaler.partial_fit(features[lo:hi, :n_numerical])
+                            statistics.update(hstack([csr_matrix(features[lo:hi]), X_text], format='csr'), label_codes[lo:hi])
+                        
+                            text_path = os.path.join(self.out_of_core_dir, f"text_{len(text_chunks):05d}.npz")
+                            save_npz(text_path, X_text)
+                            text_chunks.append((lo, hi, text_path))
+                        if read >= n_source_rows:
+                            break
             
-            logger.info(f"✅ Model saved to: {self.model_path}")
-            logger.info(f"Model file size: {os.path.getsize(self.model_path) / 1024:.1f} KB")
+            rows_with_text = sum(hi - lo for lo, hi, _ in text_chunks)
+            if rows_with_text != n_rows:
+                raise ValueError(f"Text pass matched {rows_with_text} of {n_rows} rows; exports changed during training?")
+            logger.info(f"Pass 2: {len(text_chunks)} text chunks hashed to {OUT_OF_CORE_TEXT_FEATURES} features")
+            
+            # LabelEncoder classes are the labels seen, in sorted order, so codes map through np.searchsorted
+            observed = np.unique(label_codes)
+            label_encoder = LabelEncoder().fit(MAINTENANCE_CATEGORIES[observed])
+            y_encoded = np.searchsorted(observed, label_codes)
+            logger.info(f"Target distribution:\n{pd.Series(label_encoder.classes_[y_encoded]).value_counts()}")
+            
+            # Training inputs are NaN-free (filled above); the imputers only act at prediction time
+            sample = np.sort(np.random.RandomState(42).choice(n_rows, min(n_rows, OUT_OF_CORE_IMPUTER_SAMPLE), replace=False))
+            numerical_imputer = SimpleImputer(strategy='median').fit(
+                pd.DataFrame(features[sample, :n_numerical], columns=self.numerical_features))
+            categorical_imputer = SimpleImputer(strategy='most_frequent').fit(
+                pd.DataFrame(features[sample, n_numerical:], columns=self.categorical_features))
+            feature_selector = statistics.selector(300)
+            n_selected = int(feature_selector.get_support().sum())
+            
+            # Pass 3: selected design matrix, split into train/test memmaps
+            with self.timer.stage('design_matrix_pass'):
+                is_test = np.zeros(n_rows, dtype=bool)
+                is_test[train_test_split(np.arange(n_rows), test_size=0.2, random_state=42, stratify=y_encoded)[1]] = True
+                destination = np.where(is_test, np.cumsum(is_test) - 1, np.cumsum(~is_test) - 1)
+                train_path = os.path.join(self.out_of_core_dir, 'X_train.npy')
+                test_path = os.path.join(self.out_of_core_dir, 'X_test.npy')
+                X_train = np.lib.format.open_memmap(train_path, mode='w+', dtype=np.float32,
+                                                    shape=(int((~is_test).sum()), n_selected))
+                X_test = np.lib.format.open_memmap(test_path, mode='w+', dtype=np.float32,
+                                                   shape=(int(is_test.sum()), n_selected))
+                for lo, hi, text_path in text_chunks:
+                    X_text = load_npz(text_path)
+                    for start in range(lo, hi, OUT_OF_CORE_BLOCK_ROWS):
+                        stop = min(start + OUT_OF_CORE_BLOCK_ROWS, hi)
+                        X_block = hstack([
+                            csr_matrix(numerical_scaler.transform(features[start:stop, :n_numerical])),
+                            csr_matrix(features[start:stop, n_numerical:]),
+                            X_text[start - lo:stop - lo]
+                        ], format='csr')
+                        X_selected = feature_selector.transform(X_block).toarray().astype(np.float32)
+                        block_test = is_test[start:stop]
+                        X_train[destination[start:stop][~block_test]] = X_selected[~block_test]
+                        X_test[destination[start:stop][block_test]] = X_selected[block_test]
+                    os.remove(text_path)
+            X_train.flush()
+            X_test.flush()
+            del X_train, X_test, features
+            logger.info(f"Pass 3: design matrix {n_rows} x {n_selected} written to {self.out_of_core_dir}")
+            
+            # Train straight from the read-only memmap (float32, as GradientBoosting trains on)
+            X_train = np.load(train_path, mmap_mode='r')
+            X_test = np.load(test_path, mmap_mode='r')
+            y_train, y_test = y_encoded[~is_test], y_encoded[is_test]
+            
+            hyperparameters = dict(DEFAULT_HYPERPARAMETERS)
+            logger.info(f"Training {self.backend} model on {X_train.shape[0]} memory-mapped rows "
+                        f"(cross-validation skipped out of core)...")
+            model = build_classifier(self.backend, hyperparameters)
+            with self.timer.stage('fit'):
+                model.fit(X_train, y_train)
+            
+            with self.timer.stage('evaluate'):
+                test_accuracy = accuracy_score(y_test, model.predict(X_test))
+            logger.info(f"Test accuracy: {test_accuracy:.4f}")
             
-            return model_objects
+            fitted = {
+                'numerical_imputer': numerical_imputer,
+                'numerical_scaler': numerical_scaler,
+                'categorical_imputer': categorical_imputer,
+                'tfidf': hasher,  # predict.py only calls .transform on it
+                'feature_selector': feature_selector
+            }
+            return self.save_trained_model(model, label_encoder, fitted, hyperparameters, None,
+                                           test_accuracy, n_selected, X_train.shape[0])
             
         except Exception as e:
-            logger.error(f"Model training error: {e}")
+            logger.error(f"Out-of-core training error: {e}")
             raise
+        finally:
+            shutil.rmtree(self.out_of_core_dir, ignore_errors=True)
     
-    def run_complete_training(self):
+    def run_complete_training(self, data_paths=None, use_cache=True, search=False, out_of_core=False):
         """Run the complete training pipeline with robust error handling"""
         try:
             logger.info("🚀 Starting shape-fixed VMS model training...")
             
-            # Load and clean data
-            df = self.load_and_clean_data()
-            
-            # Robust preprocessing
-            df_processed = self.preprocess_data_robust(df)
-            
-            # Prepare features
-            X_numerical, X_categorical, X_text, y = self.prepare_features(df_processed)
-            
-            # Train model with shape fixes
-            model_objects = self.train_model_with_shape_fix(X_numerical, X_categorical, X_text, y)
+            if out_of_core:
+                if search:
+                    raise ValueError("--search is not available with --out-of-core (its folds copy the matrix)")
+                # Stream the exports through fitted preprocessors into memory-mapped design matrices
+                model_objects = self.train_out_of_core(data_paths)
+            else:
+                # Load, clean and preprocess data (cached as Parquet between runs)
+                df_processed = self.load_processed_data(data_paths, use_cache)
+                
+                # Prepare features
+                X_numerical, X_categorical, X_text, y = self.prepare_features(df_processed)
+                
+                # Train model with shape fixes
+                model_objects = self.train_model_with_shape_fix(X_numerical, X_categorical, X_text, y, search)
             
             logger.info("✅ Training completed successfully!")
             return model_objects
@@ -589,12 +1385,46 @@ class ShapeFixedVMSTrainer:
         except Exception as e:
             logger.error(f"Training pipeline error: {e}")
             raise
+        finally:
+            # Stage timings go to stderr as one JSON line (also for failed runs)
+            self.timer.finish()
 
 def main():
     """Main training function with robust error handling"""
-    try:
+    parser = argparse.ArgumentParser(description='Train the VMS maintenance prediction model')
+    parser.add_argument('--export-bundle', metavar='MODEL_PKL',
+                        help='Convert an existing pickled model into a model bundle and exit')
+    parser.add_argument('--data', nargs='+', metavar='EXPORT',
+                        help='ServiceRequest exports to train on (default: legacy CSVs, then data/ exports)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-parse and re-clean the exports instead of using the cleaned data cache')
+    parser.add_argument('--search', action='store_true',
+                        help='Cross-validate a small n_estimators/max_depth/learning_rate grid and keep the best')
+    parser.add_argument('--workers', type=int, default=-1,
+                        help='Worker processes for cross-validation and --search (-1 = all cores)')
+    parser.add_argument('--backend', choices=MODEL_BACKENDS, default='gradient_boosting',
+                        help='Model backend (hist_gradient_boosting bins features and scales to large exports)')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='Stream the exports and train from a memory-mapped design matrix (exports larger than RAM)')
+    parser.add_argument('--timings', action='store_true',
+                        help='Write per-stage timings to stderr as JSON (same as VMS_STAGE_TIMING=1)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='With --timings, also record tracemalloc peak memory per stage (slower)')
+    args = parser.parse_args()
+    
+    if args.export_bundle:
         trainer = ShapeFixedVMSTrainer()
-        trainer.run_complete_training()
+        bundle_path = trainer.export_bundle_from_pickle(args.export_bundle)
+        print(f"📦 Model bundle written to: {bundle_path}")
+        return
+    
+    try:
+        timer = None
+        if args.timings or args.trace_memory:
+            timer = StageTimer('training', trace_memory=args.trace_memory, emit=True)
+        trainer = ShapeFixedVMSTrainer(n_jobs=args.workers, backend=args.backend, timer=timer)
+        trainer.run_complete_training(args.data, use_cache=not args.no_cache, search=args.search,
+                                      out_of_core=args.out_of_core)
         
         print("\n🎉 VMS ML model training completed successfully!")
         print(f"📁 Model saved to: {trainer.model_path}")